@@ -0,0 +1,49 @@
+"""Add ai_cache_entries table
+
+Revision ID: b3e4f5a6c7d8
+Revises: d0a7ed5c51d2
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b3e4f5a6c7d8"
+down_revision: Union[str, Sequence[str], None] = "d0a7ed5c51d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ai_cache_entries",
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("namespace", sa.String(), nullable=False),
+        sa.Column("value", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        op.f("ix_ai_cache_entries_namespace"),
+        "ai_cache_entries",
+        ["namespace"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_ai_cache_entries_expires_at"),
+        "ai_cache_entries",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_ai_cache_entries_expires_at"), table_name="ai_cache_entries")
+    op.drop_index(op.f("ix_ai_cache_entries_namespace"), table_name="ai_cache_entries")
+    op.drop_table("ai_cache_entries")
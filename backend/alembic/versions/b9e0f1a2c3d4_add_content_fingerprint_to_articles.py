@@ -0,0 +1,37 @@
+"""Add content fingerprints to articles
+
+Revision ID: b9e0f1a2c3d4
+Revises: a8d9e0f1b2c3
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b9e0f1a2c3d4"
+down_revision: Union[str, Sequence[str], None] = "a8d9e0f1b2c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Use batch_alter_table for SQLite compatibility
+    # Existing rows stay NULL: they are fingerprinted on their next write or scan
+    with op.batch_alter_table("articles", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("content_fingerprint", sa.String(length=40), nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column("last_scanned_fingerprint", sa.String(length=40), nullable=True)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("articles", schema=None) as batch_op:
+        batch_op.drop_column("last_scanned_fingerprint")
+        batch_op.drop_column("content_fingerprint")
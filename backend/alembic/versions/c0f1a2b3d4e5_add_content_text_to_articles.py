@@ -0,0 +1,39 @@
+"""Add content_text, word_count and char_count to articles
+
+Revision ID: c0f1a2b3d4e5
+Revises: b9e0f1a2c3d4
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c0f1a2b3d4e5"
+down_revision: Union[str, Sequence[str], None] = "b9e0f1a2c3d4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Use batch_alter_table for SQLite compatibility
+    # Fill existing rows with `python -m src.tools.backfill_content_text`
+    with op.batch_alter_table("articles", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("content_text", sa.Text(), nullable=True))
+        batch_op.add_column(
+            sa.Column("word_count", sa.Integer(), server_default="0", nullable=False)
+        )
+        batch_op.add_column(
+            sa.Column("char_count", sa.Integer(), server_default="0", nullable=False)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("articles", schema=None) as batch_op:
+        batch_op.drop_column("char_count")
+        batch_op.drop_column("word_count")
+        batch_op.drop_column("content_text")
@@ -0,0 +1,84 @@
+"""Add full-text search index for articles
+
+Revision ID: d1a2b3c4e5f6
+Revises: c0f1a2b3d4e5
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d1a2b3c4e5f6"
+down_revision: Union[str, Sequence[str], None] = "c0f1a2b3d4e5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Bodies come from articles.content_text: run src.tools.backfill_content_text
+    # first on existing data (or after: the triggers / generated column pick up its
+    # updates)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("""
+            ALTER TABLE articles ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(content_text, '')), 'B')
+            ) STORED
+        """)
+        op.execute(
+            "CREATE INDEX ix_articles_search_vector ON articles "
+            "USING GIN (search_vector)"
+        )
+        return
+
+    op.execute("""
+        CREATE VIRTUAL TABLE articles_fts USING fts5(
+            user_key, article_key, title, body,
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER articles_fts_insert AFTER INSERT ON articles
+        WHEN new.is_deleted = 0 BEGIN
+            INSERT INTO articles_fts(user_key, article_key, title, body)
+            VALUES (
+                'u' || new.user_id, 'a' || new.id, new.title,
+                coalesce(new.content_text, '')
+            );
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER articles_fts_update
+        AFTER UPDATE OF title, content_text, is_deleted ON articles BEGIN
+            DELETE FROM articles_fts WHERE articles_fts MATCH 'article_key:a' || old.id;
+            INSERT INTO articles_fts(user_key, article_key, title, body)
+            SELECT 'u' || new.user_id, 'a' || new.id, new.title,
+                   coalesce(new.content_text, '')
+            WHERE new.is_deleted = 0;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER articles_fts_delete AFTER DELETE ON articles BEGIN
+            DELETE FROM articles_fts WHERE articles_fts MATCH 'article_key:a' || old.id;
+        END
+    """)
+    op.execute("""
+        INSERT INTO articles_fts(user_key, article_key, title, body)
+        SELECT 'u' || user_id, 'a' || id, title, coalesce(content_text, '')
+        FROM articles WHERE is_deleted = 0
+    """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_articles_search_vector")
+        op.execute("ALTER TABLE articles DROP COLUMN IF EXISTS search_vector")
+        return
+    op.execute("DROP TRIGGER IF EXISTS articles_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS articles_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS articles_fts_insert")
+    op.execute("DROP TABLE IF EXISTS articles_fts")
@@ -0,0 +1,36 @@
+"""Add reply_summary to comments
+
+Revision ID: d5a6b7c8e9f0
+Revises: c4f5a6b7d8e9
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a6b7c8e9f0"
+down_revision: Union[str, Sequence[str], None] = "c4f5a6b7d8e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Use batch_alter_table for SQLite compatibility
+    with op.batch_alter_table("comments", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("reply_summary", sa.Text(), nullable=True))
+        batch_op.add_column(
+            sa.Column(
+                "reply_summary_upto", sa.Integer(), server_default="0", nullable=False
+            )
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("comments", schema=None) as batch_op:
+        batch_op.drop_column("reply_summary_upto")
+        batch_op.drop_column("reply_summary")
@@ -0,0 +1,36 @@
+"""Add sidebar order index to articles
+
+Revision ID: e2b3c4d5f6a7
+Revises: d1a2b3c4e5f6
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b3c4d5f6a7"
+down_revision: Union[str, Sequence[str], None] = "d1a2b3c4e5f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # position was added without a default: NULLs would fall out of the keyset
+    # comparisons. No batch mode here, recreating articles on SQLite would drop the
+    # full-text triggers.
+    op.execute("UPDATE articles SET position = 0 WHERE position IS NULL")
+    op.create_index(
+        "ix_articles_user_order",
+        "articles",
+        ["user_id", "is_deleted", "position", sa.text("updated_at DESC"), "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_articles_user_order", table_name="articles")
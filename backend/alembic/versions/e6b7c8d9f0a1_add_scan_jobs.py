@@ -0,0 +1,61 @@
+"""Add scan_jobs table
+
+Revision ID: e6b7c8d9f0a1
+Revises: d5a6b7c8e9f0
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e6b7c8d9f0a1"
+down_revision: Union[str, Sequence[str], None] = "d5a6b7c8e9f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scan_jobs",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("backlog", sa.Boolean(), server_default="0", nullable=False),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("run_after", sa.DateTime(), nullable=False),
+        sa.Column("locked_by", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_scan_jobs_status_run_after",
+        "scan_jobs",
+        ["status", "run_after"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_scan_jobs_active_user",
+        "scan_jobs",
+        ["user_id"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('pending', 'running')"),
+        sqlite_where=sa.text("status IN ('pending', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scan_jobs_active_user", table_name="scan_jobs")
+    op.drop_index("ix_scan_jobs_status_run_after", table_name="scan_jobs")
+    op.drop_table("scan_jobs")
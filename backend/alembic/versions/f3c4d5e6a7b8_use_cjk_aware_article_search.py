@@ -0,0 +1,95 @@
+"""Tokenize article search for unspaced CJK text
+
+Revision ID: f3c4d5e6a7b8
+Revises: e2b3c4d5f6a7
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3c4d5e6a7b8"
+down_revision: Union[str, Sequence[str], None] = "e2b3c4d5f6a7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CJK_RANGES = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+
+
+def upgrade() -> None:
+    # Word tokenizers index a run of Chinese text as one token, only its start matched.
+    # SQLite switches to trigrams (substring search), Postgres indexes CJK bigrams.
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("""
+            CREATE OR REPLACE FUNCTION cjk_bigrams(input text) RETURNS text
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+                SELECT coalesce(string_agg(
+                    CASE WHEN m.match[1] ~ '^[{cjk}]'
+                              AND char_length(m.match[1]) > 1 THEN (
+                        SELECT string_agg(substr(m.match[1], i, 2), ' ' ORDER BY i)
+                        FROM generate_series(1, char_length(m.match[1]) - 1) AS i
+                    ) ELSE m.match[1] END, ' ' ORDER BY m.n), '')
+                FROM regexp_matches(coalesce(input, ''), '[{cjk}]+|[^{cjk}]+', 'g')
+                    WITH ORDINALITY AS m(match, n)
+            $$
+        """.replace("{cjk}", CJK_RANGES))
+        op.execute("ALTER TABLE articles DROP COLUMN search_vector")
+        op.execute("""
+            ALTER TABLE articles ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', cjk_bigrams(title)), 'A') ||
+                setweight(to_tsvector('simple', cjk_bigrams(content_text)), 'B')
+            ) STORED
+        """)
+        op.execute(
+            "CREATE INDEX ix_articles_search_vector ON articles "
+            "USING GIN (search_vector)"
+        )
+        return
+
+    # The triggers only name the table, they stay as they are
+    op.execute("DROP TABLE articles_fts")
+    op.execute("""
+        CREATE VIRTUAL TABLE articles_fts USING fts5(
+            user_key, article_key, title, body, tokenize='trigram'
+        )
+    """)
+    op.execute("""
+        INSERT INTO articles_fts(user_key, article_key, title, body)
+        SELECT 'u' || user_id, 'a' || id, title, coalesce(content_text, '')
+        FROM articles WHERE is_deleted = 0
+    """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("ALTER TABLE articles DROP COLUMN search_vector")
+        op.execute("""
+            ALTER TABLE articles ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(content_text, '')), 'B')
+            ) STORED
+        """)
+        op.execute(
+            "CREATE INDEX ix_articles_search_vector ON articles "
+            "USING GIN (search_vector)"
+        )
+        op.execute("DROP FUNCTION IF EXISTS cjk_bigrams(text)")
+        return
+
+    op.execute("DROP TABLE articles_fts")
+    op.execute("""
+        CREATE VIRTUAL TABLE articles_fts USING fts5(
+            user_key, article_key, title, body,
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    op.execute("""
+        INSERT INTO articles_fts(user_key, article_key, title, body)
+        SELECT 'u' || user_id, 'a' || id, title, coalesce(content_text, '')
+        FROM articles WHERE is_deleted = 0
+    """)
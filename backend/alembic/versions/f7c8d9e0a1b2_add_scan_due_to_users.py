@@ -0,0 +1,47 @@
+"""Add scan_dirty and next_scan_due_at to users
+
+Revision ID: f7c8d9e0a1b2
+Revises: e6b7c8d9f0a1
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+
+from datetime import datetime
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f7c8d9e0a1b2"
+down_revision: Union[str, Sequence[str], None] = "e6b7c8d9f0a1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Use batch_alter_table for SQLite compatibility
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("scan_dirty", sa.Boolean(), server_default="0", nullable=False)
+        )
+        batch_op.add_column(sa.Column("next_scan_due_at", sa.DateTime(), nullable=True))
+        batch_op.create_index(
+            "ix_users_scan_due", ["scan_dirty", "next_scan_due_at"], unique=False
+        )
+
+    # Everyone gets one scan to pick up writes made before the flags existed;
+    # users without background scanning are cleared by that scan
+    op.execute(
+        sa.text(
+            "UPDATE users SET scan_dirty = :dirty, next_scan_due_at = :now"
+        ).bindparams(dirty=True, now=datetime.utcnow())
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.drop_index("ix_users_scan_due")
+        batch_op.drop_column("next_scan_due_at")
+        batch_op.drop_column("scan_dirty")
@@ -1,21 +1,415 @@
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from src.core.database import get_db
-from src.services.ai.analysis import analysis_service
+
 from src.api.articles import get_current_user
+from src.core.config import settings
+from src.core.database import get_db
+from src.core.metrics import metrics
+from src.core.sse import sse_event
+from src.models.article import Article
+from src.models.comment import Comment
 from src.models.user import User
+from src.services.ai.analysis import analysis_service
+from src.services.ai.analysis_session import (
+    GAP_MARKER,
+    analysis_sessions,
+    apply_splices,
+    focus_text,
+)
+from src.services.ai.prefilter import analysis_prefilter
+from src.services.ai.stream_parser import CommentStreamParser, locate_quote
+from src.services.ai.stream_registry import analysis_streams, review_streams
 
 router = APIRouter()
 
-from typing import List, Optional
+
+class ParagraphSplice(BaseModel):
+    # Replace paragraphs[start:start + delete_count] with `insert`
+    start: int
+    delete_count: int = 0
+    insert: List[str] = []
+
 
 class AnalysisRequest(BaseModel):
-    text: str
+    text: str = ""
     context: str = ""
     existing_quotes: Optional[List[str]] = []
+    # With an article_id the server keeps a per-article session of what was
+    # already analyzed
+    article_id: Optional[UUID] = None
+    # "full": send the whole text to the model.
+    # "incremental": only new/changed paragraphs (+ neighbours)
+    mode: str = "full"
+    # Paragraph edits against the server's copy of the document,
+    # instead of resending `text`
+    diff: Optional[List[ParagraphSplice]] = None
+
+
+class _PreparedAnalysis:
+    def __init__(
+        self,
+        document: str,
+        text: str,
+        context: str,
+        session=None,
+        paragraphs: list[str] = None,
+    ):
+        self.document = document  # full current text
+        # What the model is shown (changed paragraphs only in incremental mode)
+        self.text = text
+        self.context = context
+        self.session = session
+        self.paragraphs = paragraphs
+        self.key = None  # (user_id, article_id) when tied to an article
+        # Answer NO_COMMENT without calling the model
+        self.skip_reason: str | None = None
+
+
+def _prepare_analysis(request: AnalysisRequest, user: User) -> _PreparedAnalysis:
+    prepared = _prepare_text(request, user)
+    prepared.key = _analysis_stream_key(request, user)
+    if prepared.session is not None and not prepared.text.strip():
+        # Nothing changed since the last completed analysis
+        prepared.skip_reason = "unchanged"
+    else:
+        prepared.skip_reason = analysis_prefilter.check(
+            prepared.text, prepared.document, request.existing_quotes, prepared.key
+        )
+    return prepared
+
+
+def _prepare_text(request: AnalysisRequest, user: User) -> _PreparedAnalysis:
+    if request.article_id is None:
+        if request.diff is not None:
+            raise HTTPException(status_code=400, detail="diff requires article_id")
+        return _PreparedAnalysis(request.text, request.text, request.context)
+
+    if request.diff is not None:
+        session = analysis_sessions.get(user.id, request.article_id)
+        if session is None:
+            # Client should resend the full document
+            raise HTTPException(
+                status_code=409, detail="Analysis session expired, send the full text"
+            )
+        paragraphs = apply_splices(session.paragraphs, request.diff)
+    else:
+        session = analysis_sessions.get_or_create(user.id, request.article_id)
+        paragraphs = request.text.split("\n")
+    analysis_sessions.update(session, paragraphs)
+
+    if request.mode == "incremental" or request.diff is not None:
+        text, changed = focus_text(
+            paragraphs, session.analyzed, settings.AI_ANALYSIS_DIFF_WINDOW
+        )
+        metrics.incr("analysis.incremental.requests")
+        metrics.incr("analysis.incremental.paragraphs_total", len(paragraphs))
+        metrics.incr("analysis.incremental.paragraphs_changed", changed)
+    else:
+        text = "\n".join(paragraphs)
+
+    context = request.context
+    if GAP_MARKER in text.split("\n"):
+        context = (
+            f"{context}\n(Only the recently changed parts of a longer document are "
+            f"shown; {GAP_MARKER} marks omitted text. Never quote {GAP_MARKER}.)"
+        )
+    return _PreparedAnalysis("\n".join(paragraphs), text, context, session, paragraphs)
+
+
+def _skip(prepared: _PreparedAnalysis):
+    if prepared.skip_reason == "unchanged":
+        metrics.incr("analysis.incremental.unchanged")
+    else:
+        analysis_prefilter.maybe_sample(
+            prepared.skip_reason, prepared.text, prepared.context
+        )
+
+
+async def _analysis_chunks(
+    prepared: _PreparedAnalysis, user: User, db: Session, existing_quotes: list[str]
+):
+    if prepared.skip_reason:
+        _skip(prepared)
+        yield ">> NO_COMMENT"
+        return
+
+    async for chunk in analysis_service.analyze_text(
+        prepared.text, prepared.context, user, db, existing_quotes
+    ):
+        yield chunk
+    analysis_prefilter.record(prepared.key, prepared.document)
+    if prepared.session is not None:
+        analysis_sessions.mark_analyzed(prepared.session, prepared.paragraphs)
+
+
+def _analysis_stream_key(request: AnalysisRequest, user: User):
+    # A newer analysis of the same article supersedes this one
+    return (user.id, request.article_id) if request.article_id else None
+
 
 @router.post("/analyze/stream")
-async def stream_analysis(request: AnalysisRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return StreamingResponse(analysis_service.analyze_text(request.text, request.context, user, db, request.existing_quotes), media_type="text/event-stream")
+async def stream_analysis(
+    request: AnalysisRequest,
+    http_request: Request,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    prepared = _prepare_analysis(request, user)
+    handle = analysis_streams.start(_analysis_stream_key(request, user))
+    chunks = _analysis_chunks(prepared, user, db, request.existing_quotes)
+    # On supersede the client drops the partial answer
+    return StreamingResponse(
+        analysis_streams.guard(
+            handle, chunks, http_request, on_superseded="\n>> NO_COMMENT"
+        ),
+        media_type="text/event-stream",
+    )
+
+
+class AnalysisEventsRequest(AnalysisRequest):
+    # Save the comment server-side at the end of the stream (needs article_id)
+    persist: bool = False
+
+
+def _comment_dict(comment: Comment) -> dict:
+    return {
+        "id": str(comment.id),
+        "content": comment.content,
+        "type": comment.type,
+        "quote": comment.quote,
+        "range": comment.range,
+        "status": comment.status,
+        "reply": comment.reply,
+        "created_at": comment.created_at,
+    }
+
+
+@router.post("/analyze/events")
+async def stream_analysis_events(
+    request: AnalysisEventsRequest,
+    http_request: Request,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Same analysis as /analyze/stream, parsed on the server into typed SSE events:
+    `quote` ({quote, offset: {start, end} | null}, offsets into the full text),
+    `comment_delta` ({delta}), `no_comment` ({reason}), and finally `done`
+    ({quote, content, offset, comment}).
+    With persist=true the comment is saved before `done` and returned as `comment`.
+    """
+    if request.persist:
+        if request.article_id is None:
+            raise HTTPException(status_code=400, detail="persist requires article_id")
+        owned = (
+            db.query(Article)
+            .filter(Article.id == request.article_id, Article.user_id == user.id)
+            .first()
+        )
+        if not owned:
+            raise HTTPException(status_code=404, detail="Article not found")
+    prepared = _prepare_analysis(request, user)
+
+    async def events():
+        if prepared.skip_reason:
+            _skip(prepared)
+            yield sse_event("no_comment", {"reason": prepared.skip_reason})
+            yield sse_event(
+                "done",
+                {"quote": None, "content": None, "offset": None, "comment": None},
+            )
+            return
+
+        parser = CommentStreamParser()
+        existing = request.existing_quotes or []
+        taken = [locate_quote(prepared.document, quote) for quote in existing]
+        taken = [span for span in taken if span]
+        offset = None
+
+        def frames(parsed) -> list[str]:
+            nonlocal offset
+            out = []
+            for name, data in parsed:
+                if data.get("index", 0) > 0:
+                    continue  # one comment per analysis; ignore anything extra
+                if name == "quote":
+                    span = locate_quote(prepared.document, data["quote"], taken)
+                    offset = {"start": span[0], "end": span[1]} if span else None
+                    out.append(
+                        sse_event("quote", {"quote": data["quote"], "offset": offset})
+                    )
+                elif name == "comment_delta":
+                    out.append(sse_event("comment_delta", {"delta": data["delta"]}))
+                elif name == "no_comment":
+                    out.append(sse_event("no_comment", {"reason": "model"}))
+            return out
+
+        async for chunk in _analysis_chunks(
+            prepared, user, db, request.existing_quotes
+        ):
+            for frame in frames(parser.feed(chunk)):
+                yield frame
+        for frame in frames(parser.close()):
+            yield frame
+
+        if not parser.comments:
+            if not parser.no_comment:
+                yield sse_event("no_comment", {"reason": "empty"})
+            yield sse_event(
+                "done",
+                {"quote": None, "content": None, "offset": None, "comment": None},
+            )
+            return
+
+        result = parser.comments[0].as_dict()
+        saved = None
+        if request.persist:
+            duplicate = None
+            if result["quote"]:
+                duplicate = (
+                    db.query(Comment)
+                    .filter(
+                        Comment.article_id == request.article_id,
+                        Comment.user_id == user.id,
+                        Comment.quote == result["quote"],
+                        Comment.status != "resolved",
+                    )
+                    .first()
+                )
+            if not duplicate:
+                comment = Comment(
+                    article_id=request.article_id,
+                    user_id=user.id,
+                    content=result["content"],
+                    quote=result["quote"],
+                    type="suggestion",
+                    status="active",
+                )
+                db.add(comment)
+                db.flush()
+                saved = _comment_dict(comment)
+                db.commit()
+        yield sse_event(
+            "done",
+            {
+                "quote": result["quote"],
+                "content": result["content"],
+                "offset": offset,
+                "comment": saved,
+            },
+        )
+
+    handle = analysis_streams.start(_analysis_stream_key(request, user))
+    superseded = sse_event("no_comment", {"reason": "superseded"})
+    return StreamingResponse(
+        analysis_streams.guard(
+            handle, events(), http_request, on_superseded=superseded
+        ),
+        media_type="text/event-stream",
+    )
+
+
+class ReviewRequest(BaseModel):
+    article_id: UUID
+    text: str
+    context: str = ""
+    existing_quotes: Optional[List[str]] = []
+    max_comments: int = 5
+
+
+@router.post("/review/stream")
+async def stream_review(
+    request: ReviewRequest,
+    http_request: Request,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Review the whole document in one LLM call. SSE events:
+    `comment` ({index, quote, content, offset: {start, end} | null}) as each comment
+    completes, then `done` ({comments}) once all of them are saved in one transaction.
+    Comments whose quote isn't in the text or overlaps an earlier / existing quote
+    are dropped.
+    """
+    article = (
+        db.query(Article)
+        .filter(Article.id == request.article_id, Article.user_id == user.id)
+        .first()
+    )
+    if not article:
+        raise HTTPException(status_code=404, detail="Article not found")
+    max_comments = max(1, min(request.max_comments, settings.AI_REVIEW_MAX_COMMENTS))
+
+    async def stream():
+        parser = CommentStreamParser()
+        existing = request.existing_quotes or []
+        taken = [locate_quote(request.text, quote) for quote in existing]
+        taken = [span for span in taken if span]
+        accepted = []
+
+        def accept(events) -> list[str]:
+            frames = []
+            for name, data in events:
+                if name != "comment" or len(accepted) >= max_comments:
+                    continue
+                span = None
+                if data["quote"] is not None:
+                    span = locate_quote(request.text, data["quote"], taken)
+                    if span is None:
+                        metrics.incr("review.comments_dropped")
+                        continue
+                    taken.append(span)
+                comment = {
+                    **data,
+                    "index": len(accepted),
+                    "offset": {"start": span[0], "end": span[1]} if span else None,
+                }
+                accepted.append(comment)
+                frames.append(sse_event("comment", comment))
+            return frames
+
+        analysis = analysis_service.review_document(
+            request.text,
+            request.context,
+            user,
+            db,
+            request.existing_quotes,
+            max_comments,
+        )
+        async for chunk in analysis:
+            for frame in accept(parser.feed(chunk)):
+                yield frame
+            if len(accepted) >= max_comments:
+                break  # enough comments, stop paying for output
+        for frame in accept(parser.close()):
+            yield frame
+        await analysis.aclose()
+
+        rows = [
+            Comment(
+                article_id=article.id,
+                user_id=user.id,
+                content=c["content"],
+                quote=c["quote"],
+                type="suggestion",
+                status="active",
+            )
+            for c in accepted
+        ]
+        db.add_all(rows)
+        db.flush()
+        created = [_comment_dict(row) for row in rows]
+        db.commit()
+        metrics.incr("review.comments_created", len(rows))
+        yield sse_event("done", {"comments": created})
+
+    handle = review_streams.start((user.id, request.article_id))
+    return StreamingResponse(
+        review_streams.guard(handle, stream(), http_request),
+        media_type="text/event-stream",
+    )
@@ -1,44 +1,131 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from src.api.deps import get_current_user
 from src.core.database import get_db
-from src.services.article import article_service
-from src.schemas.article import Article, ArticleCreate, ArticleUpdate
 from src.models.user import User
-from src.api.deps import get_current_user
+from src.schemas.article import (
+    Article,
+    ArticleCreate,
+    ArticleMove,
+    ArticleSearchResult,
+    ArticleSummaryPage,
+    ArticleUpdate,
+)
+from src.services.article import article_service
+from src.services.search import article_search
 
 router = APIRouter()
 
+
 @router.put("/reorder")
-def reorder_articles(article_ids: List[UUID] = Body(...), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def reorder_articles(
+    article_ids: List[UUID] = Body(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     article_service.reorder_articles(db, current_user.id, article_ids)
     return {"status": "success"}
 
+
+@router.put("/{article_id}/move")
+def move_article(
+    article_id: UUID,
+    move: ArticleMove,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Drag and drop in a paged sidebar: one move relative to the full order
+    if not article_service.move_article(db, current_user.id, article_id, move.after_id):
+        raise HTTPException(status_code=404, detail="Article not found")
+    return {"status": "success"}
+
+
 @router.post("/", response_model=Article)
-def create_article(article: ArticleCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_article(
+    article: ArticleCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     return article_service.create_article(db, article, current_user.id)
 
+
 @router.get("/", response_model=List[Article])
-def read_articles(skip: int = 0, limit: int = 100, search: str = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def read_articles(
+    skip: int = 0,
+    limit: int = 100,
+    search: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     return article_service.get_articles(db, current_user.id, skip, limit, search)
 
+
+@router.get("/summary", response_model=ArticleSummaryPage)
+def read_article_summaries(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Sidebar list: no content JSON, full articles load via GET /{article_id}
+    try:
+        items, next_cursor = article_service.get_article_summaries(
+            db, current_user.id, limit, cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/search", response_model=List[ArticleSearchResult])
+def search_articles(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Full-text over titles and bodies, best match first, every term required.
+    # Terms match as substrings on SQLite, as word prefixes (CJK: bigrams) on Postgres
+    return article_search.search(db, current_user.id, q, limit)
+
+
 @router.get("/{article_id}", response_model=Article)
-def read_article(article_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def read_article(
+    article_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     article = article_service.get_article(db, article_id, current_user.id)
     if article is None:
         raise HTTPException(status_code=404, detail="Article not found")
     return article
 
+
 @router.put("/{article_id}", response_model=Article)
-def update_article(article_id: UUID, article: ArticleUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    updated_article = article_service.update_article(db, article_id, article, current_user.id)
+def update_article(
+    article_id: UUID,
+    article: ArticleUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    updated_article = article_service.update_article(
+        db, article_id, article, current_user.id
+    )
     if updated_article is None:
         raise HTTPException(status_code=404, detail="Article not found")
     return updated_article
 
+
 @router.delete("/{article_id}", response_model=Article)
-def delete_article(article_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_article(
+    article_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     deleted_article = article_service.delete_article(db, article_id, current_user.id)
     if deleted_article is None:
         raise HTTPException(status_code=404, detail="Article not found")
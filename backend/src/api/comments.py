@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+import datetime
+import logging
+from typing import Optional
 from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from sqlalchemy.orm import Session
+
+from src.api.articles import get_current_user
 from src.core.database import get_db
+from src.core.metrics import metrics
+from src.core.sse import sse_event
 from src.models.comment import Comment
-from src.api.articles import get_current_user
 from src.models.user import User
+from src.services.ai.analysis import analysis_service
+from src.services.ai.stream_registry import reply_streams
+from src.services.ai.thread_summary import thread_summarizer
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
+
 class CommentCreate(BaseModel):
     article_id: UUID
     content: str
@@ -17,13 +29,22 @@ class CommentCreate(BaseModel):
     range: Optional[dict] = None
     type: str = "suggestion"
 
+
 class CommentReplyRequest(BaseModel):
     content: str
 
+
 @router.post("/", response_model=dict)
-def create_comment(comment: CommentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_comment(
+    comment: CommentCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     # Check if content is NO_COMMENT
-    if comment.content.strip() == ">> NO_COMMENT" or comment.content.strip() == "NO_COMMENT":
+    if (
+        comment.content.strip() == ">> NO_COMMENT"
+        or comment.content.strip() == "NO_COMMENT"
+    ):
         return {"status": "skipped", "reason": "no_comment"}
 
     new_comment = Comment(
@@ -33,7 +54,7 @@ def create_comment(comment: CommentCreate, db: Session = Depends(get_db), curren
         quote=comment.quote,
         range=comment.range,
         type=comment.type,
-        status="active"
+        status="active",
     )
     db.add(new_comment)
     db.commit()
@@ -46,16 +67,23 @@ def create_comment(comment: CommentCreate, db: Session = Depends(get_db), curren
         "range": new_comment.range,
         "status": new_comment.status,
         "reply": new_comment.reply,
-        "created_at": new_comment.created_at
+        "created_at": new_comment.created_at,
     }
 
+
 @router.get("/article/{article_id}")
-def get_article_comments(article_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    comments = db.query(Comment).filter(
-        Comment.article_id == article_id,
-        Comment.user_id == current_user.id
-    ).order_by(Comment.created_at.desc()).all()
-    
+def get_article_comments(
+    article_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    comments = (
+        db.query(Comment)
+        .filter(Comment.article_id == article_id, Comment.user_id == current_user.id)
+        .order_by(Comment.created_at.desc())
+        .all()
+    )
+
     return [
         {
             "id": str(c.id),
@@ -65,83 +93,185 @@ def get_article_comments(article_id: UUID, db: Session = Depends(get_db), curren
             "range": c.range,
             "status": c.status,
             "reply": c.reply,
-            "created_at": c.created_at
+            "created_at": c.created_at,
         }
         for c in comments
     ]
 
+
 @router.put("/{comment_id}/resolve")
-def resolve_comment(comment_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    comment = db.query(Comment).filter(Comment.id == comment_id, Comment.user_id == current_user.id).first()
+def resolve_comment(
+    comment_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    comment = (
+        db.query(Comment)
+        .filter(Comment.id == comment_id, Comment.user_id == current_user.id)
+        .first()
+    )
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
-    
+
     comment.status = "resolved"
     db.commit()
     return {"status": "resolved"}
 
-from src.services.ai.analysis import analysis_service
-import datetime
 
-@router.post("/{comment_id}/reply")
-async def reply_comment(comment_id: UUID, reply: CommentReplyRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    comment = db.query(Comment).filter(Comment.id == comment_id, Comment.user_id == current_user.id).first()
-    if not comment:
-        raise HTTPException(status_code=404, detail="Comment not found")
-    
+def _reply_history(comment: Comment) -> list:
     # Initialize reply list if it's None (due to migration)
     if comment.reply is None:
-        comment.reply = []
-    
+        return []
+
     # Ensure comment.reply is a list (it should be JSON now)
     if isinstance(comment.reply, str):
         # Fallback/Migration: convert old string format to list if any
-        comment.reply = [{"role": "user", "content": comment.reply, "timestamp": datetime.datetime.utcnow().isoformat()}] if comment.reply else []
+        return [_message("user", comment.reply)] if comment.reply else []
+    return list(comment.reply)
 
-    # 1. Append User's reply
-    user_message = {
-        "role": "user",
-        "content": reply.content,
-        "timestamp": datetime.datetime.utcnow().isoformat()
-    }
-    
-    # We need to create a new list to trigger SQLAlchemy detection of mutation on JSON column
-    new_history = list(comment.reply)
-    new_history.append(user_message)
-    comment.reply = new_history
+
+def _append_message(db: Session, comment_id: UUID, message: dict) -> list:
+    # Re-read the comment: streaming responses outlive the request's session state
+    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    if not comment:
+        return []
+    # We need to create a new list to trigger SQLAlchemy detection of mutation on
+    # JSON column
+    history = _reply_history(comment)
+    history.append(message)
+    comment.reply = history
     db.commit()
-    
+    return history
+
+
+def _message(role: str, content: str, **extra) -> dict:
+    return {
+        "role": role,
+        "content": content,
+        "timestamp": datetime.datetime.utcnow().isoformat(),
+        **extra,
+    }
+
+
+def _reply_context(comment: Comment, history: list) -> tuple[list, dict]:
+    # Turns folded into the stored summary are sent as the summary, not replayed
+    context_data = {
+        "quote": comment.quote,
+        "original_suggestion": comment.content,
+        "thread_summary": comment.reply_summary,
+    }
+    return history[comment.reply_summary_upto or 0 :], context_data
+
+
+def _get_comment(db: Session, comment_id: UUID, user: User) -> Comment:
+    comment = (
+        db.query(Comment)
+        .filter(Comment.id == comment_id, Comment.user_id == user.id)
+        .first()
+    )
+    if not comment:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return comment
+
+
+@router.post("/{comment_id}/reply")
+async def reply_comment(
+    comment_id: UUID,
+    reply: CommentReplyRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    comment = _get_comment(db, comment_id, current_user)
+
+    # 1. Append User's reply
+    new_history = _append_message(db, comment_id, _message("user", reply.content))
+    prompt_history, context_data = _reply_context(comment, new_history)
+    summary_upto = comment.reply_summary_upto or 0
+
     # 2. Trigger AI Response
     try:
-        context_data = {
-            "quote": comment.quote,
-            "original_suggestion": comment.content
-        }
-        
         full_response = ""
         # Use the new reply_to_comment method
-        async for chunk in analysis_service.reply_to_comment(new_history, context_data, current_user, db):
+        async for chunk in analysis_service.reply_to_comment(
+            prompt_history, context_data, current_user, db
+        ):
             full_response += chunk
-            
+
         # 3. Append AI's response
-        ai_message = {
-            "role": "ai",
-            "content": full_response,
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }
-        
-        updated_history = list(comment.reply)
-        updated_history.append(ai_message)
-        comment.reply = updated_history
-        db.commit()
-        
+        reply_list = _append_message(db, comment_id, _message("ai", full_response))
+        thread_summarizer.maybe_schedule(comment_id, reply_list, summary_upto)
+
         return {
-            "status": "replied", 
+            "status": "replied",
             "ai_response": full_response,
-            "reply_list": comment.reply
+            "reply_list": reply_list,
         }
-        
+
     except Exception as e:
-        print(f"AI Generation failed: {e}")
+        logger.exception("AI Generation failed")
         # Even if AI fails, the user message is saved.
-        return {"status": "saved_user_reply_only", "error": str(e), "reply_list": comment.reply}
+        return {
+            "status": "saved_user_reply_only",
+            "error": str(e),
+            "reply_list": new_history,
+        }
+
+
+@router.post("/{comment_id}/reply/stream")
+async def reply_comment_stream(
+    comment_id: UUID,
+    reply: CommentReplyRequest,
+    http_request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Same as /reply, but the AI reply is streamed as SSE events:
+    `saved` (user message persisted), `token` ({content}) per chunk,
+    then `done` ({status, ai_response, reply_list}) or `error`.
+    If the client disconnects, the partial reply is stored with "partial": true.
+    """
+    comment = _get_comment(db, comment_id, current_user)
+    new_history = _append_message(db, comment_id, _message("user", reply.content))
+    prompt_history, context_data = _reply_context(comment, new_history)
+    summary_upto = comment.reply_summary_upto or 0
+
+    async def stream():
+        yield sse_event("saved", {"reply_list": new_history})
+        full_response = ""
+        finished = False
+        try:
+            async for chunk in analysis_service.reply_to_comment(
+                prompt_history, context_data, current_user, db
+            ):
+                full_response += chunk
+                yield sse_event("token", {"content": chunk})
+            finished = True
+            reply_list = _append_message(db, comment_id, _message("ai", full_response))
+            thread_summarizer.maybe_schedule(comment_id, reply_list, summary_upto)
+            yield sse_event(
+                "done",
+                {
+                    "status": "replied",
+                    "ai_response": full_response,
+                    "reply_list": reply_list,
+                },
+            )
+        except Exception as e:
+            logger.exception("AI Generation failed")
+            yield sse_event(
+                "error", {"status": "saved_user_reply_only", "error": str(e)}
+            )
+        finally:
+            if not finished and full_response:
+                # Disconnected or failed mid-reply: keep what was generated
+                metrics.incr("comments.reply_stream.partial")
+                _append_message(
+                    db, comment_id, _message("ai", full_response, partial=True)
+                )
+
+    handle = reply_streams.start()
+    return StreamingResponse(
+        reply_streams.guard(handle, stream(), http_request),
+        media_type="text/event-stream",
+    )
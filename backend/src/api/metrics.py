@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+
+from src.api.articles import get_current_user
+from src.core.metrics import metrics
+from src.models.user import User
+
+router = APIRouter()
+
+
+@router.get("/")
+def get_metrics(current_user: User = Depends(get_current_user)):
+    # Counters (cache hits/misses, ...), timing summaries and gauges,
+    # for capacity planning
+    return metrics.snapshot()
@@ -1,10 +1,12 @@
-from pydantic_settings import BaseSettings
 from functools import lru_cache
 
+from pydantic_settings import BaseSettings
+
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Aura"
     API_V1_STR: str = "/api/v1"
-    
+
     POSTGRES_SERVER: str = "localhost"
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
@@ -13,13 +15,111 @@ class Settings(BaseSettings):
 
     SECRET_KEY: str = "YOUR_SECRET_KEY_HERE"
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200 # 30 days
-    
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200  # 30 days
+
     AI_PROVIDER: str = "deepseek"
     DEEPSEEK_API_KEY: str = ""
     OPENAI_API_KEY: str = ""
     AI_MODEL: str = ""
 
+    # Provider pool: AI_PROVIDER is the primary, the rest are used for routing/failover
+    AI_FALLBACK_PROVIDERS: str = ""  # comma-separated builtin names, e.g. "openai"
+    # JSON: [{"name", "base_url", "api_key", "model"}]
+    AI_EXTRA_PROVIDERS: list[dict] = []
+    AI_EWMA_ALPHA: float = 0.2
+    # Assumed TTFT for providers without samples yet
+    AI_DEFAULT_TTFT_SECONDS: float = 1.0
+    AI_CIRCUIT_FAILURE_THRESHOLD: int = 3
+    AI_CIRCUIT_COOLDOWN_SECONDS: float = 30.0
+    # Send interactive calls to a second provider when slow
+    AI_HEDGE_ENABLED: bool = False
+    AI_HEDGE_DELAY_MS: float = 0  # 0 = use the primary's observed p95 TTFT
+    AI_HEDGE_DEFAULT_DELAY_MS: float = 1500  # until enough TTFT samples exist
+
+    # Shared HTTP connection pool used for all provider calls
+    AI_HTTP_MAX_CONNECTIONS: int = 100
+    AI_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    AI_HTTP_KEEPALIVE_EXPIRY: float = 60.0  # seconds
+    AI_HTTP2: bool = True  # falls back to HTTP/1.1 if the h2 package is missing
+    AI_HTTP_CONNECT_TIMEOUT: float = 5.0
+    AI_HTTP_READ_TIMEOUT: float = 60.0
+
+    # Response cache for identical analysis prompts
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_MAX_ENTRIES: int = 2048
+    AI_CACHE_TTL_SECONDS: int = 3600
+    # Also store entries in the ai_cache_entries table
+    AI_CACHE_PERSISTENT: bool = False
+    AI_EXTRACTION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    # Memory scans run in workers: share results across restarts
+    AI_EXTRACTION_CACHE_PERSISTENT: bool = True
+
+    # Coalesce identical in-flight provider requests into one upstream call
+    AI_SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Shared dispatcher in front of every provider call
+    AI_MAX_CONCURRENCY: int = 8  # concurrent upstream streams per process
+    AI_RATE_LIMIT_RPM: float = 300  # requests per minute per provider, 0 = unlimited
+    AI_RATE_LIMIT_BURST: int = 20
+    # Interrupt memory scans / almanac when users are waiting
+    AI_PREEMPT_BACKGROUND: bool = True
+
+    # Memories injected into analysis / reply prompts
+    AI_MEMORY_TOP_K: int = 12  # most relevant memories for the current text
+    AI_MEMORY_PINNED_LIMIT: int = 5  # locked / high-confidence memories always included
+
+    # Estimated prompt token budgets per call type
+    AI_ANALYSIS_PROMPT_BUDGET: int = 6000
+    AI_REPLY_PROMPT_BUDGET: int = 6000
+    AI_EXTRACTION_PROMPT_BUDGET: int = 12000
+    AI_REVIEW_PROMPT_BUDGET: int = 12000
+    # Long articles are extracted in chunks of about this size
+    AI_EXTRACTION_CHUNK_TOKENS: int = 3000
+
+    # Whole-document review (/ai/review/stream)
+    # Upper bound for the max_comments a client may ask for
+    AI_REVIEW_MAX_COMMENTS: int = 8
+
+    # Incremental (paragraph diff) analysis sessions per (user, article)
+    AI_ANALYSIS_SESSION_MAX: int = 10000
+    AI_ANALYSIS_SESSION_TTL_SECONDS: int = 3600
+    # Unchanged neighbour paragraphs sent around each change
+    AI_ANALYSIS_DIFF_WINDOW: int = 1
+
+    # Background memory scan (scan_jobs queue, see src/workers/scan.py)
+    # true: the API only enqueues, `python -m src.workers.scan` processes.
+    # false (development only): the API drains the queue itself, on its event loop
+    AI_SCAN_EXTERNAL_WORKERS: bool = True
+    # Jobs (users) processed at the same time per worker process
+    AI_SCAN_CONCURRENCY: int = 4
+    # Per job; older articles first, the rest in a follow-up job
+    AI_SCAN_ARTICLES_PER_TICK: int = 5
+    # A job whose worker stops heartbeating is retried after this
+    AI_SCAN_LEASE_SECONDS: int = 300
+    AI_SCAN_MAX_ATTEMPTS: int = 5
+    AI_SCAN_BACKOFF_SECONDS: float = 30  # doubled per failed attempt
+    AI_SCAN_BACKOFF_MAX_SECONDS: float = 3600
+    AI_SCAN_POLL_SECONDS: float = 5  # worker sleep when the queue is empty
+    AI_SCAN_JOB_RETENTION_HOURS: int = 24  # finished jobs kept for inspection
+
+    # Local pre-filter that answers NO_COMMENT without a provider call
+    AI_PREFILTER_ENABLED: bool = True
+    AI_PREFILTER_MIN_WORDS: int = 3  # space-separated scripts
+    AI_PREFILTER_MIN_CJK_CHARS: int = 5  # Chinese / Japanese / Korean
+    AI_PREFILTER_MIN_ENTROPY: float = 2.0  # bits per character; "hahahaha", "!!!!!!"
+    # Smaller edits since the last analysis are skipped
+    AI_PREFILTER_MIN_EDIT_CHARS: int = 8
+    # Skipped texts re-checked by the model to count false negatives
+    AI_PREFILTER_SAMPLE_RATE: float = 0.02
+
+    # Long comment threads: older turns are folded into a stored summary
+    # Estimated tokens of unsummarized older turns before compacting
+    AI_THREAD_SUMMARY_THRESHOLD: int = 2000
+    AI_THREAD_KEEP_TURNS: int = 6  # most recent messages always sent verbatim
+
+    # How often a running stream checks whether its client went away
+    AI_DISCONNECT_POLL_SECONDS: float = 0.5
+
     class Config:
         env_file = ".env"
 
@@ -27,11 +127,14 @@ class Settings(BaseSettings):
     def sqlalchemy_database_url(self) -> str:
         if self.DATABASE_URL:
             return self.DATABASE_URL
-        # Fallback to SQLite for easier local testing if Postgres env vars aren't set/working
+        # Fallback to SQLite for easier local testing if Postgres env vars aren't
+        # set/working
         return "sqlite:///./sql_app.db"
 
+
 @lru_cache
 def get_settings():
     return Settings()
 
+
 settings = get_settings()
@@ -0,0 +1,84 @@
+import threading
+from collections import defaultdict, deque
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry.
+    counters: monotonically increasing values (hits, misses, cancellations...)
+    timings: recent samples per name, summarized as count/avg/p50/p95/p99/max
+    gauges: callables evaluated on snapshot (queue depth, cache size...)
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._timings = defaultdict(
+            lambda: {
+                "count": 0,
+                "sum": 0.0,
+                "max": 0.0,
+                "samples": deque(maxlen=max_samples),
+            }
+        )
+        self._gauges = {}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            timing = self._timings[name]
+            timing["count"] += 1
+            timing["sum"] += value
+            timing["max"] = max(timing["max"], value)
+            timing["samples"].append(value)
+
+    def gauge(self, name: str, fn):
+        self._gauges[name] = fn
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {}
+            for name, timing in self._timings.items():
+                samples = sorted(timing["samples"])
+                timings[name] = {
+                    "count": timing["count"],
+                    "avg": timing["sum"] / timing["count"] if timing["count"] else 0.0,
+                    "p50": percentile(samples, 50),
+                    "p95": percentile(samples, 95),
+                    "p99": percentile(samples, 99),
+                    "max": timing["max"],
+                }
+
+        gauges = {}
+        for name, fn in self._gauges.items():
+            try:
+                gauges[name] = fn()
+            except Exception:
+                gauges[name] = None
+
+        return {"counters": counters, "timings": timings, "gauges": gauges}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+def percentile(sorted_samples: list, pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(
+        len(sorted_samples) - 1, max(0, round(pct / 100 * len(sorted_samples)) - 1)
+    )
+    return sorted_samples[index]
+
+
+metrics = Metrics()
@@ -0,0 +1,7 @@
+import json
+
+
+def sse_event(event: str, data) -> str:
+    # One Server-Sent Events frame; `data` is JSON so chunks may contain newlines
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -1,6 +1,21 @@
-from .user import User
+from .ai_cache import AICacheEntry
+from .almanac import Almanac
 from .article import Article
 from .comment import Comment
-from .memory import Memory
-from .almanac import Almanac
 from .event import Event
+from .folder import Folder
+from .memory import Memory
+from .scan_job import ScanJob
+from .user import User
+
+__all__ = [
+    "AICacheEntry",
+    "Almanac",
+    "Article",
+    "Comment",
+    "Event",
+    "Folder",
+    "Memory",
+    "ScanJob",
+    "User",
+]
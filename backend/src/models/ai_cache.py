@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String, Text
+
+from src.core.database import Base
+
+
+class AICacheEntry(Base):
+    __tablename__ = "ai_cache_entries"
+
+    key = Column(String, primary_key=True)  # sha256 of namespace + request fingerprint
+    namespace = Column(String, index=True, nullable=False)  # e.g. "analysis"
+    value = Column(Text, nullable=False)  # full completion text
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True, nullable=True)
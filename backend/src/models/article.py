@@ -1,21 +1,60 @@
-from sqlalchemy import Column, String, Boolean, JSON, DateTime, ForeignKey, Integer
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
 from src.core.database import Base
 
+
 class Article(Base):
     __tablename__ = "articles"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    folder_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True)
     title = Column(String, nullable=False)
     content = Column(JSON, default={})
     position = Column(Integer, default=0)
+    # Plain-text projection of content (services/tiptap.py), maintained by the
+    # ArticleService
+    content_text = Column(Text, nullable=True)
+    word_count = Column(Integer, default=0, server_default="0", nullable=False)
+    char_count = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_scanned_at = Column(DateTime, nullable=True)
+    # Fingerprint of the plain text (tiptap.text_fingerprint), set on write and
+    # recorded per scan
+    content_fingerprint = Column(String(40), nullable=True)
+    last_scanned_fingerprint = Column(String(40), nullable=True)
+    # Hashes of the text chunks covered by memory scans; only other chunks are
+    # extracted again
+    scan_chunk_hashes = Column(JSON, nullable=True)
     is_deleted = Column(Boolean, default=False)
 
     user = relationship("User", backref="articles")
+
+    __table_args__ = (
+        # Sidebar order, used for keyset pagination
+        # (see ArticleService.get_article_summaries)
+        Index(
+            "ix_articles_user_order",
+            user_id,
+            is_deleted,
+            position,
+            updated_at.desc(),
+            id,
+        ),
+    )
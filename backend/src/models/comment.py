@@ -1,10 +1,13 @@
-from sqlalchemy import Column, String, ForeignKey, JSON, DateTime
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from datetime import datetime
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
 from src.core.database import Base
 
+
 class Comment(Base):
     __tablename__ = "comments"
 
@@ -12,11 +15,16 @@ class Comment(Base):
     article_id = Column(UUID(as_uuid=True), ForeignKey("articles.id"), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     quote = Column(String, nullable=True)
-    range = Column(JSON, nullable=True) # {from: int, to: int}
+    range = Column(JSON, nullable=True)  # {from: int, to: int}
     content = Column(String, nullable=False)
-    type = Column(String, default="suggestion") # praise, criticism, suggestion
+    type = Column(String, default="suggestion")  # praise, criticism, suggestion
     status = Column(String, default="active")
-    reply = Column(JSON, default=[]) # [{role: "user" | "ai", content: str, timestamp: str}]
+    # [{role: "user" | "ai", content: str, timestamp: str}]
+    reply = Column(JSON, default=[])
+    # Rolling summary of reply[:reply_summary_upto],
+    # maintained in the background for long threads
+    reply_summary = Column(Text, nullable=True)
+    reply_summary_upto = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     author = relationship("User", back_populates="comments")
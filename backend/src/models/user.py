@@ -1,10 +1,13 @@
-from sqlalchemy import Column, String, Boolean, JSON, DateTime
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
+
+from sqlalchemy import JSON, Boolean, Column, DateTime, Index, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
 from src.core.database import Base
 
+
 class User(Base):
     __tablename__ = "users"
 
@@ -16,9 +19,18 @@ class User(Base):
     # settings structure: { "ai_enabled": bool, "ai_frequency": "low"|"medium"|"high" }
     settings = Column(JSON, default={"ai_enabled": True, "ai_frequency": "medium"})
     is_scanning_memories = Column(Boolean, default=False)
+    # Bumped on every memory write; memory caches compare against it
+    # instead of re-querying
+    memory_version = Column(Integer, default=0, server_default="0", nullable=False)
+    # Set by article writes, cleared when a scan job is queued
+    # (see services/scan_schedule.py)
+    scan_dirty = Column(Boolean, default=False, server_default="0", nullable=False)
+    next_scan_due_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     comments = relationship("Comment", back_populates="author")
     memories = relationship("Memory", back_populates="owner")
     events = relationship("Event", back_populates="owner")
+
+    __table_args__ = (Index("ix_users_scan_due", "scan_dirty", "next_scan_due_at"),)
@@ -1,24 +1,57 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
+from pydantic import BaseModel
+
+
 class ArticleBase(BaseModel):
     title: str
     content: Optional[Dict[str, Any]] = {}
 
+
 class ArticleCreate(ArticleBase):
     pass
 
+
 class ArticleUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[Dict[str, Any]] = None
 
+
 class Article(ArticleBase):
     id: UUID
     user_id: UUID
     created_at: datetime
     updated_at: datetime
+    word_count: int = 0
+    char_count: int = 0
 
     class Config:
         from_attributes = True
+
+
+class ArticleMove(BaseModel):
+    after_id: Optional[UUID] = None  # article it goes right below; None: to the top
+
+
+class ArticleSearchResult(BaseModel):
+    id: UUID
+    title: str
+    snippet: str  # HTML-escaped body excerpt, matches wrapped in <mark>
+    updated_at: datetime
+
+
+class ArticleSummary(BaseModel):
+    id: UUID
+    title: str
+    position: Optional[int] = 0
+    folder_id: Optional[UUID] = None
+    created_at: Optional[datetime] = None
+    updated_at: datetime
+    excerpt: str = ""
+
+
+class ArticleSummaryPage(BaseModel):
+    items: List[ArticleSummary]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
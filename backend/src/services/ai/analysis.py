@@ -1,104 +1,322 @@
-from .client import ai_client
 from sqlalchemy.orm import Session
+
+from src.core.config import settings
 from src.models.user import User
-from src.services.ai.memory_worker import memory_service
+from src.services.ai.memory_index import memory_index
+from src.services.ai.prompt import PromptBuilder
+
+from .cache import analysis_cache, replay_chunks
+from .client import ai_client, request_fingerprint
+from .dispatcher import Priority
+from .providers import Provider
+
+
+def _cache_key(messages: list[dict], provider: Provider) -> str:
+    # Answers are stored under the provider and model that produced them
+    return request_fingerprint(messages, f"{provider.name}:{provider.model}")
+
 
 class AIAnalysisService:
-    async def analyze_text(self, text: str, context: str = "", user: User = None, db: Session = None, existing_quotes: list[str] = None):
+    async def analyze_text(
+        self,
+        text: str,
+        context: str = "",
+        user: User = None,
+        db: Session = None,
+        existing_quotes: list[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        use_cache: bool = True,
+    ):
+        """
+        Stream one comment on `text`. use_cache=False neither replays nor stores an
+        answer (for probes that must not show up in users' results).
+        """
         system_prompt = (
             "You are a helpful writing assistant. Provide comments on the text. "
-            "Please detect the language of the user's text and respond in the same language. "
-            "If the text is in Chinese, respond in Chinese. If the text is in English, respond in English."
-            "\n\nIMPORTANT: Please provide ONLY ONE comment for the most significant part of the text that needs improvement.\n"
-            "Or if you find a specific part particularly interesting or well-written, give a simple encouragement.\n"
+            "Please detect the language of the user's text and respond in the same "
+            "language. If the text is in Chinese, respond in Chinese. "
+            "If the text is in English, respond in English."
+            "\n\nIMPORTANT: Please provide ONLY ONE comment for the most significant "
+            "part of the text that needs improvement.\n"
+            "Or if you find a specific part particularly interesting or well-written, "
+            "give a simple encouragement.\n"
             "The core goal is to make the user feel you are USEFUL and INTERESTING.\n"
             "EMOTIONAL SUPPORT GUIDELINES:\n"
             "- If the user expresses SADNESS: Tell a gentle joke to lighten the mood.\n"
             "- If the user expresses LONELINESS: Offer warm companionship.\n"
             "- Make the user feel APPRECIATED and cared for.\n"
             "- DO NOT PREACH or lecture the user.\n"
-            "Quality over quantity. If there is nothing worth commenting on (neither improvement nor encouragement), do NOT output any comment.\n"
-            "If the user's text is meaningless (e.g., random characters like 'xsdef', simple punctuation '?!', or too short/vague), output >> NO_COMMENT.\n"
+            "Quality over quantity. If there is nothing worth commenting on (neither "
+            "improvement nor encouragement), do NOT output any comment.\n"
+            "If the user's text is meaningless (e.g., random characters like 'xsdef', "
+            "simple punctuation '?!', or too short/vague), output >> NO_COMMENT.\n"
             "\nOutput in this exact format:\n"
             ">> QUOTE: <exact substring from text>\n"
             ">> COMMENT: <your comment>\n"
-            "If you have a general comment (only if no specific part needs comment), use:\n"
+            "If you have a general comment (only if no specific part needs "
+            "comment), use:\n"
             ">> QUOTE: NONE\n"
             ">> COMMENT: <your comment>\n"
             "If NO comment is needed, output exactly:\n"
             ">> NO_COMMENT\n"
-            "Do not use markdown formatting for these headers. Do not output multiple comments."
+            "Do not use markdown formatting for these headers. "
+            "Do not output multiple comments."
+        )
+
+        messages = self._document_messages(
+            "analysis",
+            settings.AI_ANALYSIS_PROMPT_BUDGET,
+            system_prompt,
+            text,
+            context,
+            user,
+            db,
+            existing_quotes,
         )
 
+        # Identical prompt (same text, context, quotes and memories) for the provider
+        # that would answer it now: replay the stored answer
+        if use_cache:
+            expected = ai_client.pool.ranked()[0]
+            cached = await analysis_cache.get(_cache_key(messages, expected))
+            if cached is not None:
+                for chunk in replay_chunks(cached):
+                    yield chunk
+                return
+
+        completion = []
+        served = {}
+        stream = ai_client.stream_chat_completion(messages, priority, served=served)
+        async for chunk in stream:
+            completion.append(chunk)
+            yield chunk
+
+        # Only reached when the stream finished normally (not on client disconnect).
+        # A failover or hedge answer is keyed on the provider that actually served it.
+        if use_cache and completion and "provider" in served:
+            cache_key = _cache_key(messages, served["provider"])
+            await analysis_cache.set(cache_key, "".join(completion))
+
+    def _document_messages(
+        self,
+        name: str,
+        budget: int,
+        system_prompt: str,
+        text: str,
+        context: str,
+        user: User,
+        db: Session,
+        existing_quotes: list[str],
+    ) -> list[dict]:
+        quotes_str = ""
         if existing_quotes and len(existing_quotes) > 0:
             quotes_str = "\n".join([f"- {q}" for q in existing_quotes])
-            system_prompt += f"\n\nIMPORTANT: The following parts of the text have ALREADY been commented on. DO NOT comment on them again:\n{quotes_str}"
-        
+
+        memory_context = ""
         # Inject Memory if user exists
         if user and db:
-            memories = memory_service.get_memories(db, user.id)
-            if memories:
-                # Pass ALL memories to the AI
-                sorted_memories = sorted(
-                    memories, 
-                    key=lambda m: (m.confidence or 0, m.updated_at or m.created_at), 
-                    reverse=True
-                )
-                
-                memory_context = "\n".join([f"- {m.key}: {m.value} (Confidence: {m.confidence}, Updated: {m.updated_at or m.created_at})" for m in sorted_memories])
-                system_prompt += f"\n\nHere is EVERYTHING we know about the user's preferences. You can refer to these preferences in your comments to the user, BUT do so naturally (e.g., 'Since you like concise writing...'), avoiding phrases like 'According to my memory' or 'I know that you...'.:\n{memory_context}"
-
-        messages = [
+            # Only pinned memories plus the ones relevant to this text, not the whole
+            # bank. Already ordered by importance, so budget truncation drops the least
+            # relevant.
+            memory_context = memory_index.context(
+                db, user, f"{context}\n{text}", detail=True
+            )
+
+        # Fill the token budget:
+        # instructions > text > existing quotes > memories > context.
+        # An over-long text keeps its end, which is where the user is writing.
+        parts, _ = (
+            PromptBuilder(name, budget)
+            .add("instructions", system_prompt, required=True)
+            .add("text", text, truncate="tail")
+            .add("quotes", quotes_str, truncate="lines")
+            .add("memories", memory_context, truncate="lines")
+            .add("context", context)
+            .build()
+        )
+
+        if parts["quotes"]:
+            system_prompt += (
+                "\n\nIMPORTANT: The following parts of the text have ALREADY been "
+                f"commented on. DO NOT comment on them again:\n{parts['quotes']}"
+            )
+        if parts["memories"]:
+            system_prompt += (
+                "\n\nHere is what we know about the user's preferences that may be "
+                "relevant. You can refer to these preferences in your comments to the "
+                "user, BUT do so naturally (e.g., 'Since you like concise "
+                "writing...'), avoiding phrases like 'According to my memory' or 'I "
+                f"know that you...'.:\n{parts['memories']}"
+            )
+
+        return [
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Context: {context}\n\nText: {text}"}
+            {
+                "role": "user",
+                "content": f"Context: {parts['context']}\n\nText: {parts['text']}",
+            },
         ]
 
+    async def review_document(
+        self,
+        text: str,
+        context: str = "",
+        user: User = None,
+        db: Session = None,
+        existing_quotes: list[str] = None,
+        max_comments: int = 5,
+    ):
+        """
+        Whole-document review: up to `max_comments` comments on distinct parts of the
+        text in one call.
+        Same >> QUOTE / >> COMMENT format as analyze_text, repeated once per comment.
+        """
+        system_prompt = (
+            "You are a helpful writing assistant reviewing a whole document. "
+            "Please detect the language of the user's text and respond in the same "
+            "language. If the text is in Chinese, respond in Chinese. "
+            "If the text is in English, respond in English."
+            f"\n\nIMPORTANT: Provide AT MOST {max_comments} comments, each on a "
+            "DIFFERENT part of the text. Quotes must not overlap.\n"
+            "Order them by importance. Mix improvements with encouragement where a "
+            "part is particularly interesting or well-written.\n"
+            "The core goal is to make the user feel you are USEFUL and INTERESTING.\n"
+            "- DO NOT PREACH or lecture the user.\n"
+            "Quality over quantity: "
+            "fewer good comments are better than many weak ones.\n"
+            "If the text is meaningless or nothing is worth commenting on, "
+            "output >> NO_COMMENT.\n"
+            "\nOutput each comment in this exact format:\n"
+            ">> QUOTE: <exact substring from text>\n"
+            ">> COMMENT: <your comment>\n"
+            "For a general comment about the whole text use:\n"
+            ">> QUOTE: NONE\n"
+            ">> COMMENT: <your comment>\n"
+            "If NO comment is needed, output exactly:\n"
+            ">> NO_COMMENT\n"
+            "Do not use markdown formatting for these headers."
+        )
+        messages = self._document_messages(
+            "review",
+            settings.AI_REVIEW_PROMPT_BUDGET,
+            system_prompt,
+            text,
+            context,
+            user,
+            db,
+            existing_quotes,
+        )
         async for chunk in ai_client.stream_chat_completion(messages):
             yield chunk
 
-    async def reply_to_comment(self, conversation_history: list[dict], context_data: dict, user: User = None, db: Session = None):
+    async def reply_to_comment(
+        self,
+        conversation_history: list[dict],
+        context_data: dict,
+        user: User = None,
+        db: Session = None,
+    ):
         """
         Generate a reply to a user's comment in a thread.
-        conversation_history: list of {role: 'user'|'ai', content: str}
-        context_data: {quote: str, original_suggestion: str}
+        conversation_history: list of {role: 'user'|'ai', content: str},
+            without turns already in the summary
+        context_data: {quote: str, original_suggestion: str, thread_summary: str | None}
         """
         system_prompt = (
-            "You are a helpful and interesting assistant. You previously provided a comment (suggestion, encouragement, or joke) for a specific text.\n"
+            "You are a helpful and interesting assistant. You previously provided a "
+            "comment (suggestion, encouragement, or joke) for a specific text.\n"
             "Now you are discussing this comment with the user.\n"
-            "Goal: Engage with the user based on your previous comment. If it was a suggestion, help them improve. If it was a joke or encouragement, continue the warm conversation.\n"
-            "If the user wants to talk about other topics, feel free to follow them and have a natural conversation about whatever they're interested in.\n"
-            "Do NOT repeatedly mention your original comment once the conversation has shifted to other topics.\n"
+            "Goal: Engage with the user based on your previous comment. If it was a "
+            "suggestion, help them improve. If it was a joke or encouragement, "
+            "continue the warm conversation.\n"
+            "If the user wants to talk about other topics, feel free to follow them "
+            "and have a natural conversation about whatever they're interested in.\n"
+            "Do NOT repeatedly mention your original comment once the conversation has "
+            "shifted to other topics.\n"
             "Style: Concise, professional, and encouraging.\n"
-            "Please detect the language of the user's latest reply and respond in the same language."
+            "Please detect the language of the user's latest reply and respond in the "
+            "same language."
         )
 
+        # Context about the original suggestion
+        context_msg = (
+            f"Original Text (Quote): \"{context_data.get('quote', '')}\"\n"
+            "Your Original Suggestion: "
+            f"\"{context_data.get('original_suggestion', '')}\"\n"
+        )
+        thread_summary = context_data.get("thread_summary") or ""
+        latest = conversation_history[-1:]
+        older = conversation_history[:-1]
+
+        memory_context = ""
         # Inject Memory if user exists
         if user and db:
-            memories = memory_service.get_memories(db, user.id)
-            if memories:
-                memory_context = "\n".join([f"- {m.key}: {m.value}" for m in memories])
-                system_prompt += (
-                    f"\n\nKeep in mind the user's preferences:\n{memory_context}\n"
-                    "You can refer to these preferences in your comments to the user, BUT do so naturally (e.g., 'Since you like concise writing...'), "
-                    "avoiding phrases like 'According to my memory' or 'I know that you...'."
-                )
+            last_user_message = next(
+                (
+                    m["content"]
+                    for m in reversed(conversation_history)
+                    if m["role"] == "user"
+                ),
+                "",
+            )
+            query = (
+                f"{context_data.get('quote', '')}\n"
+                f"{context_data.get('original_suggestion', '')}\n{last_user_message}"
+            )
+            memory_context = memory_index.context(db, user, query)
+
+        # Fill the token budget: instructions > original context > latest turn >
+        # thread summary > memories > older turns (newest first)
+        parts, _ = (
+            PromptBuilder("reply", settings.AI_REPLY_PROMPT_BUDGET)
+            .add("instructions", system_prompt, required=True)
+            .add("context", context_msg)
+            .add("latest", "\n".join(m["content"] for m in latest), required=True)
+            .add("summary", thread_summary)
+            .add("memories", memory_context, truncate="lines")
+            .add("history", [m["content"] for m in older], truncate="oldest")
+            .build()
+        )
+
+        if parts["memories"]:
+            system_prompt += (
+                f"\n\nKeep in mind the user's preferences:\n{parts['memories']}\n"
+                "You can refer to these preferences in your comments to the user, BUT "
+                "do so naturally (e.g., 'Since you like concise writing...'), "
+                "avoiding phrases like 'According to my memory' or "
+                "'I know that you...'."
+            )
 
         messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add context about the original suggestion
-        context_msg = (
-            f"Original Text (Quote): \"{context_data.get('quote', '')}\"\n"
-            f"Your Original Suggestion: \"{context_data.get('original_suggestion', '')}\"\n"
+        context_block = parts["context"]
+        if parts["summary"]:
+            context_block += (
+                f"\nSummary of our earlier discussion:\n{parts['summary']}\n"
+            )
+        messages.append(
+            {
+                "role": "user",
+                "content": (
+                    f"Context:\n{context_block}\n\n(Conversation follows below...)"
+                ),
+            }
+        )
+        messages.append(
+            {
+                "role": "assistant",
+                "content": "Understood. I'm ready to discuss this suggestion.",
+            }
         )
-        messages.append({"role": "user", "content": f"Context:\n{context_msg}\n\n(Conversation follows below...)"})
-        messages.append({"role": "assistant", "content": "Understood. I'm ready to discuss this suggestion."})
 
-        # Append history
-        for msg in conversation_history:
+        # Append history (older turns that didn't fit the budget are dropped first)
+        kept = len(parts["history"])
+        kept_history = older[len(older) - kept :] if kept else []
+        for msg in kept_history + latest:
             role = "user" if msg["role"] == "user" else "assistant"
             messages.append({"role": role, "content": msg["content"]})
 
-        async for chunk in ai_client.stream_chat_completion(messages):
+        async for chunk in ai_client.stream_chat_completion(messages, Priority.REPLY):
             yield chunk
 
+
 analysis_service = AIAnalysisService()
@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from uuid import UUID
+
+from src.core.config import settings
+from src.core.metrics import metrics
+
+GAP_MARKER = "[...]"
+
+
+def paragraph_hash(paragraph: str) -> str:
+    return hashlib.sha1(paragraph.strip().encode("utf-8")).hexdigest()
+
+
+class AnalysisSession:
+    def __init__(self):
+        # Latest known document, updated on every request
+        self.paragraphs: list[str] = []
+        # Paragraph hashes covered by a completed analysis
+        self.analyzed: set[str] = set()
+        self.touched_at = time.monotonic()
+
+
+class AnalysisSessionStore:
+    """
+    Per-(user, article) editor analysis state, kept in process memory.
+    Remembers which paragraphs the model has already seen, so follow-up requests
+    only send new/changed paragraphs plus a small window of neighbours.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: OrderedDict[tuple[UUID, UUID], AnalysisSession] = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.gauge("analysis_sessions.size", lambda: len(self._sessions))
+
+    def get(self, user_id: UUID, article_id: UUID) -> AnalysisSession | None:
+        with self._lock:
+            key = (user_id, article_id)
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if time.monotonic() - session.touched_at > self.ttl_seconds:
+                del self._sessions[key]
+                return None
+            self._sessions.move_to_end(key)
+            return session
+
+    def get_or_create(self, user_id: UUID, article_id: UUID) -> AnalysisSession:
+        session = self.get(user_id, article_id)
+        if session is not None:
+            return session
+        with self._lock:
+            session = AnalysisSession()
+            self._sessions[(user_id, article_id)] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def update(self, session: AnalysisSession, paragraphs: list[str]):
+        session.paragraphs = paragraphs
+        session.touched_at = time.monotonic()
+
+    def mark_analyzed(self, session: AnalysisSession, paragraphs: list[str]):
+        # Only hashes still in the document are worth remembering
+        session.analyzed = {paragraph_hash(p) for p in paragraphs if p.strip()}
+
+
+def apply_splices(paragraphs: list[str], splices: list) -> list[str]:
+    # splices: [{start, delete_count, insert: [str]}], applied in order
+    result = list(paragraphs)
+    for splice in splices:
+        start = max(0, min(splice.start, len(result)))
+        result[start : start + max(0, splice.delete_count)] = list(splice.insert)
+    return result
+
+
+def focus_text(
+    paragraphs: list[str], analyzed: set[str], window: int
+) -> tuple[str, int]:
+    """
+    Text made of the paragraphs not covered by a previous analysis, plus `window`
+    neighbours on each side for context; skipped stretches become a gap marker.
+    Returns (text, number of changed paragraphs).
+    """
+    changed = [
+        i
+        for i, p in enumerate(paragraphs)
+        if p.strip() and paragraph_hash(p) not in analyzed
+    ]
+    if not changed:
+        return "", 0
+
+    keep = set()
+    for i in changed:
+        keep.update(range(max(0, i - window), min(len(paragraphs), i + window + 1)))
+
+    lines = []
+    previous = -1
+    for i in sorted(keep):
+        if i != previous + 1 and lines:
+            lines.append(GAP_MARKER)
+        lines.append(paragraphs[i])
+        previous = i
+    return "\n".join(lines), len(changed)
+
+
+analysis_sessions = AnalysisSessionStore(
+    max_sessions=settings.AI_ANALYSIS_SESSION_MAX,
+    ttl_seconds=settings.AI_ANALYSIS_SESSION_TTL_SECONDS,
+)
@@ -1,250 +1,81 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from src.models.user import User
+
+from src.core.config import settings
+from src.core.metrics import metrics
 from src.models.article import Article
 from src.models.memory import Memory
-from src.services.ai.memory_worker import memory_service
+from src.models.user import User
+from src.services import tiptap
+from src.services.ai.cache import extraction_cache
+from src.services.ai.chunking import ArticleChunk, article_chunks, merge_changes
 from src.services.ai.client import ai_client
-from datetime import datetime, timedelta
-import json
-import logging
+from src.services.ai.dispatcher import Priority
+from src.services.ai.memory_index import memory_index
+from src.services.ai.memory_worker import UserMemories, memory_service
+from src.services.ai.prompt import PromptBuilder, estimate_tokens, render_memories_json
+from src.services.scan_queue import scan_queue
+from src.services.scan_schedule import (
+    is_scan_incomplete,
+    scan_incomplete,
+    scan_interval,
+    scan_schedule,
+    skip_older_than,
+    text_changed_since_scan,
+)
 
 logger = logging.getLogger(__name__)
 
-class BackgroundScanner:
-    async def scan_all_users(self, db: Session):
-        users = db.query(User).filter(User.is_active == True).all()
-        for user in users:
-            await self.scan_user_articles(db, user)
-
-    async def scan_user_articles(self, db: Session, user: User):
-        settings = user.settings or {}
-        bg_scan = settings.get("background_scan", {})
-        
-        if not bg_scan.get("enabled", False):
-            return
-
-        # Check scan interval
-        # ... (keep existing interval check logic) ...
-        # But we need to update the interval check to rely on the articles query,
-        # OR we can just check if there are ANY candidates.
-        # Let's proceed to query first.
-        
-        interval_unit = bg_scan.get("interval_unit", "hours")
-        interval_value = bg_scan.get("interval_value", 24)
-        
-        scan_delta = timedelta(hours=24)
-        if interval_unit == "minutes":
-            scan_delta = timedelta(minutes=interval_value)
-        elif interval_unit == "hours":
-            scan_delta = timedelta(hours=interval_value)
-        elif interval_unit == "days":
-            scan_delta = timedelta(days=interval_value)
-
-        # Skip older than
-        skip_unit = bg_scan.get("skip_older_than_unit", "days")
-        skip_value = bg_scan.get("skip_older_than_value", 14)
-        
-        skip_delta = timedelta(days=14)
-        if skip_unit == "days":
-            skip_delta = timedelta(days=skip_value)
-        elif skip_unit == "months":
-            skip_delta = timedelta(days=skip_value * 30) # Approx
-        elif skip_unit == "years":
-            skip_delta = timedelta(days=skip_value * 365) # Approx
-            
-        cutoff_date = datetime.utcnow() - skip_delta
-        
-        scan_threshold = datetime.utcnow() - scan_delta
-        
-        # Check latest system memory update time
-        # We only care about memories updated by "system"
-        latest_system_memory = db.query(Memory).filter(
-            Memory.user_id == user.id,
-            Memory.updated_by == "system"
-        ).order_by(Memory.updated_at.desc()).first()
-        
-        latest_system_memory_time = latest_system_memory.updated_at if latest_system_memory else datetime.min
-        
-        # We also need to check if there are any articles updated AFTER the latest system memory update
-        # If all articles are older than the latest system memory update, we skip scanning
-        # However, we must be careful: if we have a NEW article, or an updated article, we want to scan it.
-        # The logic is: find candidate articles first.
-        
-        articles = db.query(Article).filter(
-            Article.user_id == user.id,
-            Article.is_deleted == False,
-            Article.updated_at >= cutoff_date,
-            or_(
-                Article.last_scanned_at == None,
-                and_(
-                    Article.last_scanned_at < scan_threshold,
-                    Article.updated_at > Article.last_scanned_at
-                )
-            )
-        ).order_by(Article.updated_at.asc()).all()
-        
-        if not articles:
-            return
-            
-        # Optimization: If the latest article update is OLDER than the latest system memory update,
-        # it implies we have already "processed" the knowledge up to that point (assuming sequential processing).
-        # But wait, what if we changed the extraction logic? Or what if we missed something?
-        # The user's request is: "if all articles' latest update time is earlier than the latest time of any rule last edited by system, then do not trigger".
-        
-        latest_article_update = max([a.updated_at for a in articles]) if articles else datetime.min
-        
-        if latest_article_update < latest_system_memory_time:
-            # All candidate articles are older than the last system memory update.
-            # This suggests we are up to date.
-            logger.info(f"Skipping scan for user {user.id}: Latest article ({latest_article_update}) is older than latest system memory ({latest_system_memory_time})")
-            return
-
-        # Fetch all existing memories for context
-        all_memories = db.query(Memory).filter(Memory.user_id == user.id).all()
-        
-        # Set scanning flag
-        user.is_scanning_memories = True
-        db.commit()
-        
-        try:
-            # We must process chronologically (Oldest -> Newest) to build up knowledge correctly
-            for article in articles:
-                # Refresh memories context if needed, but for performance we might just use the initial set 
-                # and update it locally as we go. However, since add_memory commits to DB, 
-                # we can re-query or just append to our local list.
-                # Re-querying is safer for consistency.
-                current_memories = db.query(Memory).filter(Memory.user_id == user.id).all()
-                await self.process_article(db, user, article, current_memories)
-        finally:
-            # Clear scanning flag
-            user.is_scanning_memories = False
-            db.commit()
-
-    async def process_article(self, db: Session, user: User, article: Article, existing_memories: list[Memory]):
-        logger.info(f"Scanning article {article.id} for user {user.id}")
-        
-        content = self._get_article_text(article)
-        if not content:
-            # Mark scanned even if empty so we don't retry immediately
-            article.last_scanned_at = datetime.utcnow()
-            db.commit()
-            return
-
-        extracted_changes = await self._extract_memories(content, article, existing_memories)
-        
-        for change in extracted_changes:
-            # change: {action, key, content, emoji, category, confidence}
-            action = change.get("action")
-            key = change.get("key")
-            
-            if not key or not action:
-                continue
-                
-            existing = next((m for m in existing_memories if m.key == key), None)
-            
-            if existing and existing.is_locked:
-                # LOCKED RULE: Do not modify, delete, or merge.
-                continue
-                
-            if action == "delete" and existing:
-                # Delete memory
-                db.delete(existing)
-                
-            elif action in ["create", "update"]:
-                # Create or Update
-                value = {
-                    "content": change.get("content"),
-                    "emoji": change.get("emoji", "📝")
-                }
-                memory_service.add_memory(
-                    db, 
-                    user.id, 
-                    key, 
-                    value, 
-                    confidence=change.get("confidence", "medium"), 
-                    category=change.get("category", "knowledge"),
-                    source_article_id=article.id
-                )
-        
-        article.last_scanned_at = datetime.utcnow()
-        db.commit()
-
-    def _get_article_text(self, article: Article) -> str:
-        # Article content is JSON (TipTap format usually)
-        # We need to extract plain text
-        if not article.content:
-            return ""
-        
-        try:
-            # Simple recursive extraction for TipTap JSON
-            def extract_text(node):
-                text = ""
-                if node.get("type") == "text":
-                    text += node.get("text", "")
-                
-                if "content" in node:
-                    for child in node["content"]:
-                        text += extract_text(child) + "\n"
-                return text
-            
-            return extract_text(article.content)
-        except:
-            return ""
-
-    async def _extract_memories(self, text: str, article: Article, existing_memories: list[Memory]):
-        # Prepare existing memories for context
-        # We need to serialize them to JSON-compatible format
-        # Format: {key, content, updated_at, is_locked, confidence}
-        context_memories = []
-        for m in existing_memories:
-            context_memories.append({
-                "key": m.key,
-                "content": m.value.get("content", ""),
-                "updated_at": m.updated_at.isoformat() if m.updated_at else None,
-                "is_locked": m.is_locked,
-                "confidence": m.confidence
-            })
-            
-        context_json = json.dumps(context_memories, indent=2)
-        
-        # Calculate current timestamp and article timestamp in ISO format
-        # Use simple string replacement to indicate UTC, avoiding timezone object complexities in different envs
-        current_time_iso = datetime.utcnow().isoformat() + "Z"
-        article_time_iso = (article.updated_at.isoformat() + "Z") if article.updated_at else (datetime.utcnow().isoformat() + "Z")
-
-        prompt = f"""
+EXTRACTION_PROMPT = """
 You are a butler managing the user's knowledge base.
 Your task is to analyze the following article and update the user's memory bank.
-Goal: Build a deep understanding of the user to ensure satisfaction and provide effective support.
+Goal: Build a deep understanding of the user to ensure satisfaction and provide
+effective support.
 
 Context:
-- Current Date (UTC): {current_time_iso}
-- Article Last Updated (UTC): {article_time_iso}
-- Existing Memories:
-{context_json}
+- Current Date (UTC): {current_time}
+- Article Last Updated (UTC): {article_time}
+- Existing Memories (one JSON object per line):
+{memories}
 
 Instructions:
 1. Analyze the text to identify key facts, preferences, or events.
 2. Compare them with the "Existing Memories".
-   - Focus on user's social relationships, psychological state, profession/age, daily habits, hobbies, communication style, routine tasks, and domain knowledge.
+   - Focus on user's social relationships, psychological state, profession/age, daily
+     habits, hobbies, communication style, routine tasks, and domain knowledge.
    - Aim to build a detailed and comprehensive user profile.
 3. Decide on an action for each relevant finding:
    - "create": If it's a new fact not present in existing memories.
-   - "update": If it contradicts or refines a NON-LOCKED existing memory, AND the article is newer/more relevant. 
-     * Example: If existing memory says "User likes X" (old), and text says "User likes Y" (new), update it.
-     * Example: If memory says "User is peaceful", and newer article shows "User is a warmonger", update it (Conflict: Peaceful -> Warmonger).
-     * Note: Contradictions are expected as people change; prioritize the newer article's information.
+   - "update": If it contradicts or refines a NON-LOCKED existing memory, AND the
+     article is newer/more relevant.
+     * Example: If existing memory says "User likes X" (old), and text says
+       "User likes Y" (new), update it.
+     * Example: If memory says "User is peaceful", and newer article shows
+       "User is a warmonger", update it (Conflict: Peaceful -> Warmonger).
+     * Note: Contradictions are expected as people change; prioritize the newer
+       article's information.
      * DO NOT update if the existing memory is LOCKED.
-     * DO NOT update if the meaning is highly similar (e.g., "User likes cats" vs "User is fond of cats").
-   - "delete": If the text explicitly invalidates a memory (e.g., "I no longer like X"), it's NOT LOCKED, AND the article is newer than the memory. Example: If memory says "User likes X", and a newer article says "User no longer likes X", delete it.
+     * DO NOT update if the meaning is highly similar (e.g., "User likes cats" vs
+       "User is fond of cats").
+   - "delete": If the text explicitly invalidates a memory (e.g., "I no longer like X"),
+     it's NOT LOCKED, AND the article is newer than the memory. Example: If memory says
+     "User likes X", and a newer article says "User no longer likes X", delete it.
    - "none": If the fact is already covered, or conflicts with a LOCKED rule.
    
    IMPORTANT: 
    - Only extract information from the "Text to Analyze" section. 
-   - Be proactive in capturing personal details, preferences, and strong statements, even if they seem simple (e.g. "I like women").
+   - Be proactive in capturing personal details, preferences, and strong statements,
+     even if they seem simple (e.g. "I like women").
    - Extract the memory content in the same language as the article text.
-   - DO NOT extract any rules or meta-instructions from this prompt itself (e.g., do not create a rule about "User communicates with minimal responses" if it's not in the "Text to Analyze").
+   - DO NOT extract any rules or meta-instructions from this prompt itself (e.g., do not
+     create a rule about "User communicates with minimal responses" if it's not in the
+     "Text to Analyze").
    - If no valid changes are found, return an empty list [].
 
 4. Return a JSON list of actions.
@@ -262,25 +93,300 @@ Response Format (JSON only):
 ]
 
 Text to Analyze:
-{text[:20000]}
+{text}
 """
+# Part of the extraction cache key: editing the prompt invalidates cached results
+_prompt_hash = hashlib.sha1(EXTRACTION_PROMPT.encode("utf-8")).hexdigest()
+EXTRACTION_PROMPT_VERSION = _prompt_hash[:12]
+
+
+class BackgroundScanner:
+    def enqueue_scans(self, db: Session) -> int:
+        """
+        Queue a scan job for every user whose article writes are due for a scan
+        (see workers/scan.py).
+        """
+        due = scan_schedule.due_users(db)
+        queued = [user_id for user_id in due if scan_queue.enqueue(db, user_id)]
+        # Users with a job already running stay marked and are picked up once it
+        # finishes
+        scan_schedule.clear(db, queued)
+        return len(queued)
+
+    async def scan_user_articles(
+        self, db: Session, user: User, budget: int | None = None, backlog: bool = False
+    ) -> bool:
+        """
+        Scan the user's changed articles, oldest first, at most `budget` of them.
+        backlog: continuation of a scan that stopped at the budget.
+        Returns True if articles are left for a follow-up scan.
+        """
+        user_settings = user.settings or {}
+        bg_scan = user_settings.get("background_scan", {})
+
+        if not bg_scan.get("enabled", False):
+            return False
+
+        scan_delta = scan_interval(bg_scan)
+        skip_delta = skip_older_than(bg_scan)
+        cutoff_date = datetime.utcnow() - skip_delta
+        scan_threshold = datetime.utcnow() - scan_delta
+
+        # Check latest system memory update time
+        # We only care about memories updated by "system"
+        latest_system_memory = (
+            db.query(Memory)
+            .filter(Memory.user_id == user.id, Memory.updated_by == "system")
+            .order_by(Memory.updated_at.desc())
+            .first()
+        )
+
+        latest_system_memory_time = (
+            latest_system_memory.updated_at if latest_system_memory else datetime.min
+        )
+
+        # We also need to check if there are any articles updated AFTER the latest
+        # system memory update. If all articles are older than the latest system memory
+        # update, we skip scanning. However, we must be careful: if we have a NEW
+        # article, or an updated article, we want to scan it.
+        # The logic is: find candidate articles first.
+
+        articles = (
+            db.query(Article)
+            .filter(
+                Article.user_id == user.id,
+                Article.is_deleted.is_(False),
+                Article.updated_at >= cutoff_date,
+                or_(
+                    Article.last_scanned_at.is_(None),
+                    and_(
+                        Article.last_scanned_at < scan_threshold,
+                        or_(
+                            Article.updated_at > Article.last_scanned_at,
+                            scan_incomplete(),
+                        ),
+                    ),
+                ),
+                text_changed_since_scan(),
+            )
+            .order_by(Article.updated_at.asc())
+            .all()
+        )
+
+        if not articles:
+            return False
+
+        # Optimization: If the latest article update is OLDER than the latest system
+        # memory update, it implies we have already "processed" the knowledge up to that
+        # point (assuming sequential processing).
+        # But wait, what if we changed the extraction logic? Or what if we missed
+        # something? The user's request is: "if all articles' latest update time is
+        # earlier than the latest time of any rule last edited by system, then do not
+        # trigger".
+
+        latest_article_update = (
+            max([a.updated_at for a in articles]) if articles else datetime.min
+        )
+
+        # A backlog left by the article budget was already judged worth scanning; its
+        # first batch just bumped the system memory time. So were articles with failed
+        # chunks.
+        retrying = any(is_scan_incomplete(article) for article in articles)
+        up_to_date = latest_article_update < latest_system_memory_time
+        if up_to_date and not (backlog or retrying):
+            # All candidate articles are older than the last system memory update.
+            # This suggests we are up to date.
+            logger.info(
+                f"Skipping scan for user {user.id}: Latest article "
+                f"({latest_article_update}) is older than latest system memory "
+                f"({latest_system_memory_time})"
+            )
+            return False
+
+        # Oldest first; the rest goes to a follow-up job behind other users' jobs
+        has_more = bool(budget) and len(articles) > budget
+        if has_more:
+            articles = articles[:budget]
+
+        # Set scanning flag
+        user.is_scanning_memories = True
+        db.commit()
+
+        # Memories are loaded once and kept current across the articles; objects aren't
+        # expired on each article's commit so the map doesn't reload row by row
+        expire_on_commit, db.expire_on_commit = db.expire_on_commit, False
+        try:
+            memories = UserMemories(db, user.id)
+            # We must process chronologically (Oldest -> Newest) to build up knowledge
+            # correctly
+            for article in articles:
+                await self.process_article(db, user, article, memories)
+                metrics.incr("scan.articles")
+        finally:
+            # Clear scanning flag
+            user.is_scanning_memories = False
+            db.commit()
+            db.expire_on_commit = expire_on_commit
+        return has_more
+
+    async def process_article(
+        self, db: Session, user: User, article: Article, memories: UserMemories
+    ):
+        logger.info(f"Scanning article {article.id} for user {user.id}")
+
+        chunks = article_chunks(article.content, settings.AI_EXTRACTION_CHUNK_TOKENS)
+        scanned = set(article.scan_chunk_hashes or [])
+        changed = [chunk for chunk in chunks if chunk.hash not in scanned]
+        metrics.incr("scan.chunks", len(chunks))
+        metrics.incr("scan.chunks_extracted", len(changed))
+
+        # Chunks are extracted concurrently; the dispatcher bounds upstream concurrency
+        existing = memories.values()
+        tasks = [
+            asyncio.create_task(
+                self._extract_memories(chunk, len(chunks), article, existing)
+            )
+            for chunk in changed
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # A chunk failed (or the scan was cancelled): stop the other provider calls
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        extracted = [result for result in results if result is not None]
+        extracted_changes = merge_changes(extracted)
+        # Chunks whose output couldn't be parsed are retried after the scan interval
+        failed = {
+            chunk.hash for chunk, result in zip(changed, results) if result is None
+        }
+
+        # The extraction calls took a while: pick up memories the user edited or
+        # locked meanwhile, then apply everything in the same transaction as the
+        # article's scan checkpoint
+        memories.refresh_if_changed()
+        change_set = memory_service.stage_changes(
+            db, memories, extracted_changes, source_article_id=article.id
+        )
+
+        article.scan_chunk_hashes = [
+            chunk.hash for chunk in chunks if chunk.hash not in failed
+        ]
+        if not article.content_fingerprint:
+            article.content_fingerprint = tiptap.text_fingerprint(
+                article.content_text or tiptap.to_text(article.content)
+            )
+        # No fingerprint marks the scan incomplete: the article stays a candidate (see
+        # scan_incomplete) and last_scanned_at spaces out the retries like any rescan
+        fingerprint = None if failed else article.content_fingerprint
+        article.last_scanned_fingerprint = fingerprint
+        article.last_scanned_at = datetime.utcnow()
+        db.commit()
+        memory_index.apply_changes(change_set)
+
+    async def _extract_memories(
+        self,
+        chunk: ArticleChunk,
+        chunk_count: int,
+        article: Article,
+        existing_memories: list[Memory],
+    ) -> list | None:
+        """
+        Changes extracted from one chunk of the article, or None if the response
+        couldn't be parsed.
+        """
+        text = chunk.text
+        if chunk_count > 1:
+            text = f"[Part {chunk.index + 1} of {chunk_count} of the article]\n{text}"
+        # Calculate current timestamp and article timestamp in ISO format
+        # Use simple string replacement to indicate UTC, avoiding timezone object
+        # complexities in different envs
+        current_time_iso = datetime.utcnow().isoformat() + "Z"
+        article_time_iso = (
+            (article.updated_at.isoformat() + "Z")
+            if article.updated_at
+            else (datetime.utcnow().isoformat() + "Z")
+        )
+
+        # Existing memories as compact JSON lines; locked and recent ones first so
+        # budget truncation drops the oldest unlocked memories
+        ordered_memories = sorted(
+            existing_memories,
+            key=lambda m: (
+                bool(m.is_locked),
+                m.updated_at or m.created_at or datetime.min,
+            ),
+            reverse=True,
+        )
+        memories_text = render_memories_json(ordered_memories)
+
+        budget = settings.AI_EXTRACTION_PROMPT_BUDGET
+        instructions = EXTRACTION_PROMPT.format(
+            current_time=current_time_iso,
+            article_time=article_time_iso,
+            memories="",
+            text="",
+        )
+        # Keep room for the memory context so a long article can't crowd it out entirely
+        memory_reserve = min(estimate_tokens(memories_text), budget * 35 // 100)
+        parts, _ = (
+            PromptBuilder("extraction", budget)
+            .add("instructions", instructions, required=True)
+            .add(
+                "text",
+                text,
+                max_tokens=budget - estimate_tokens(instructions) - memory_reserve,
+            )
+            .add("memories", memories_text, truncate="lines")
+            .build()
+        )
+
+        prompt = EXTRACTION_PROMPT.format(
+            current_time=current_time_iso,
+            article_time=article_time_iso,
+            memories=parts["memories"],
+            text=parts["text"],
+        )
         messages = [{"role": "user", "content": prompt}]
-        
-        logger.info(f"[Memory Extraction] Request for article {article.id}:\n{prompt}")
-        
-        response_content = ""
-        async for chunk in ai_client.stream_chat_completion(messages):
-            response_content += chunk
-            
-        logger.info(f"[Memory Extraction] Response for article {article.id}:\n{response_content}")
+
+        # Same chunk text against the same memories: reuse the earlier result
+        # (timestamps aside)
+        memories_hash = hashlib.sha1(parts["memories"].encode("utf-8")).hexdigest()
+        cache_key = ":".join(
+            [EXTRACTION_PROMPT_VERSION, ai_client.model, chunk.hash, memories_hash]
+        )
+        cached = await extraction_cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+
+        logger.info(
+            f"[Memory Extraction] Request for article {article.id} "
+            f"(part {chunk.index + 1}/{chunk_count}):\n{prompt}"
+        )
+
+        response_content = await ai_client.complete(messages, Priority.BACKGROUND)
+
+        logger.info(
+            f"[Memory Extraction] Response for article {article.id}:\n"
+            f"{response_content}"
+        )
 
         # Parse JSON
         try:
             # Clean up potential markdown code blocks
-            clean_content = response_content.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_content)
+            clean_content = (
+                response_content.replace("```json", "").replace("```", "").strip()
+            )
+            changes = json.loads(clean_content)
         except Exception as e:
             logger.error(f"Failed to parse memory extraction JSON: {e}")
-            return []
+            metrics.incr("scan.parse_errors")
+            return None
+        changes = changes if isinstance(changes, list) else []
+        await extraction_cache.set(cache_key, json.dumps(changes, ensure_ascii=False))
+        return changes
+
 
 background_scanner = BackgroundScanner()
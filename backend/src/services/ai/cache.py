@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.core.config import settings
+from src.core.database import SessionLocal
+from src.core.metrics import metrics
+from src.models.ai_cache import AICacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for completed LLM responses.
+    Tier 1 is a size-bounded in-process LRU with TTL; tier 2 (optional) is the
+    ai_cache_entries table, so entries survive restarts and are shared between
+    API processes on the same database. Its queries run in the threadpool, so a
+    lookup never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int,
+        ttl_seconds: float,
+        persistent: bool = False,
+        enabled: bool = True,
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self.enabled = enabled
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.gauge(f"cache.{namespace}.size", lambda: len(self._entries))
+
+    def _storage_key(self, key: str) -> str:
+        return hashlib.sha256(f"{self.namespace}:{key}".encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+
+        value = self._get_local(key)
+        if value is None and self.persistent:
+            value = await run_in_threadpool(self._get_persistent, key)
+            if value is not None:
+                self._set_local(key, value)
+
+        metrics.incr(f"cache.{self.namespace}.{'hit' if value is not None else 'miss'}")
+        return value
+
+    async def set(self, key: str, value: str):
+        if not self.enabled:
+            return
+        self._set_local(key, value)
+        if self.persistent:
+            await run_in_threadpool(self._set_persistent, key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_local(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_persistent(self, key: str) -> str | None:
+        db = SessionLocal()
+        try:
+            entry = (
+                db.query(AICacheEntry)
+                .filter(AICacheEntry.key == self._storage_key(key))
+                .first()
+            )
+            if entry is None:
+                return None
+            if entry.expires_at and entry.expires_at < datetime.utcnow():
+                db.delete(entry)
+                db.commit()
+                return None
+            return entry.value
+        except Exception as e:
+            logger.warning(f"Persistent cache lookup failed for {self.namespace}: {e}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def _set_persistent(self, key: str, value: str):
+        db = SessionLocal()
+        try:
+            db.merge(
+                AICacheEntry(
+                    key=self._storage_key(key),
+                    namespace=self.namespace,
+                    value=value,
+                    created_at=datetime.utcnow(),
+                    expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+                )
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Persistent cache write failed for {self.namespace}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+
+def replay_chunks(completion: str):
+    # Replay line by line so a cached answer streams the same way a live one does
+    return completion.splitlines(keepends=True) or [completion]
+
+
+analysis_cache = ResponseCache(
+    "analysis",
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AI_CACHE_TTL_SECONDS,
+    persistent=settings.AI_CACHE_PERSISTENT,
+    enabled=settings.AI_CACHE_ENABLED,
+)
+
+# Memory extraction results: keyed by chunk text, memory context and prompt version
+extraction_cache = ResponseCache(
+    "extraction",
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AI_EXTRACTION_CACHE_TTL_SECONDS,
+    persistent=settings.AI_EXTRACTION_CACHE_PERSISTENT,
+    enabled=settings.AI_CACHE_ENABLED,
+)
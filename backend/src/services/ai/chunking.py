@@ -0,0 +1,99 @@
+import hashlib
+import re
+
+from src.services.ai.prompt import estimate_tokens
+from src.services.tiptap import block_texts
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s*")
+
+
+class ArticleChunk:
+    def __init__(self, index: int, text: str):
+        self.index = index
+        self.text = text
+        self.hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _split_oversized(text: str, max_tokens: int) -> list[str]:
+    # A single block bigger than a chunk: cut between sentences, or by length as a
+    # last resort
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    pieces, current = [], ""
+    for sentence in _SENTENCE_RE.split(text):
+        if (
+            current
+            and estimate_tokens(current) + estimate_tokens(sentence) > max_tokens
+        ):
+            pieces.append(current)
+            current = ""
+        while estimate_tokens(sentence) > max_tokens:
+            # max_tokens characters never exceed max_tokens tokens
+            pieces.append(sentence[:max_tokens])
+            sentence = sentence[max_tokens:]
+        if (
+            current
+            and estimate_tokens(current) + estimate_tokens(sentence) > max_tokens
+        ):
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _is_cut_point(block: str) -> bool:
+    # Content-defined: depends only on the block itself, not on its position in
+    # the article
+    return int(hashlib.sha1(block.encode("utf-8")).hexdigest()[:8], 16) % 4 == 0
+
+
+def chunk_blocks(blocks: list[str], target_tokens: int) -> list[ArticleChunk]:
+    """
+    Group blocks into chunks of at most ~target_tokens, never splitting a block that
+    fits. Past half the target, chunks end at content-defined cut points, so an edit
+    only moves the boundaries next to it and the other chunks keep their hashes.
+    """
+    chunks, current, size = [], [], 0
+
+    def flush():
+        nonlocal current, size
+        if current:
+            chunks.append(ArticleChunk(len(chunks), "\n".join(current)))
+        current, size = [], 0
+
+    for block in blocks:
+        for piece in _split_oversized(block, target_tokens - 1):
+            tokens = estimate_tokens(piece) + 1  # joining newline
+            if current and size + tokens > target_tokens:
+                flush()
+            current.append(piece)
+            size += tokens
+            if size >= target_tokens // 2 and _is_cut_point(piece):
+                flush()
+    flush()
+    return chunks
+
+
+def article_chunks(content, target_tokens: int) -> list[ArticleChunk]:
+    return chunk_blocks(block_texts(content), target_tokens)
+
+
+def merge_changes(change_lists: list[list]) -> list[dict]:
+    """
+    Combine per-chunk extraction results given in document order.
+    The last change for a key wins (later text in the article is the more recent
+    statement); keys keep the order they first appeared in, so the result doesn't
+    depend on completion order.
+    """
+    merged: dict[str, dict] = {}
+    for changes in change_lists:
+        for change in changes if isinstance(changes, list) else []:
+            if not isinstance(change, dict):
+                continue
+            key, action = change.get("key"), change.get("action")
+            if not key or action not in ("create", "update", "delete"):
+                continue
+            merged[key] = change
+    return list(merged.values())
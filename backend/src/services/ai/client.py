@@ -1,64 +1,402 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
 import httpx
+
 from src.core.config import settings
-import json
-import asyncio
+from src.core.metrics import metrics
+from src.services.ai.dispatcher import PREEMPTIBLE, Preempted, Priority, dispatcher
+from src.services.ai.providers import Provider, ProviderPool
+
+logger = logging.getLogger(__name__)
+
+
+def request_fingerprint(messages: list, model: str, **options) -> str:
+    # Cache key: stable hash of the assembled prompt + model (+ request options)
+    payload = json.dumps(
+        {"model": model, "messages": messages, **options},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 class AIClient:
-    def __init__(self):
-        self.provider = settings.AI_PROVIDER.lower()
-        self.api_key = self._get_api_key()
-        self.base_url = self._get_base_url()
-        self.model = self._get_model()
-
-    def _get_api_key(self):
-        if self.provider == "deepseek":
-            return settings.DEEPSEEK_API_KEY
-        elif self.provider == "openai":
-            return settings.OPENAI_API_KEY
-        return ""
-
-    def _get_base_url(self):
-        if self.provider == "deepseek":
-            return "https://api.deepseek.com/v1"
-        elif self.provider == "openai":
-            return "https://api.openai.com/v1"
-        return ""
-
-    def _get_model(self):
-        if settings.AI_MODEL:
-            return settings.AI_MODEL
-        if self.provider == "deepseek":
-            return "deepseek-chat"
-        elif self.provider == "openai":
-            return "gpt-3.5-turbo"
-        return ""
-
-    async def stream_chat_completion(self, messages: list):
-        if not self.api_key or self.api_key in ["", "your_key_here", "your-deepseek-api-key-here", "your-openai-api-key-here"]:
-            mock_responses = ["Thinking...", "Analyzing...", "Suggestion: This paragraph flows well!"]
+    def __init__(
+        self, pool: ProviderPool | None = None, http: httpx.AsyncClient | None = None
+    ):
+        self.pool = pool or ProviderPool.from_settings()
+        # The primary provider's identity is what cache keys and logs refer to
+        self.provider = self.pool.primary.name
+        self.model = self.pool.primary.model
+        # Long-lived pooled client, created on app startup (or lazily on first use
+        # for scripts and tests that never run the FastAPI lifecycle hooks)
+        self._http: httpx.AsyncClient | None = http
+        # fingerprint -> in-flight upstream stream shared by identical requests
+        self._inflight: dict[str, _Flight] = {}
+
+    def _build_http_client(self) -> httpx.AsyncClient:
+        http2 = settings.AI_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning(
+                    "AI_HTTP2 is enabled but the 'h2' package is not installed, "
+                    "using HTTP/1.1"
+                )
+                http2 = False
+
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.AI_HTTP_READ_TIMEOUT,
+                connect=settings.AI_HTTP_CONNECT_TIMEOUT,
+            ),
+        )
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = self._build_http_client()
+        return self._http
+
+    async def startup(self):
+        # Open the pool up front so the first request doesn't pay for it
+        self.http
+
+    async def aclose(self):
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
+    async def complete(
+        self, messages: list, priority: Priority = Priority.INTERACTIVE, **options
+    ) -> str:
+        chunks = self.stream_chat_completion(messages, priority, **options)
+        return "".join([chunk async for chunk in chunks])
+
+    async def stream_chat_completion(
+        self,
+        messages: list,
+        priority: Priority = Priority.INTERACTIVE,
+        served: dict | None = None,
+        **options,
+    ):
+        """
+        Stream completion chunks for `messages`.
+        priority: dispatcher class of the caller (see dispatcher.Priority)
+        served: if given, served["provider"] is set to the Provider that produced the
+            answer (after failover or hedging it isn't necessarily the primary)
+        options: extra request body fields, e.g. response_format={"type": "json_object"}
+        """
+        if not settings.AI_SINGLE_FLIGHT_ENABLED:
+            stream = self._stream_upstream(messages, priority, options, served)
+            async for chunk in stream:
+                yield chunk
+            return
+
+        # Identical requests already in flight share one upstream call: late callers
+        # first get the chunks produced so far, then follow the live tail.
+        # Priority is part of the key so a user never waits behind a preemptible flight.
+        fingerprint = (
+            f"{request_fingerprint(messages, self.model, **options)}:{int(priority)}"
+        )
+        flight = self._inflight.get(fingerprint)
+        if flight is None:
+            flight = _Flight()
+            self._inflight[fingerprint] = flight
+            flight.task = asyncio.create_task(
+                self._run_flight(fingerprint, flight, messages, priority, options)
+            )
+            metrics.incr("ai.singleflight.leader")
+        else:
+            metrics.incr("ai.singleflight.coalesced")
+
+        flight.subscribers += 1
+        try:
+            index = 0
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    if served is not None:
+                        served.update(flight.served)
+                    return
+                await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is reading anymore -> stop paying for the upstream stream
+                if self._inflight.get(fingerprint) is flight:
+                    del self._inflight[fingerprint]
+                flight.task.cancel()
+
+    async def _run_flight(
+        self,
+        fingerprint: str,
+        flight: "_Flight",
+        messages: list,
+        priority: Priority,
+        options: dict,
+    ):
+        try:
+            stream = self._stream_upstream(messages, priority, options, flight.served)
+            async for chunk in stream:
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            if self._inflight.get(fingerprint) is flight:
+                del self._inflight[fingerprint]
+            flight.notify()
+
+    async def _stream_upstream(
+        self, messages: list, priority: Priority, options: dict, served: dict | None
+    ):
+        if priority in PREEMPTIBLE:
+            # Preemptible work is buffered and only released once complete, so it can be
+            # dropped and restarted from scratch whenever interactive traffic needs it.
+            while True:
+                try:
+                    stream = self._stream_routed(
+                        messages, priority, options, served=served
+                    )
+                    buffered = [chunk async for chunk in stream]
+                except Preempted:
+                    continue
+                for chunk in buffered:
+                    yield chunk
+                return
+
+        if (
+            priority == Priority.INTERACTIVE
+            and settings.AI_HEDGE_ENABLED
+            and len(self.pool.providers) > 1
+        ):
+            stream = self._stream_hedged(messages, priority, options, served)
+        else:
+            stream = self._stream_routed(messages, priority, options, served=served)
+        async for chunk in stream:
+            yield chunk
+
+    async def _stream_routed(
+        self,
+        messages: list,
+        priority: Priority,
+        options: dict,
+        providers: list[Provider] | None = None,
+        served: dict | None = None,
+    ):
+        # Best provider first; fail over to the next one while nothing was yielded yet
+        last_error = None
+        for provider in providers if providers is not None else self.pool.ranked():
+            yielded = False
+            try:
+                async for chunk in self._stream_attempt(
+                    provider, messages, priority, options
+                ):
+                    if not yielded and served is not None:
+                        served["provider"] = provider
+                    yielded = True
+                    yield chunk
+                return
+            except Preempted:
+                raise
+            except Exception as e:
+                if yielded:
+                    raise
+                last_error = e
+                logger.warning(f"Provider {provider.name} failed, trying next: {e}")
+                metrics.incr("ai.failover")
+        raise last_error or RuntimeError("No AI provider available")
+
+    async def _stream_attempt(
+        self, provider: Provider, messages: list, priority: Priority, options: dict
+    ):
+        async with dispatcher.slot(priority, provider.name) as lease:
+            if provider.circuit == "half_open":
+                provider.probing = True
+            started = time.monotonic()
+            first = True
+            try:
+                async for chunk in self._stream_provider(provider, messages, options):
+                    if lease.preempted:
+                        raise Preempted()
+                    if first:
+                        provider.record_ttft(time.monotonic() - started)
+                        first = False
+                    yield chunk
+            except (Preempted, asyncio.CancelledError, GeneratorExit):
+                provider.probing = False
+                raise
+            except Exception:
+                provider.record_failure()
+                raise
+            provider.record_success()
+
+    async def _stream_hedged(
+        self, messages: list, priority: Priority, options: dict, served: dict | None
+    ):
+        """
+        Start on the best provider; if no token arrives within the hedge delay (or it
+        fails first), send the same request to the runner-up. Whichever produces the
+        first token wins and the other stream is cancelled.
+        """
+        ranked = self.pool.ranked()
+        if len(ranked) < 2:
+            stream = self._stream_routed(messages, priority, options, ranked, served)
+            async for chunk in stream:
+                yield chunk
+            return
+
+        primary, secondary = ranked[0], ranked[1]
+        delay_ms = settings.AI_HEDGE_DELAY_MS
+        if not delay_ms:
+            p95 = primary.p95_ttft()
+            delay_ms = (
+                p95 * 1000 if p95 is not None else settings.AI_HEDGE_DEFAULT_DELAY_MS
+            )
+        deadline = time.monotonic() + delay_ms / 1000
+
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        # Which provider each side ended up on; the winner's is reported as served
+        routes = {"primary": {}, "hedge": {}}
+
+        async def pump(tag: str, providers: list[Provider]):
+            try:
+                async for chunk in self._stream_routed(
+                    messages, priority, options, providers, routes[tag]
+                ):
+                    await queue.put((tag, chunk))
+                await queue.put((tag, done))
+            except Exception as e:
+                await queue.put((tag, e))
+
+        tasks = {
+            "primary": asyncio.create_task(pump("primary", [primary] + ranked[2:]))
+        }
+        failed = set()
+        winner = None
+
+        def start_hedge():
+            metrics.incr("ai.hedge.fired")
+            tasks["hedge"] = asyncio.create_task(pump("hedge", [secondary]))
+
+        try:
+            while True:
+                timeout = None
+                if winner is None and "hedge" not in tasks:
+                    timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    tag, item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    start_hedge()
+                    continue
+
+                if winner is not None and tag != winner:
+                    continue
+                if isinstance(item, BaseException):
+                    if winner is not None:
+                        raise item
+                    failed.add(tag)
+                    if "hedge" not in tasks:
+                        start_hedge()
+                    elif len(failed) == len(tasks):
+                        raise item
+                    continue
+                if winner is None:
+                    winner = tag
+                    if served is not None:
+                        served.update(routes[tag])
+                    for other, task in tasks.items():
+                        if other != tag:
+                            task.cancel()
+                    if tag == "hedge":
+                        metrics.incr("ai.hedge.won")
+                if item is done:
+                    return
+                yield item
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def _stream_provider(self, provider: Provider, messages: list, options: dict):
+        if provider.is_mock:
+            mock_responses = [
+                "Thinking...",
+                "Analyzing...",
+                "Suggestion: This paragraph flows well!",
+            ]
             for resp in mock_responses:
                 await asyncio.sleep(0.5)
                 yield resp
             return
 
-        async with httpx.AsyncClient() as client:
-            async with client.stream(
-                "POST", 
-                f"{self.base_url}/chat/completions",
-                headers={"Authorization": f"Bearer {self.api_key}"},
-                json={"model": self.model, "messages": messages, "stream": True}
-            ) as response:
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data = line[6:]
-                        if data == "[DONE]":
-                            break
-                        try:
-                            json_data = json.loads(data)
-                            content = json_data["choices"][0]["delta"].get("content", "")
-                            if content:
-                                yield content
-                        except:
-                            pass
+        headers = {}
+        if provider.has_key:
+            headers["Authorization"] = f"Bearer {provider.api_key}"
+        async with self.http.stream(
+            "POST",
+            f"{provider.base_url}/chat/completions",
+            headers=headers,
+            json={
+                "model": provider.model,
+                "messages": messages,
+                "stream": True,
+                **options,
+            },
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data = line[6:]
+                    if data == "[DONE]":
+                        break
+                    try:
+                        json_data = json.loads(data)
+                        content = json_data["choices"][0]["delta"].get("content", "")
+                    except Exception:
+                        continue  # malformed chunk
+                    if content:
+                        yield content
+
+
+class _Flight:
+    # One upstream stream shared by every caller with the same request fingerprint
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.task: asyncio.Task | None = None
+        self.served: dict = {}
+        self._event = asyncio.Event()
+
+    def notify(self):
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self):
+        await self._event.wait()
+
 
 ai_client = AIClient()
@@ -0,0 +1,198 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+
+from src.core.config import settings
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    # Lower value = served first
+    INTERACTIVE = 0  # editor analysis while the user types
+    REPLY = 1  # comment thread replies
+    BACKGROUND = 2  # memory scans
+    ALMANAC = 3  # daily almanac refresh
+
+
+# Work the user isn't waiting on; it may be interrupted and retried later
+PREEMPTIBLE = {Priority.BACKGROUND, Priority.ALMANAC}
+
+
+class Preempted(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return  # unlimited
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Lease:
+    def __init__(self, priority: Priority, provider: str):
+        self.priority = priority
+        self.provider = provider
+        self.started_at = time.monotonic()
+        self.preempted = False
+
+
+class LLMDispatcher:
+    """
+    Single gate in front of every provider call.
+    - a fixed number of concurrency slots shared by all callers
+    - a token bucket per provider (requests per minute)
+    - waiting callers are served by priority class, FIFO within a class
+    - when interactive work is queued, running preemptible work is asked to stop
+      (see Lease.preempted) so the slot frees up as soon as possible
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        rate_limit_rpm: float,
+        rate_limit_burst: int,
+        preempt: bool = True,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limit_rpm = rate_limit_rpm
+        self.rate_limit_burst = rate_limit_burst
+        self.preempt = preempt
+        # Slots taken, including ones granted to waiters that haven't resumed yet
+        self._in_use = 0
+        self._active: set[Lease] = set()
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._buckets: dict[str, TokenBucket] = {}
+
+        metrics.gauge("dispatcher.active", lambda: len(self._active))
+        metrics.gauge("dispatcher.queue_depth", lambda: self.queue_depth())
+        for priority in Priority:
+            metrics.gauge(
+                f"dispatcher.queue_depth.{priority.name.lower()}",
+                lambda p=priority: self.queue_depth(p),
+            )
+
+    def queue_depth(self, priority: Priority | None = None) -> int:
+        return sum(
+            1
+            for p, _, fut in self._waiters
+            if not fut.done() and (priority is None or p == priority)
+        )
+
+    def _bucket(self, provider: str) -> TokenBucket:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_limit_rpm, self.rate_limit_burst)
+            self._buckets[provider] = bucket
+        return bucket
+
+    async def acquire(self, priority: Priority, provider: str) -> Lease:
+        started = time.monotonic()
+        lease = Lease(priority, provider)
+
+        # Take a free slot right away unless someone more (or equally) urgent is queued
+        free = self._in_use < self.max_concurrency
+        if free and not self._has_waiters(up_to=priority):
+            self._in_use += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (int(priority), next(self._seq), fut))
+            if priority not in PREEMPTIBLE:
+                self._preempt_for(priority)
+            try:
+                await fut  # the slot is already counted for us when this resolves
+            except asyncio.CancelledError:
+                # Granted right before being cancelled: hand the slot on
+                if fut.done() and not fut.cancelled():
+                    self._free_slot()
+                raise
+
+        self._active.add(lease)
+        try:
+            await self._bucket(provider).acquire()
+        except BaseException:
+            self.release(lease)
+            raise
+
+        metrics.observe(
+            f"dispatcher.wait_seconds.{priority.name.lower()}",
+            time.monotonic() - started,
+        )
+        lease.started_at = time.monotonic()
+        return lease
+
+    def release(self, lease: Lease):
+        if lease in self._active:
+            self._active.discard(lease)
+            self._free_slot()
+
+    def _free_slot(self):
+        self._in_use -= 1
+        while self._waiters and self._in_use < self.max_concurrency:
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue  # cancelled while waiting
+            self._in_use += 1
+            fut.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, provider: str):
+        lease = await self.acquire(priority, provider)
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    def _has_waiters(self, up_to: Priority) -> bool:
+        return any(p <= up_to and not fut.done() for p, _, fut in self._waiters)
+
+    def _preempt_for(self, priority: Priority):
+        if not self.preempt:
+            return
+        candidates = [
+            lease
+            for lease in self._active
+            if lease.priority in PREEMPTIBLE
+            and lease.priority > priority
+            and not lease.preempted
+        ]
+        if not candidates:
+            return
+        # Least urgent first, then the one that started most recently (least work lost)
+        victim = max(candidates, key=lambda lease: (lease.priority, lease.started_at))
+        victim.preempted = True
+        metrics.incr(f"dispatcher.preempted.{victim.priority.name.lower()}")
+        logger.info(
+            f"Preempting {victim.priority.name.lower()} request on {victim.provider}"
+            f" for {priority.name.lower()} traffic"
+        )
+
+
+dispatcher = LLMDispatcher(
+    max_concurrency=settings.AI_MAX_CONCURRENCY,
+    rate_limit_rpm=settings.AI_RATE_LIMIT_RPM,
+    rate_limit_burst=settings.AI_RATE_LIMIT_BURST,
+    preempt=settings.AI_PREEMPT_BACKGROUND,
+)
@@ -0,0 +1,248 @@
+import math
+import re
+import threading
+from collections import Counter
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.models.memory import Memory
+from src.models.user import User
+from src.services.ai.prompt import render_memories
+
+_LATIN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_CJK_RE = re.compile(
+    r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]+"
+)
+
+
+def tokenize(text: str) -> list[str]:
+    # Latin scripts: lowercase words. CJK (no word boundaries): overlapping bigrams.
+    text = (text or "").lower().replace("_", " ")
+    tokens = [t for t in _LATIN_RE.findall(text) if len(t) > 1]
+    for run in _CJK_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class MemoryEntry:
+    # Detached snapshot of a Memory row; safe to keep across sessions
+    def __init__(self, memory: Memory):
+        self.id = memory.id
+        self.key = memory.key
+        self.value = memory.value or {}
+        self.category = memory.category
+        self.confidence = memory.confidence
+        self.is_locked = bool(memory.is_locked)
+        self.created_at = memory.created_at
+        self.updated_at = memory.updated_at
+
+    @property
+    def content(self) -> str:
+        if isinstance(self.value, dict):
+            return str(self.value.get("content", ""))
+        return str(self.value)
+
+    @property
+    def is_pinned(self) -> bool:
+        return self.is_locked or self.confidence == "high"
+
+
+class UserMemoryIndex:
+    """BM25 over one user's memories (key + content + category), updated in place."""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.version: int | None = None  # user.memory_version this index reflects
+        self.rendered: dict[tuple, str] = {}
+        self.entries: dict[UUID, MemoryEntry] = {}
+        self._terms: dict[UUID, Counter] = {}
+        self._lengths: dict[UUID, int] = {}
+        self._df: Counter = Counter()
+        self._total_length = 0
+
+    def upsert(self, entry: MemoryEntry):
+        self.remove(entry.id)
+        terms = Counter(tokenize(f"{entry.key} {entry.content} {entry.category or ''}"))
+        self.entries[entry.id] = entry
+        self._terms[entry.id] = terms
+        self._lengths[entry.id] = sum(terms.values())
+        self._total_length += self._lengths[entry.id]
+        self._df.update(terms.keys())
+
+    def remove(self, memory_id: UUID):
+        if memory_id not in self.entries:
+            return
+        del self.entries[memory_id]
+        self._df.subtract(self._terms.pop(memory_id).keys())
+        self._df += Counter()  # drop zero counts
+        self._total_length -= self._lengths.pop(memory_id)
+
+    def search(self, query: str) -> list[tuple[float, MemoryEntry]]:
+        query_terms = set(tokenize(query))
+        n = len(self.entries)
+        if not query_terms or not n:
+            return []
+        avg_length = (self._total_length / n) or 1
+        results = []
+        for memory_id, terms in self._terms.items():
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term)
+                if not tf:
+                    continue
+                df = self._df[term]
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                norm = tf + self.K1 * (
+                    1 - self.B + self.B * self._lengths[memory_id] / avg_length
+                )
+                score += idf * tf * (self.K1 + 1) / norm
+            if score > 0:
+                results.append((score, self.entries[memory_id]))
+        results.sort(key=lambda r: r[0], reverse=True)
+        return results
+
+
+class MemoryIndex:
+    """
+    Process-local lexical index of every user's memories.
+    Built lazily per user from the DB and tagged with the user's memory_version.
+    Write paths bump the version and apply their change here; a version mismatch on read
+    (e.g. a write from another process) rebuilds the user's index.
+    """
+
+    RENDER_CACHE_SIZE = 64  # rendered memory blocks kept per user
+
+    def __init__(self):
+        self._users: dict[UUID, UserMemoryIndex] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, db: Session, user_id: UUID, version: int | None) -> UserMemoryIndex:
+        index = self._users.get(user_id)
+        if index is not None and version is not None and index.version != version:
+            metrics.incr("memory_index.stale")
+            index = None
+        if index is None:
+            metrics.incr("memory_index.build")
+            index = UserMemoryIndex()
+            for memory in db.query(Memory).filter(Memory.user_id == user_id).all():
+                index.upsert(MemoryEntry(memory))
+            index.version = version
+            self._users[user_id] = index
+        return index
+
+    def _apply(self, user_id: UUID, version: int | None, change):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                return
+            if (
+                version is not None
+                and index.version is not None
+                and version != index.version + 1
+            ):
+                # Missed a write in between: rebuild on next read
+                del self._users[user_id]
+                return
+            change(index)
+            index.version = version
+            index.rendered.clear()
+
+    def upsert(self, memory: Memory, version: int | None = None):
+        self._apply(
+            memory.user_id, version, lambda index: index.upsert(MemoryEntry(memory))
+        )
+
+    def remove(self, user_id: UUID, memory_id: UUID, version: int | None = None):
+        self._apply(user_id, version, lambda index: index.remove(memory_id))
+
+    def apply_changes(self, change_set):
+        # A committed MemoryChangeSet (memory_worker.stage_changes): one version
+        # step for the whole batch
+        if not change_set:
+            return
+
+        def change(index):
+            for entry in change_set.entries:
+                index.upsert(entry)
+            for memory_id in change_set.removed_ids:
+                index.remove(memory_id)
+
+        self._apply(change_set.user_id, change_set.version, change)
+
+    def invalidate(self, user_id: UUID):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def select(
+        self,
+        db: Session,
+        user_id: UUID,
+        query: str,
+        top_k: int | None = None,
+        pinned_limit: int | None = None,
+        version: int | None = None,
+    ) -> list[MemoryEntry]:
+        """
+        Memories worth putting in a prompt about `query`:
+        a few pinned ones (locked or high confidence) plus the top-k BM25 matches.
+        version: the user's current memory_version; skips the DB unless it changed.
+        """
+        with self._lock:
+            return self._select(
+                self._get(db, user_id, version), query, top_k, pinned_limit
+            )
+
+    def context(self, db: Session, user: User, query: str, detail: bool = False) -> str:
+        """
+        Rendered memory block for a prompt, cached per selection until the user's
+        memories change.
+        """
+        with self._lock:
+            index = self._get(db, user.id, user.memory_version)
+            selected = self._select(index, query)
+            cache_key = (detail, tuple(e.id for e in selected))
+            rendered = index.rendered.get(cache_key)
+            if rendered is None:
+                metrics.incr("memory_index.render")
+                rendered = render_memories(selected, detail=detail)
+                if len(index.rendered) >= self.RENDER_CACHE_SIZE:
+                    index.rendered.clear()
+                index.rendered[cache_key] = rendered
+            return rendered
+
+    def _select(
+        self,
+        index: UserMemoryIndex,
+        query: str,
+        top_k: int | None = None,
+        pinned_limit: int | None = None,
+    ) -> list[MemoryEntry]:
+        top_k = settings.AI_MEMORY_TOP_K if top_k is None else top_k
+        pinned_limit = (
+            settings.AI_MEMORY_PINNED_LIMIT if pinned_limit is None else pinned_limit
+        )
+
+        entries = list(index.entries.values())
+        if len(entries) <= top_k + pinned_limit:
+            return entries  # small memory banks go in whole
+
+        pinned = sorted(
+            (e for e in entries if e.is_pinned),
+            key=lambda e: (e.is_locked, e.updated_at or e.created_at),
+            reverse=True,
+        )[:pinned_limit]
+        selected_ids = {e.id for e in pinned}
+        relevant = [e for _, e in index.search(query) if e.id not in selected_ids]
+        relevant = relevant[:top_k]
+        return pinned + relevant
+
+
+memory_index = MemoryIndex()
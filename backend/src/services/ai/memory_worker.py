@@ -1,19 +1,92 @@
+import uuid
+from uuid import UUID
+
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
+
+from src.core.metrics import metrics
 from src.models.memory import Memory
-from uuid import UUID
+from src.models.user import User
+from src.services.ai.memory_index import MemoryEntry, memory_index
+
+
+class UserMemories:
+    """
+    A user's memories by key, loaded once and kept current as changes are staged
+    (e.g. across all articles of one scan) instead of re-querying per use.
+    """
+
+    def __init__(self, db: Session, user_id: UUID):
+        self.db = db
+        self.user_id = user_id
+        self.reload()
+
+    def reload(self):
+        query = self.db.query(Memory).filter(Memory.user_id == self.user_id)
+        memories = query.populate_existing().all()
+        self.by_key: dict[str, Memory] = {m.key: m for m in memories}
+        self.version = self._current_version()
+
+    def _current_version(self) -> int:
+        query = self.db.query(User.memory_version).filter(User.id == self.user_id)
+        return query.scalar()
+
+    def values(self) -> list[Memory]:
+        return list(self.by_key.values())
+
+    def refresh_if_changed(self):
+        # One scalar query; reload only if someone else wrote (e.g. the user locked
+        # a memory)
+        if self._current_version() != self.version:
+            metrics.incr("memories.reloaded")
+            self.reload()
+
+
+class MemoryChangeSet:
+    # Staged memory writes of one transaction, for the index once it commits
+    def __init__(self, user_id: UUID):
+        self.user_id = user_id
+        self.version: int | None = None
+        self.entries: list[MemoryEntry] = []
+        self.removed_ids: list[UUID] = []
+
+    def __bool__(self):
+        return bool(self.entries or self.removed_ids)
+
 
 class MemoryService:
     def get_memories(self, db: Session, user_id: UUID):
         return db.query(Memory).filter(Memory.user_id == user_id).all()
 
-    def add_memory(self, db: Session, user_id: UUID, key: str, value: any, confidence: str = "medium", category: str = "knowledge", source_article_id: UUID = None):
+    def bump_version(self, db: Session, user_id: UUID) -> int:
+        # Call inside the transaction that changes the user's memories, before commit
+        db.query(User).filter(User.id == user_id).update(
+            {User.memory_version: User.memory_version + 1}, synchronize_session=False
+        )
+        return db.query(User.memory_version).filter(User.id == user_id).scalar()
+
+    def add_memory(
+        self,
+        db: Session,
+        user_id: UUID,
+        key: str,
+        value: any,
+        confidence: str = "medium",
+        category: str = "knowledge",
+        source_article_id: UUID = None,
+    ):
         # Check if memory exists
-        existing = db.query(Memory).filter(Memory.user_id == user_id, Memory.key == key).first()
+        existing = (
+            db.query(Memory)
+            .filter(Memory.user_id == user_id, Memory.key == key)
+            .first()
+        )
         if existing:
             if existing.is_locked:
-                return existing # Do not update if locked
-            
-            # Update only if source article is newer (handled by caller logic usually, but here we just update)
+                return existing  # Do not update if locked
+
+            # Update only if source article is newer (handled by caller logic usually,
+            # but here we just update)
             # Or if we want to enforce conflict resolution here.
             # For now, just update.
             existing.value = value
@@ -21,20 +94,81 @@ class MemoryService:
             existing.category = category
             if source_article_id:
                 existing.source_article_id = source_article_id
+            version = self.bump_version(db, user_id)
             db.commit()
+            memory_index.upsert(existing, version)
             return existing
-        
+
         new_memory = Memory(
-            user_id=user_id, 
-            key=key, 
-            value=value, 
+            user_id=user_id,
+            key=key,
+            value=value,
             confidence=confidence,
             category=category,
-            source_article_id=source_article_id
+            source_article_id=source_article_id,
         )
         db.add(new_memory)
+        version = self.bump_version(db, user_id)
         db.commit()
         db.refresh(new_memory)
+        memory_index.upsert(new_memory, version)
         return new_memory
 
+    def stage_changes(
+        self,
+        db: Session,
+        memories: UserMemories,
+        changes: list[dict],
+        source_article_id: UUID = None,
+    ) -> MemoryChangeSet:
+        """
+        Stage extracted {action, key, content, emoji, category, confidence} changes in
+        the session and in `memories`, flushed together with one memory_version bump.
+        Locked memories are never touched. Doesn't commit: commit, then pass the result
+        to memory_index.apply_changes.
+        """
+        upserted: dict[str, Memory] = {}
+        removed: list[Memory] = []
+        for change in changes:
+            action, key = change.get("action"), change.get("key")
+            if not key or not action:
+                continue
+            existing = memories.by_key.get(key)
+            if existing is not None and existing.is_locked:
+                continue  # LOCKED RULE: Do not modify, delete, or merge.
+
+            if action == "delete" and existing is not None:
+                del memories.by_key[key]
+                upserted.pop(key, None)
+                if inspect(existing).pending:
+                    db.expunge(existing)  # created earlier in this batch
+                else:
+                    db.delete(existing)
+                    removed.append(existing)
+            elif action in ("create", "update"):
+                if existing is None:
+                    user_id = memories.user_id
+                    existing = Memory(id=uuid.uuid4(), user_id=user_id, key=key)
+                    db.add(existing)
+                    memories.by_key[key] = existing
+                existing.value = {
+                    "content": change.get("content"),
+                    "emoji": change.get("emoji", "📝"),
+                }
+                existing.confidence = change.get("confidence", "medium")
+                existing.category = change.get("category", "knowledge")
+                if source_article_id:
+                    existing.source_article_id = source_article_id
+                upserted[key] = existing
+
+        change_set = MemoryChangeSet(memories.user_id)
+        if not upserted and not removed:
+            return change_set
+        db.flush()
+        change_set.version = memories.version = self.bump_version(db, memories.user_id)
+        change_set.entries = [MemoryEntry(m) for m in upserted.values()]
+        change_set.removed_ids = [m.id for m in removed]
+        return change_set
+
+
 memory_service = MemoryService()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import math
+import random
+import re
+from collections import Counter, OrderedDict
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.services.ai.analysis import analysis_service
+from src.services.ai.dispatcher import Priority
+from src.services.ai.stream_parser import CommentStreamParser
+
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]"
+)
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_VOWEL_RE = re.compile(r"[aeiouyàáâäèéêëìíîïòóôöùúûü]", re.IGNORECASE)
+_CONSONANT_RUN_RE = re.compile(r"[bcdfghjklmnpqrstvwxz]{5,}", re.IGNORECASE)
+
+
+def char_entropy(text: str) -> float:
+    # Shannon entropy (bits per character) over non-whitespace characters
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return 0.0
+    total = len(chars)
+    return -sum(n / total * math.log2(n / total) for n in Counter(chars).values())
+
+
+def content_size(text: str) -> tuple[int, int]:
+    # (words in space-separated scripts, CJK characters)
+    cjk = len(_CJK_RE.findall(text))
+    words = [w for w in _WORD_RE.findall(_CJK_RE.sub(" ", text)) if len(w) > 1]
+    return len(words), cjk
+
+
+def _looks_like_gibberish(text: str) -> bool:
+    # Keyboard mashing: most longer latin "words" have no vowel or a long consonant run
+    words = [w for w in _WORD_RE.findall(text) if len(w) >= 4 and w.isascii()]
+    if len(words) < 2:
+        return False
+    bad = sum(
+        1 for w in words if not _VOWEL_RE.search(w) or _CONSONANT_RUN_RE.search(w)
+    )
+    return bad / len(words) >= 0.6
+
+
+def edit_size(before: str, after: str) -> int:
+    # Characters changed between two versions, assuming one contiguous edit (typing)
+    limit = min(len(before), len(after))
+    prefix = 0
+    while prefix < limit and before[prefix] == after[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and before[-1 - suffix] == after[-1 - suffix]:
+        suffix += 1
+    return max(len(before), len(after)) - prefix - suffix
+
+
+class AnalysisPrefilter:
+    """
+    Local gate in front of analyze_text for text that can't produce a useful comment.
+    check() returns the skip reason or None. A small sample of skipped texts is still
+    sent to the model in the background to count false negatives.
+    """
+
+    MAX_TRACKED = 10000  # last analyzed documents kept for the tiny-edit check
+
+    def __init__(self):
+        self._last_analyzed: OrderedDict = OrderedDict()
+        self._sampling: set[asyncio.Task] = set()
+        metrics.gauge("prefilter.skip_rate", self._skip_rate)
+
+    def _skip_rate(self) -> float:
+        checked = metrics.counter("prefilter.checked")
+        skipped = metrics.counter("prefilter.skipped")
+        return round(skipped / checked, 4) if checked else 0.0
+
+    def _too_little(self, text: str) -> bool:
+        words, cjk = content_size(text)
+        return (
+            words < settings.AI_PREFILTER_MIN_WORDS
+            and cjk < settings.AI_PREFILTER_MIN_CJK_CHARS
+        )
+
+    def _reason(
+        self, text: str, document: str, existing_quotes: list[str], key
+    ) -> str | None:
+        if self._too_little(text):
+            return "too_short"
+        if (
+            len(text.strip()) >= 8
+            and char_entropy(text) < settings.AI_PREFILTER_MIN_ENTROPY
+        ):
+            return "low_entropy"
+        if _looks_like_gibberish(text) and not content_size(text)[1]:
+            return "gibberish"
+
+        remaining = text
+        for quote in existing_quotes or []:
+            if quote:
+                pattern = r"\s+".join(re.escape(w) for w in quote.split())
+                remaining = re.sub(pattern, " ", remaining)
+        if remaining != text and self._too_little(remaining):
+            return "already_quoted"
+
+        last = self._last_analyzed.get(key) if key is not None else None
+        if (
+            last is not None
+            and edit_size(last, document) < settings.AI_PREFILTER_MIN_EDIT_CHARS
+        ):
+            return "tiny_edit"
+        return None
+
+    def check(
+        self,
+        text: str,
+        document: str = None,
+        existing_quotes: list[str] = None,
+        key=None,
+    ) -> str | None:
+        """
+        text: what the model would see; document: the full current text (defaults to
+        text); key: e.g. (user_id, article_id) for the tiny-edit check against the last
+        analyzed version.
+        """
+        if not settings.AI_PREFILTER_ENABLED:
+            return None
+        metrics.incr("prefilter.checked")
+        document = text if document is None else document
+        reason = self._reason(text, document, existing_quotes, key)
+        if reason:
+            metrics.incr("prefilter.skipped")
+            metrics.incr(f"prefilter.skipped.{reason}")
+        return reason
+
+    def record(self, key, document: str):
+        # Called once an analysis of `document` actually ran
+        if key is None:
+            return
+        self._last_analyzed[key] = document
+        self._last_analyzed.move_to_end(key)
+        while len(self._last_analyzed) > self.MAX_TRACKED:
+            self._last_analyzed.popitem(last=False)
+
+    def maybe_sample(self, reason: str, text: str, context: str):
+        # Re-check a few skipped texts with the model: no memories, background
+        # priority, and bypassing the analysis cache so samples never fill it
+        if (
+            reason == "tiny_edit"
+            or random.random() >= settings.AI_PREFILTER_SAMPLE_RATE
+        ):
+            return
+        task = asyncio.create_task(self._sample(reason, text, context))
+        self._sampling.add(task)
+        task.add_done_callback(self._sampling.discard)
+
+    async def _sample(self, reason: str, text: str, context: str):
+        metrics.incr("prefilter.sampled")
+        parser = CommentStreamParser()
+        try:
+            async for chunk in analysis_service.analyze_text(
+                text, context, priority=Priority.BACKGROUND, use_cache=False
+            ):
+                parser.feed(chunk)
+            parser.close()
+        except Exception as e:
+            logger.warning(f"Prefilter sample failed: {e}")
+            return
+        if parser.comments:
+            metrics.incr("prefilter.false_negative")
+            metrics.incr(f"prefilter.false_negative.{reason}")
+            logger.info(f"Prefilter false negative ({reason}): {text[:80]!r}")
+
+
+analysis_prefilter = AnalysisPrefilter()
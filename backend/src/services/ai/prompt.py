@@ -0,0 +1,213 @@
+import json
+import logging
+import re
+
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(
+    r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff"
+    r"\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?。！？…])\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    # Local approximation of BPE tokenizers: ~1 token per CJK character,
+    # ~4 characters per token otherwise
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_paragraphs(text: str, max_tokens: int, from_end: bool = False) -> str:
+    """
+    Keep whole paragraphs from the start (from the end with from_end) while they
+    fit. If not even the first (last) paragraph fits, keep whole sentences of it
+    instead of cutting mid-sentence.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    paragraphs = text.split("\n")
+    if from_end:
+        paragraphs.reverse()
+    kept, used = [], 0
+    for paragraph in paragraphs:
+        cost = estimate_tokens(paragraph) + 1
+        if used + cost > max_tokens:
+            if not kept:
+                kept.append(_truncate_sentences(paragraph, max_tokens, from_end))
+            break
+        kept.append(paragraph)
+        used += cost
+    if from_end:
+        return "\n".join(reversed(kept)).lstrip()
+    return "\n".join(kept).rstrip()
+
+
+def _truncate_sentences(paragraph: str, max_tokens: int, from_end: bool) -> str:
+    sentences = _SENTENCE_END_RE.split(paragraph)
+    if from_end:
+        sentences.reverse()
+    kept, used = [], 0
+    for sentence in sentences:
+        cost = estimate_tokens(sentence)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if not any(kept) and paragraph:
+        # One sentence alone is over budget (long unpunctuated text): cut it
+        return _truncate_chars(paragraph, max_tokens, from_end)
+    if from_end:
+        kept.reverse()
+    return " ".join(kept).strip()
+
+
+def _truncate_chars(text: str, max_tokens: int, from_end: bool) -> str:
+    # Longest prefix (suffix) within the budget; estimate_tokens grows with the length
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        part = text[len(text) - middle :] if from_end else text[:middle]
+        if estimate_tokens(part) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    if from_end:
+        return text[len(text) - low :].lstrip()
+    return text[:low].rstrip()
+
+
+def truncate_lines(text: str, max_tokens: int) -> str:
+    # For lists ordered by importance (memories, quotes): drop whole lines from the end
+    kept, used = [], 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def memory_content(memory) -> str:
+    value = memory.value
+    if isinstance(value, dict):
+        return str(value.get("content", ""))
+    return str(value or "")
+
+
+def render_memories(memories, detail: bool = False) -> str:
+    # One short line per memory instead of the raw value dict repr
+    lines = []
+    for m in memories:
+        line = f"- {m.key}: {memory_content(m)}"
+        if detail:
+            updated = m.updated_at or m.created_at
+            date = f", {updated.strftime('%Y-%m-%d')}" if updated else ""
+            line += f" ({m.confidence}{date})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render_memories_json(memories) -> str:
+    # Compact JSON lines for the extraction prompt (no indentation, no nulls)
+    lines = []
+    for m in memories:
+        item = {"key": m.key, "content": memory_content(m), "confidence": m.confidence}
+        if m.updated_at:
+            item["updated_at"] = m.updated_at.isoformat()
+        if m.is_locked:
+            item["is_locked"] = True
+        lines.append(json.dumps(item, ensure_ascii=False))
+    return "\n".join(lines)
+
+
+def _cost(text) -> int:
+    if isinstance(text, list):
+        # Each chat message carries a few tokens of framing
+        return sum(estimate_tokens(item) + 4 for item in text)
+    return estimate_tokens(text)
+
+
+def _keep_newest(items: list[str], max_tokens: int) -> list[str]:
+    kept, used = [], 0
+    for item in reversed(items):
+        cost = estimate_tokens(item) + 4
+        if used + cost > max_tokens:
+            break
+        kept.append(item)
+        used += cost
+    return list(reversed(kept))
+
+
+class PromptBuilder:
+    """
+    Fills a per-call token budget section by section, in the order sections are added
+    (= priority). Required sections are always kept; the others are truncated to what
+    is left (paragraph-wise or line-wise) or dropped.
+    """
+
+    def __init__(self, name: str, budget: int):
+        self.name = name
+        self.budget = budget
+        self._sections: list[dict] = []
+
+    def add(
+        self,
+        key: str,
+        text,
+        required: bool = False,
+        truncate: str = "paragraphs",
+        max_tokens: int | None = None,
+    ):
+        """
+        text: a string, or a list of strings for truncate="oldest"
+        truncate: "paragraphs" | "tail" (whole paragraphs from the end) | "lines"
+                  | "oldest" (keep the newest list items) | "drop"
+        """
+        self._sections.append(
+            {
+                "key": key,
+                "text": text or ("" if truncate != "oldest" else []),
+                "required": required,
+                "truncate": truncate,
+                "max_tokens": max_tokens,
+            }
+        )
+        return self
+
+    def build(self) -> tuple[dict, int]:
+        parts: dict = {}
+        remaining = self.budget
+        for section in self._sections:
+            text = section["text"]
+            cost = _cost(text)
+            limit = (
+                remaining
+                if section["max_tokens"] is None
+                else min(remaining, section["max_tokens"])
+            )
+            if cost > limit and not section["required"]:
+                if section["truncate"] == "lines":
+                    text = truncate_lines(text, limit)
+                elif section["truncate"] == "paragraphs":
+                    text = truncate_paragraphs(text, limit)
+                elif section["truncate"] == "tail":
+                    text = truncate_paragraphs(text, limit, from_end=True)
+                elif section["truncate"] == "oldest":
+                    text = _keep_newest(text, limit)
+                else:
+                    text = ""
+                cost = _cost(text)
+                metrics.incr(f"prompt.{self.name}.truncated.{section['key']}")
+            parts[section["key"]] = text
+            remaining -= cost
+
+        total = self.budget - remaining
+        metrics.observe(f"prompt.{self.name}.tokens", total)
+        logger.debug(f"[Prompt] {self.name}: ~{total} tokens (budget {self.budget})")
+        return parts, total
@@ -0,0 +1,202 @@
+import logging
+import time
+from collections import deque
+
+from src.core.config import settings
+from src.core.metrics import metrics, percentile
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_KEYS = [
+    "",
+    "your_key_here",
+    "your-deepseek-api-key-here",
+    "your-openai-api-key-here",
+]
+
+# name -> (base_url, settings attribute holding the key, default model)
+BUILTIN_PROVIDERS = {
+    "deepseek": ("https://api.deepseek.com/v1", "DEEPSEEK_API_KEY", "deepseek-chat"),
+    "openai": ("https://api.openai.com/v1", "OPENAI_API_KEY", "gpt-3.5-turbo"),
+}
+
+
+class Provider:
+    """
+    One OpenAI-compatible endpoint plus its live health:
+    EWMA of time-to-first-token, EWMA error rate and a circuit breaker
+    (closed -> open after N consecutive failures -> half-open probe after cooldown).
+    requires_key=False: a keyless endpoint (e.g. a local vLLM or Ollama server),
+    called without an Authorization header instead of falling back to mock mode.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        api_key: str,
+        model: str,
+        requires_key: bool = True,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.requires_key = requires_key
+        self.ttft_ewma: float | None = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+        self._ttft_samples = deque(maxlen=200)
+
+    @property
+    def has_key(self) -> bool:
+        return bool(self.api_key) and self.api_key not in PLACEHOLDER_KEYS
+
+    @property
+    def is_mock(self) -> bool:
+        if not self.requires_key:
+            return not self.base_url
+        return not self.has_key
+
+    @property
+    def circuit(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= settings.AI_CIRCUIT_COOLDOWN_SECONDS:
+            return "half_open"
+        return "open"
+
+    def is_available(self) -> bool:
+        state = self.circuit
+        if state == "closed":
+            return True
+        # Half-open: let a single probe request through
+        return state == "half_open" and not self.probing
+
+    def score(self) -> float:
+        ttft = (
+            self.ttft_ewma
+            if self.ttft_ewma is not None
+            else settings.AI_DEFAULT_TTFT_SECONDS
+        )
+        return ttft * (1 + 4 * self.error_rate)
+
+    def p95_ttft(self) -> float | None:
+        if len(self._ttft_samples) < 20:
+            return None
+        return percentile(sorted(self._ttft_samples), 95)
+
+    def record_ttft(self, seconds: float):
+        alpha = settings.AI_EWMA_ALPHA
+        self.ttft_ewma = (
+            seconds
+            if self.ttft_ewma is None
+            else (1 - alpha) * self.ttft_ewma + alpha * seconds
+        )
+        self._ttft_samples.append(seconds)
+        metrics.observe(f"ai.provider.{self.name}.ttft_seconds", seconds)
+
+    def record_success(self):
+        self.error_rate *= 1 - settings.AI_EWMA_ALPHA
+        self.consecutive_failures = 0
+        self.probing = False
+        if self.opened_at is not None:
+            logger.info(f"Circuit closed for provider {self.name}")
+        self.opened_at = None
+
+    def record_failure(self):
+        alpha = settings.AI_EWMA_ALPHA
+        self.error_rate = (1 - alpha) * self.error_rate + alpha
+        self.consecutive_failures += 1
+        metrics.incr(f"ai.provider.{self.name}.errors")
+        if (
+            self.probing
+            or self.consecutive_failures >= settings.AI_CIRCUIT_FAILURE_THRESHOLD
+        ):
+            if self.opened_at is None or self.probing:
+                logger.warning(
+                    f"Circuit opened for provider {self.name}"
+                    f" after {self.consecutive_failures} failures"
+                )
+                metrics.incr(f"ai.provider.{self.name}.circuit_opened")
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class ProviderPool:
+    def __init__(self, providers: list[Provider]):
+        self.providers = providers
+        for provider in providers:
+            metrics.gauge(
+                f"ai.provider.{provider.name}.ttft_ewma", lambda p=provider: p.ttft_ewma
+            )
+            metrics.gauge(
+                f"ai.provider.{provider.name}.error_rate",
+                lambda p=provider: p.error_rate,
+            )
+            metrics.gauge(
+                f"ai.provider.{provider.name}.circuit", lambda p=provider: p.circuit
+            )
+
+    @property
+    def primary(self) -> Provider:
+        return self.providers[0]
+
+    def ranked(self) -> list[Provider]:
+        # Best first; configured order breaks ties. If every circuit is open we still
+        # return the pool (best first) rather than failing without trying.
+        available = [p for p in self.providers if p.is_available()]
+        available = available or list(self.providers)
+        order = {p.name: i for i, p in enumerate(self.providers)}
+        return sorted(available, key=lambda p: (p.score(), order[p.name]))
+
+    @classmethod
+    def from_settings(cls) -> "ProviderPool":
+        providers: list[Provider] = []
+        primary_name = settings.AI_PROVIDER.lower()
+        fallback_names = [
+            n.strip().lower()
+            for n in settings.AI_FALLBACK_PROVIDERS.split(",")
+            if n.strip()
+        ]
+
+        for name in [primary_name] + fallback_names:
+            if name in BUILTIN_PROVIDERS and all(p.name != name for p in providers):
+                base_url, key_attr, default_model = BUILTIN_PROVIDERS[name]
+                model = (
+                    settings.AI_MODEL
+                    if (name == primary_name and settings.AI_MODEL)
+                    else default_model
+                )
+                providers.append(
+                    Provider(name, base_url, getattr(settings, key_attr), model)
+                )
+
+        # Any OpenAI-compatible endpoint: [{"name", "base_url", "api_key", "model"}].
+        # The base_url is explicit, so a missing api_key means "no auth header"
+        for extra in settings.AI_EXTRA_PROVIDERS:
+            if all(p.name != extra["name"] for p in providers):
+                providers.append(
+                    Provider(
+                        extra["name"],
+                        extra["base_url"],
+                        extra.get("api_key", ""),
+                        extra.get("model", ""),
+                        requires_key=False,
+                    )
+                )
+
+        # Providers without a key are only kept as the primary (the local mock mode)
+        usable = [p for p in providers if not p.is_mock]
+        for provider in providers:
+            if provider.is_mock and (usable or provider is not providers[0]):
+                logger.warning(
+                    f"AI provider {provider.name} has no API key configured, skipped"
+                )
+        if not usable:
+            return cls(
+                providers[:1] or [Provider(primary_name, "", "", settings.AI_MODEL)]
+            )
+        return cls(usable)
@@ -0,0 +1,180 @@
+import re
+
+QUOTE_MARKER = ">> QUOTE:"
+COMMENT_MARKER = ">> COMMENT:"
+NO_COMMENT_MARKER = "NO_COMMENT"
+_MARKER_PREFIX = ">>"
+
+
+def _strip_markup(line: str) -> str:
+    # Models sometimes wrap the headers in markdown despite being told not to
+    return re.sub(r"^[\s*_`]+", "", line)
+
+
+def _comment_text(line: str) -> str:
+    # Text after the COMMENT marker, only stripped on the left:
+    # a partial line's text stays a prefix of the complete line's
+    text = _strip_markup(line)[len(COMMENT_MARKER) :]
+    return text.lstrip().lstrip("*").lstrip()
+
+
+def _is_comment_marker(line: str) -> bool:
+    return _strip_markup(line).upper().startswith(COMMENT_MARKER)
+
+
+class ParsedComment:
+    def __init__(self, index: int, quote: str | None):
+        self.index = index
+        self.quote = quote  # None for a general comment (QUOTE: NONE)
+        self.content = ""
+
+    def as_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "quote": self.quote,
+            "content": self.content.strip(),
+        }
+
+
+class CommentStreamParser:
+    """
+    Incremental parser for the analysis output format:
+        >> QUOTE: <exact substring>
+        >> COMMENT: <comment, possibly several lines>
+    repeated, or a single >> NO_COMMENT. Feed chunks as they arrive; each call returns
+    the events completed so far as (name, data) tuples:
+        quote          {index, quote}             a new comment started
+        comment_delta  {index, delta}             more comment text
+        comment        {index, quote, content}    a comment is complete
+        no_comment     {}
+    QUOTE lines are held back until their newline; comment text, including the rest
+    of the COMMENT line, is passed through as it streams.
+    """
+
+    def __init__(self):
+        self.comments: list[ParsedComment] = []
+        self.no_comment = False
+        self._current: ParsedComment | None = None
+        self._in_comment = False
+        self._line = ""  # incomplete last line
+        self._sent = 0  # chars of _line (on a COMMENT line: of its text) already sent
+        self._marker_line = False  # _line is a COMMENT line, its comment is started
+
+    def feed(self, chunk: str) -> list[tuple[str, dict]]:
+        events = []
+        self._line += chunk
+        while "\n" in self._line:
+            line, self._line = self._line.split("\n", 1)
+            events += self._complete_line(line)
+        events += self._partial_line()
+        return events
+
+    def close(self) -> list[tuple[str, dict]]:
+        events = []
+        if self._line:
+            line, self._line = self._line, ""
+            events += self._complete_line(line)
+        events += self._finish_current()
+        return events
+
+    def _could_be_marker(self, text: str) -> bool:
+        stripped = _strip_markup(text)
+        # A full marker, or the start of one still arriving
+        if stripped.startswith(_MARKER_PREFIX):
+            return True
+        return _MARKER_PREFIX.startswith(stripped)
+
+    def _start_comment(self):
+        if self._current is None:
+            # COMMENT without QUOTE: treat as a general comment
+            self._current = ParsedComment(len(self.comments), None)
+        self._in_comment = True
+
+    def _partial_line(self) -> list[tuple[str, dict]]:
+        if not self._marker_line and _is_comment_marker(self._line):
+            self._start_comment()
+            self._marker_line = True
+        if self._marker_line:
+            text = _comment_text(self._line)
+            delta, self._sent = text[self._sent :], max(self._sent, len(text))
+            return self._delta(delta)
+        if not self._in_comment or self._could_be_marker(self._line):
+            return []
+        delta = ("\n" if self._sent == 0 else "") + self._line[self._sent :]
+        self._sent = len(self._line)
+        return self._delta(delta)
+
+    def _complete_line(self, line: str) -> list[tuple[str, dict]]:
+        sent, self._sent = self._sent, 0
+        marker_line, self._marker_line = self._marker_line, False
+        stripped = _strip_markup(line).strip()
+        upper = stripped.upper()
+
+        if upper.startswith(QUOTE_MARKER):
+            events = self._finish_current()
+            quote = stripped[len(QUOTE_MARKER) :].strip().strip("*").strip()
+            self._current = ParsedComment(
+                len(self.comments), None if quote.upper() == "NONE" else quote
+            )
+            return events + [
+                ("quote", {"index": self._current.index, "quote": self._current.quote})
+            ]
+
+        if upper.startswith(COMMENT_MARKER):
+            if not marker_line:
+                self._start_comment()
+            # The start of the line may already have been sent as a partial line
+            text = _comment_text(line).rstrip()
+            return self._delta(text[sent:] if marker_line else text)
+
+        if (
+            upper.lstrip(">").strip().startswith(NO_COMMENT_MARKER)
+            and not self._in_comment
+        ):
+            self.no_comment = True
+            return [("no_comment", {})]
+
+        if self._in_comment:
+            # Continuation line; its start may already have been sent as a partial line
+            return self._delta(("\n" if sent == 0 else "") + line[sent:])
+        return []
+
+    def _delta(self, delta: str) -> list[tuple[str, dict]]:
+        if not delta or self._current is None:
+            return []
+        if not self._current.content and not delta.strip():
+            return []
+        self._current.content += delta
+        return [("comment_delta", {"index": self._current.index, "delta": delta})]
+
+    def _finish_current(self) -> list[tuple[str, dict]]:
+        current, self._current, self._in_comment = self._current, None, False
+        if current is None or not current.content.strip():
+            return []
+        self.comments.append(current)
+        return [("comment", current.as_dict())]
+
+
+def locate_quote(
+    text: str, quote: str | None, taken: list[tuple[int, int]] = ()
+) -> tuple[int, int] | None:
+    """
+    Character range of `quote` in `text` that doesn't overlap `taken`, or None.
+    Falls back to a whitespace-insensitive match since models often reflow quotes.
+    """
+    if not quote:
+        return None
+    start = text.find(quote)
+    while start != -1:
+        end = start + len(quote)
+        if not any(start < t_end and t_start < end for t_start, t_end in taken):
+            return (start, end)
+        start = text.find(quote, start + 1)
+
+    pattern = r"\s+".join(re.escape(word) for word in quote.split())
+    for match in re.finditer(pattern, text):
+        if not any(
+            match.start() < t_end and t_start < match.end() for t_start, t_end in taken
+        ):
+            return (match.start(), match.end())
+    return None
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+
+from fastapi import Request
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.services.ai.prompt import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class StreamHandle:
+    def __init__(self, key):
+        self.key = key
+        self.cancelled = asyncio.Event()
+        self.reason: str | None = None
+        self.output: list[str] = []
+
+    def cancel(self, reason: str):
+        if not self.cancelled.is_set():
+            self.reason = reason
+            self.cancelled.set()
+
+
+class StreamRegistry:
+    """
+    Tracks the live stream per key (e.g. (user_id, article_id)). Starting a new stream
+    for a key cancels the previous one; a client disconnect cancels its own stream.
+    Cancelling closes the wrapped generator right away, which releases the upstream
+    provider stream instead of reading it to the end.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._active: dict = {}
+        self._avg_output_tokens: float | None = None
+        metrics.gauge(f"streams.{name}.active", lambda: len(self._active))
+
+    def start(self, key=None) -> StreamHandle:
+        # key=None: untracked stream that can only be cancelled by its own client
+        handle = StreamHandle(key)
+        if key is not None:
+            previous = self._active.get(key)
+            if previous is not None:
+                previous.cancel("superseded")
+            self._active[key] = handle
+        return handle
+
+    def _finish(self, handle: StreamHandle, outcome: str):
+        if handle.key is not None and self._active.get(handle.key) is handle:
+            del self._active[handle.key]
+
+        produced = estimate_tokens("".join(handle.output))
+        if outcome == "completed":
+            alpha = 0.1
+            self._avg_output_tokens = (
+                produced
+                if self._avg_output_tokens is None
+                else (1 - alpha) * self._avg_output_tokens + alpha * produced
+            )
+            return
+        if outcome != "cancelled":
+            # errors / interrupted: not a cancellation we asked for, so nothing is saved
+            metrics.incr(f"streams.{self.name}.{outcome}")
+            return
+
+        reason = handle.reason
+        metrics.incr(f"streams.{self.name}.cancelled.{reason}")
+        # Saved output is an estimate:
+        # what a typical completed stream produces minus what we read
+        saved = max(0.0, (self._avg_output_tokens or 0) - produced)
+        metrics.incr(f"streams.{self.name}.tokens_saved", saved)
+        logger.info(
+            f"Cancelled {self.name} stream {handle.key} ({reason}),"
+            f" ~{saved:.0f} output tokens saved"
+        )
+
+    async def _watch_disconnect(self, request: Request, handle: StreamHandle):
+        while not handle.cancelled.is_set():
+            if await request.is_disconnected():
+                handle.cancel("disconnected")
+                return
+            await asyncio.sleep(settings.AI_DISCONNECT_POLL_SECONDS)
+
+    async def guard(
+        self,
+        handle: StreamHandle,
+        stream,
+        request: Request | None = None,
+        on_superseded: str | None = None,
+    ):
+        """
+        Yield from `stream` until it ends, is superseded or the client goes away.
+        on_superseded: optional final chunk telling the client to drop a partial answer.
+        Only superseded/disconnected streams count as cancelled; errors from the stream
+        and cancellation from outside (e.g. shutdown) are re-raised and counted apart.
+        """
+        watchers = [asyncio.create_task(handle.cancelled.wait())]
+        if request is not None:
+            watchers.append(
+                asyncio.create_task(self._watch_disconnect(request, handle))
+            )
+        next_chunk = None
+        outcome = "cancelled"
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(stream.__anext__())
+                await asyncio.wait(
+                    {next_chunk, watchers[0]}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not next_chunk.done():
+                    break  # cancelled while waiting for the provider
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    outcome = "completed"
+                    return
+                next_chunk = None
+                handle.output.append(chunk)
+                yield chunk
+                if handle.cancelled.is_set():
+                    break
+
+            if handle.reason == "superseded" and on_superseded:
+                yield on_superseded
+        except (asyncio.CancelledError, GeneratorExit):
+            # Our watchers never cancel this task, they only set the handle
+            if not handle.cancelled.is_set():
+                outcome = "interrupted"
+            raise
+        except Exception:
+            outcome = "errors"
+            raise
+        finally:
+            for watcher in watchers:
+                watcher.cancel()
+            if next_chunk is not None and not next_chunk.done():
+                # Throws CancelledError into the generator:
+                # the upstream httpx stream is closed
+                next_chunk.cancel()
+                try:
+                    await next_chunk
+                except (asyncio.CancelledError, StopAsyncIteration, Exception):
+                    pass
+            await stream.aclose()
+            self._finish(handle, outcome)
+
+
+analysis_streams = StreamRegistry("analysis")
+reply_streams = StreamRegistry("reply")
+review_streams = StreamRegistry("review")
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from uuid import UUID
+
+from src.core.config import settings
+from src.core.database import SessionLocal
+from src.core.metrics import metrics
+from src.models.comment import Comment
+from src.services.ai.client import ai_client
+from src.services.ai.dispatcher import Priority
+from src.services.ai.prompt import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a discussion between a writer (User) and "
+    "their writing assistant (AI) about one comment on the writer's text.\n"
+    "Update the summary with the new messages. Keep decisions, open questions, "
+    "the writer's stated preferences and anything the AI promised; "
+    "drop greetings and repetition.\n"
+    "Write in the language of the discussion, as a few short bullet points, "
+    "at most {max_words} words.\n"
+    "Output only the summary."
+)
+
+
+def _render_turns(turns: list) -> str:
+    return "\n".join(
+        f"{'User' if m.get('role') == 'user' else 'AI'}: {m.get('content', '')}"
+        for m in turns
+    )
+
+
+class ThreadSummarizer:
+    """
+    Folds the older turns of long comment threads into Comment.reply_summary.
+    Runs as a background task at BACKGROUND priority after a reply; replies then send
+    the summary plus reply[reply_summary_upto:] instead of the whole history.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._running: dict[UUID, asyncio.Task] = {}
+
+    def needs_compaction(self, history: list, summary_upto: int) -> bool:
+        fold_until = len(history) - settings.AI_THREAD_KEEP_TURNS
+        if fold_until <= summary_upto:
+            return False
+        return (
+            estimate_tokens(_render_turns(history[summary_upto:fold_until]))
+            >= settings.AI_THREAD_SUMMARY_THRESHOLD
+        )
+
+    def maybe_schedule(
+        self, comment_id: UUID, history: list, summary_upto: int
+    ) -> asyncio.Task | None:
+        # Called after a reply with the thread as stored;
+        # starts at most one summary per comment
+        if comment_id in self._running:
+            return None
+        if not self.needs_compaction(history, summary_upto):
+            return None
+        task = asyncio.create_task(self.summarize(comment_id))
+        self._running[comment_id] = task
+        task.add_done_callback(lambda _: self._running.pop(comment_id, None))
+        return task
+
+    async def summarize(self, comment_id: UUID):
+        db = self.session_factory()
+        try:
+            comment = db.query(Comment).filter(Comment.id == comment_id).first()
+            if not comment or not isinstance(comment.reply, list):
+                return
+            history = comment.reply
+            summary_upto = comment.reply_summary_upto or 0
+            fold_until = len(history) - settings.AI_THREAD_KEEP_TURNS
+            if fold_until <= summary_upto:
+                return
+
+            # Keep the summary input bounded if the thread grew a lot since the last
+            # run; the remaining turns are folded by the next compaction
+            budget, used = settings.AI_THREAD_SUMMARY_THRESHOLD * 2, 0
+            for i in range(summary_upto, fold_until):
+                used += estimate_tokens(_render_turns(history[i : i + 1]))
+                if used > budget and i > summary_upto:
+                    fold_until = i
+                    break
+            new_turns = _render_turns(history[summary_upto:fold_until])
+            messages = [
+                {"role": "system", "content": SUMMARY_PROMPT.format(max_words=200)},
+                {
+                    "role": "user",
+                    "content": (
+                        f"Original text (quote): \"{comment.quote or ''}\"\n"
+                        f'AI\'s original comment: "{comment.content}"\n\n'
+                        f"Current summary:\n{comment.reply_summary or '(none)'}\n\n"
+                        f"New messages:\n{new_turns}"
+                    ),
+                },
+            ]
+            db.commit()  # don't hold a transaction open across the LLM call
+            summary = (await ai_client.complete(messages, Priority.BACKGROUND)).strip()
+            if not summary:
+                return
+
+            comment = db.query(Comment).filter(Comment.id == comment_id).first()
+            if not comment or (comment.reply_summary_upto or 0) != summary_upto:
+                return  # deleted or summarized concurrently
+            comment.reply_summary = summary
+            comment.reply_summary_upto = fold_until
+            db.commit()
+            metrics.incr("thread_summary.compactions")
+            metrics.incr("thread_summary.folded_messages", fold_until - summary_upto)
+        except Exception as e:
+            logger.error(f"Thread summary failed for comment {comment_id}: {e}")
+            metrics.incr("thread_summary.errors")
+        finally:
+            db.close()
+
+
+thread_summarizer = ThreadSummarizer()
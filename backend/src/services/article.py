@@ -1,32 +1,164 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import and_, func, or_, update
 from sqlalchemy.orm import Session
+
 from src.models.article import Article
 from src.schemas.article import ArticleCreate, ArticleUpdate
-from uuid import UUID
+from src.services import tiptap
+from src.services.scan_schedule import scan_schedule
+
+EXCERPT_CHARS = 140
+# Sidebar order; ix_articles_user_order serves it
+SIDEBAR_ORDER = (Article.position.asc(), Article.updated_at.desc(), Article.id.asc())
+
+
+def encode_cursor(position: int, updated_at: datetime, article_id: UUID) -> str:
+    raw = json.dumps([position, updated_at.isoformat(), str(article_id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[int, datetime, UUID]:
+    # Raises ValueError for anything that isn't a cursor we issued
+    try:
+        position, updated_at, article_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii"))
+        )
+        return int(position), datetime.fromisoformat(updated_at), UUID(article_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _excerpt(text: str | None) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= EXCERPT_CHARS else text[:EXCERPT_CHARS].rstrip() + "…"
+
 
 class ArticleService:
+    def _update_text(self, article: Article) -> bool:
+        # Refresh the stored plain-text projection; True if the text itself changed
+        text = tiptap.to_text(article.content)
+        fingerprint = tiptap.text_fingerprint(text)
+        changed = fingerprint != article.content_fingerprint
+        article.content_text = text
+        article.word_count = tiptap.word_count(text)
+        article.char_count = tiptap.char_count(text)
+        article.content_fingerprint = fingerprint
+        return changed
+
     def create_article(self, db: Session, article: ArticleCreate, user_id: UUID):
         db_article = Article(**article.model_dump(), user_id=user_id)
+        self._update_text(db_article)
         db.add(db_article)
+        scan_schedule.article_written(db, user_id)
         db.commit()
         db.refresh(db_article)
         return db_article
 
-    def get_articles(self, db: Session, user_id: UUID, skip: int = 0, limit: int = 100, search: str = None):
-        query = db.query(Article).filter(Article.user_id == user_id, Article.is_deleted == False)
+    def get_articles(
+        self,
+        db: Session,
+        user_id: UUID,
+        skip: int = 0,
+        limit: int = 100,
+        search: str = None,
+    ):
+        query = db.query(Article).filter(
+            Article.user_id == user_id, Article.is_deleted.is_(False)
+        )
         if search:
             query = query.filter(Article.title.ilike(f"%{search}%"))
-        return query.order_by(Article.position.asc(), Article.updated_at.desc()).offset(skip).limit(limit).all()
+        return (
+            query.order_by(Article.position.asc(), Article.updated_at.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def get_article_summaries(
+        self, db: Session, user_id: UUID, limit: int = 50, cursor: str | None = None
+    ) -> tuple[list[dict], str | None]:
+        """
+        Sidebar page in (position, updated_at desc, id) order without the content JSON.
+        Keyset pagination on ix_articles_user_order; returns (items, next_cursor or
+        None).
+        """
+        query = db.query(
+            Article.id,
+            Article.title,
+            Article.position,
+            Article.folder_id,
+            Article.created_at,
+            Article.updated_at,
+            func.substr(Article.content_text, 1, EXCERPT_CHARS * 2).label("excerpt"),
+        ).filter(Article.user_id == user_id, Article.is_deleted.is_(False))
+        if cursor:
+            position, updated_at, article_id = decode_cursor(cursor)
+            query = query.filter(
+                or_(
+                    Article.position > position,
+                    and_(
+                        Article.position == position,
+                        or_(
+                            Article.updated_at < updated_at,
+                            and_(
+                                Article.updated_at == updated_at,
+                                Article.id > article_id,
+                            ),
+                        ),
+                    ),
+                )
+            )
+        rows = query.order_by(*SIDEBAR_ORDER).limit(limit + 1).all()
+
+        items = [
+            {
+                "id": row.id,
+                "title": row.title,
+                "position": row.position,
+                "folder_id": row.folder_id,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+                "excerpt": _excerpt(row.excerpt),
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.position, last.updated_at, last.id)
+        return items, next_cursor
 
     def get_article(self, db: Session, article_id: UUID, user_id: UUID):
-        return db.query(Article).filter(Article.id == article_id, Article.user_id == user_id, Article.is_deleted == False).first()
+        return (
+            db.query(Article)
+            .filter(
+                Article.id == article_id,
+                Article.user_id == user_id,
+                Article.is_deleted.is_(False),
+            )
+            .first()
+        )
 
-    def update_article(self, db: Session, article_id: UUID, article_update: ArticleUpdate, user_id: UUID):
+    def update_article(
+        self,
+        db: Session,
+        article_id: UUID,
+        article_update: ArticleUpdate,
+        user_id: UUID,
+    ):
         db_article = self.get_article(db, article_id, user_id)
         if not db_article:
             return None
         update_data = article_update.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_article, key, value)
+        # Title-only saves and formatting/whitespace churn don't need a memory scan
+        if "content" in update_data and self._update_text(db_article):
+            scan_schedule.article_written(db, user_id, db_article.last_scanned_at)
         db.commit()
         db.refresh(db_article)
         return db_article
@@ -44,11 +176,48 @@ class ArticleService:
         # Using a case statement or just iterating. Iterating is fine for 100 items.
         # But to be safer/faster, we can update in transaction.
         # Note: We do NOT update 'updated_at' here, as reordering is a meta-operation.
-        # SQLAlchemy's `onupdate` usually triggers on any update, but `update()` method might bypass it unless configured otherwise.
+        # SQLAlchemy's `onupdate` usually triggers on any update, but `update()` method
+        # might bypass it unless configured otherwise.
         # However, to be explicit, we can just update the position column.
         for index, article_id in enumerate(article_ids):
-             db.query(Article).filter(Article.id == article_id, Article.user_id == user_id).update({"position": index}, synchronize_session=False)
+            db.query(Article).filter(
+                Article.id == article_id, Article.user_id == user_id
+            ).update({"position": index}, synchronize_session=False)
         db.commit()
         return True
 
+    def move_article(
+        self, db: Session, user_id: UUID, article_id: UUID, after_id: UUID | None
+    ) -> bool:
+        """
+        Put an article right below `after_id` in the sidebar order (to the top if None).
+        The other articles keep their order; positions are renumbered 0..n-1 and only
+        rows whose position changes are written. False if either article isn't found.
+        """
+        rows = (
+            db.query(Article.id, Article.position, Article.updated_at)
+            .filter(Article.user_id == user_id, Article.is_deleted.is_(False))
+            .order_by(*SIDEBAR_ORDER)
+            .all()
+        )
+        order = [row.id for row in rows]
+        if article_id not in order or (after_id is not None and after_id not in order):
+            return False
+        order.remove(article_id)
+        at = order.index(after_id) + 1 if after_id is not None else 0
+        order.insert(at, article_id)
+
+        by_id = {row.id: row for row in rows}
+        changed = [
+            # updated_at passed as is so onupdate doesn't bump it: moving isn't an edit
+            {"id": id_, "position": index, "updated_at": by_id[id_].updated_at}
+            for index, id_ in enumerate(order)
+            if by_id[id_].position != index
+        ]
+        if changed:
+            db.execute(update(Article), changed)
+            db.commit()
+        return True
+
+
 article_service = ArticleService()
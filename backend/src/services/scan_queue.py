@@ -0,0 +1,194 @@
+import logging
+import random
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.models.scan_job import ScanJob
+
+logger = logging.getLogger(__name__)
+
+
+class ScanQueue:
+    """
+    DB-backed queue of memory-scan jobs, one active job per user.
+    Workers lease a job for AI_SCAN_LEASE_SECONDS and extend the lease while working;
+    a job whose worker died is picked up again once the lease expires. Article progress
+    is checkpointed by the scanner (Article.last_scanned_at), so a retried job resumes
+    where it stopped.
+    """
+
+    def enqueue(self, db: Session, user_id: UUID, backlog: bool = False) -> bool:
+        # No-op if the user already has a pending/running job
+        active = (
+            db.query(ScanJob.id)
+            .filter(
+                ScanJob.user_id == user_id, ScanJob.status.in_(["pending", "running"])
+            )
+            .first()
+        )
+        if active:
+            return False
+        db.add(ScanJob(user_id=user_id, backlog=backlog, run_after=datetime.utcnow()))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another process enqueued the same user concurrently
+            db.rollback()
+            return False
+        metrics.incr("scan_jobs.enqueued")
+        return True
+
+    def lease(self, db: Session, worker_id: str) -> ScanJob | None:
+        now = datetime.utcnow()
+        lease = timedelta(seconds=settings.AI_SCAN_LEASE_SECONDS)
+        available = or_(
+            and_(ScanJob.status == "pending", ScanJob.run_after <= now),
+            # Worker died
+            and_(ScanJob.status == "running", ScanJob.lease_expires_at < now),
+        )
+        query = db.query(ScanJob.id).filter(available).order_by(ScanJob.run_after.asc())
+        if db.bind.dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+
+        for (job_id,) in query.limit(5).all():
+            # Conditional update: only one worker wins a job even without row locks
+            # (SQLite)
+            claimed = (
+                db.query(ScanJob)
+                .filter(ScanJob.id == job_id, available)
+                .update(
+                    {
+                        ScanJob.status: "running",
+                        ScanJob.locked_by: worker_id,
+                        ScanJob.lease_expires_at: now + lease,
+                        ScanJob.attempts: ScanJob.attempts + 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if claimed:
+                db.commit()
+                metrics.incr("scan_jobs.leased")
+                return db.query(ScanJob).filter(ScanJob.id == job_id).first()
+        db.commit()
+        return None
+
+    def heartbeat(self, db: Session, job_id: UUID, worker_id: str) -> bool:
+        # False if the lease was lost (expired and taken over): the worker should stop
+        lease = timedelta(seconds=settings.AI_SCAN_LEASE_SECONDS)
+        extended = (
+            db.query(ScanJob)
+            .filter(
+                ScanJob.id == job_id,
+                ScanJob.locked_by == worker_id,
+                ScanJob.status == "running",
+            )
+            .update(
+                {ScanJob.lease_expires_at: datetime.utcnow() + lease},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        return bool(extended)
+
+    def complete(self, db: Session, job_id: UUID, worker_id: str) -> bool:
+        # Idempotent: completing twice, or after losing the lease, changes nothing
+        done = (
+            db.query(ScanJob)
+            .filter(
+                ScanJob.id == job_id,
+                ScanJob.locked_by == worker_id,
+                ScanJob.status == "running",
+            )
+            .update(
+                {
+                    ScanJob.status: "done",
+                    ScanJob.finished_at: datetime.utcnow(),
+                    ScanJob.lease_expires_at: None,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if done:
+            metrics.incr("scan_jobs.completed")
+        return bool(done)
+
+    def fail(self, db: Session, job_id: UUID, worker_id: str, error: str) -> bool:
+        job = (
+            db.query(ScanJob)
+            .filter(
+                ScanJob.id == job_id,
+                ScanJob.locked_by == worker_id,
+                ScanJob.status == "running",
+            )
+            .first()
+        )
+        if not job:
+            return False
+        job.last_error = error[:2000]
+        job.lease_expires_at = None
+        if job.attempts >= settings.AI_SCAN_MAX_ATTEMPTS:
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+            metrics.incr("scan_jobs.failed")
+        else:
+            # Exponential backoff with jitter
+            delay = min(
+                settings.AI_SCAN_BACKOFF_SECONDS * 2 ** (job.attempts - 1),
+                settings.AI_SCAN_BACKOFF_MAX_SECONDS,
+            ) * random.uniform(0.8, 1.2)
+            job.status = "pending"
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            metrics.incr("scan_jobs.retried")
+        db.commit()
+        return True
+
+    def release(self, db: Session, job_id: UUID, worker_id: str) -> bool:
+        # Worker stopping mid-job: hand it back now instead of when the lease expires.
+        # Not the job's fault, so the attempt isn't counted.
+        released = (
+            db.query(ScanJob)
+            .filter(
+                ScanJob.id == job_id,
+                ScanJob.locked_by == worker_id,
+                ScanJob.status == "running",
+            )
+            .update(
+                {
+                    ScanJob.status: "pending",
+                    ScanJob.locked_by: None,
+                    ScanJob.lease_expires_at: None,
+                    ScanJob.run_after: datetime.utcnow(),
+                    ScanJob.attempts: ScanJob.attempts - 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if released:
+            metrics.incr("scan_jobs.released")
+        return bool(released)
+
+    def purge(self, db: Session) -> int:
+        # Finished jobs are only kept for inspection
+        retention = timedelta(hours=settings.AI_SCAN_JOB_RETENTION_HOURS)
+        cutoff = datetime.utcnow() - retention
+        deleted = (
+            db.query(ScanJob)
+            .filter(
+                ScanJob.status.in_(["done", "failed"]), ScanJob.finished_at < cutoff
+            )
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return deleted
+
+
+scan_queue = ScanQueue()
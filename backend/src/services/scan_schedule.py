@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from src.models.article import Article
+from src.models.user import User
+
+
+def scan_interval(bg_scan: dict) -> timedelta:
+    # Minimum time between two scans of the same article
+    unit = bg_scan.get("interval_unit", "hours")
+    value = bg_scan.get("interval_value", 24)
+    if unit == "minutes":
+        return timedelta(minutes=value)
+    if unit == "hours":
+        return timedelta(hours=value)
+    if unit == "days":
+        return timedelta(days=value)
+    return timedelta(hours=24)
+
+
+def skip_older_than(bg_scan: dict) -> timedelta:
+    # Articles not updated within this window are never scanned
+    unit = bg_scan.get("skip_older_than_unit", "days")
+    value = bg_scan.get("skip_older_than_value", 14)
+    if unit == "days":
+        return timedelta(days=value)
+    if unit == "months":
+        return timedelta(days=value * 30)  # Approx
+    if unit == "years":
+        return timedelta(days=value * 365)  # Approx
+    return timedelta(days=14)
+
+
+def text_changed_since_scan():
+    # Filter: the article's text differs from what was last scanned (unknown
+    # counts as changed)
+    return or_(
+        Article.content_fingerprint.is_(None),
+        Article.last_scanned_fingerprint.is_(None),
+        Article.content_fingerprint != Article.last_scanned_fingerprint,
+    )
+
+
+def scan_incomplete():
+    # Filter: the last scan left chunks unextracted (BackgroundScanner.process_article
+    # records the chunks it got, but no fingerprint)
+    return and_(
+        Article.scan_chunk_hashes.isnot(None),
+        Article.last_scanned_fingerprint.is_(None),
+    )
+
+
+def is_scan_incomplete(article: Article) -> bool:
+    if article.scan_chunk_hashes is None:
+        return False
+    return article.last_scanned_fingerprint is None
+
+
+def _background_scan(user: User) -> dict:
+    return (user.settings or {}).get("background_scan", {})
+
+
+class ScanSchedule:
+    """
+    Tracks which users have unscanned writes (User.scan_dirty) and when their next scan
+    is due (User.next_scan_due_at), so the scheduler tick only looks at users with
+    something to do. Writes mark the user; enqueueing a job clears the mark; after a
+    scan, articles still inside their scan interval mark the user again for when the
+    interval ends.
+    """
+
+    def mark(self, user: User, due: datetime):
+        # Earliest due time wins; no commit, callers commit with their own write
+        if (
+            not user.scan_dirty
+            or user.next_scan_due_at is None
+            or due < user.next_scan_due_at
+        ):
+            user.next_scan_due_at = due
+        user.scan_dirty = True
+
+    def article_written(
+        self, db: Session, user_id: UUID, last_scanned_at: datetime | None = None
+    ):
+        """
+        Call before committing an article create/update; last_scanned_at as before
+        the write.
+        """
+        user = db.get(User, user_id)
+        if not user:
+            return
+        bg_scan = _background_scan(user)
+        if not bg_scan.get("enabled", False):
+            return
+        now = datetime.utcnow()
+        due = now
+        if last_scanned_at is not None:
+            due = max(now, last_scanned_at + scan_interval(bg_scan))
+        self.mark(user, due)
+
+    def settings_changed(self, user: User):
+        # Interval or cutoff may have changed: look once now, or stop tracking
+        # when disabled
+        if _background_scan(user).get("enabled", False):
+            self.mark(user, datetime.utcnow())
+        else:
+            user.scan_dirty = False
+            user.next_scan_due_at = None
+
+    def due_users(
+        self, db: Session, now: datetime | None = None, limit: int = 1000
+    ) -> list[UUID]:
+        # Served by ix_users_scan_due; idle users are never read
+        now = now or datetime.utcnow()
+        rows = (
+            db.query(User.id)
+            .filter(
+                User.scan_dirty.is_(True),
+                User.next_scan_due_at <= now,
+                User.is_active.is_(True),
+            )
+            .order_by(User.next_scan_due_at.asc())
+            .limit(limit)
+            .all()
+        )
+        return [user_id for (user_id,) in rows]
+
+    def clear(self, db: Session, user_ids: list[UUID]):
+        if user_ids:
+            db.query(User).filter(User.id.in_(user_ids)).update(
+                {User.scan_dirty: False, User.next_scan_due_at: None},
+                synchronize_session=False,
+            )
+            db.commit()
+
+    def after_scan(self, db: Session, user: User):
+        """
+        Re-mark the user for changed or incompletely scanned articles that were skipped
+        because they were scanned too recently.
+        """
+        bg_scan = _background_scan(user)
+        if not bg_scan.get("enabled", False):
+            return
+        now = datetime.utcnow()
+        interval = scan_interval(bg_scan)
+        oldest_scan = (
+            db.query(func.min(Article.last_scanned_at))
+            .filter(
+                Article.user_id == user.id,
+                Article.is_deleted.is_(False),
+                Article.updated_at >= now - skip_older_than(bg_scan),
+                Article.last_scanned_at >= now - interval,
+                or_(Article.updated_at > Article.last_scanned_at, scan_incomplete()),
+                text_changed_since_scan(),
+            )
+            .scalar()
+        )
+        if oldest_scan is not None:
+            self.mark(user, oldest_scan + interval)
+            db.commit()
+
+
+scan_schedule = ScanSchedule()
@@ -0,0 +1,218 @@
+import html
+import logging
+import re
+from uuid import UUID
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_TERM_RE = re.compile(r"\w+")
+MAX_TERMS = 8
+# Scripts written without spaces; same ranges in Python and Postgres regexes
+CJK_RANGES = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_CJK_SPLIT_RE = re.compile(f"[{CJK_RANGES}]+|[^{CJK_RANGES}]+")
+# Highlight markers that can't occur in user text; swapped for <mark> after escaping
+_START, _STOP = "\x02", "\x03"
+
+# SQLite: FTS5 table kept in sync by triggers. user_key/article_key hold 'u'/'a' + uuid
+# hex so per-user filtering and per-article updates go through the FTS index.
+# Trigram tokenizer: substring matching, which also covers unspaced Chinese text.
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+        user_key, article_key, title, body, tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles
+    WHEN new.is_deleted = 0 BEGIN
+        INSERT INTO articles_fts(user_key, article_key, title, body)
+        VALUES (
+            'u' || new.user_id, 'a' || new.id, new.title, coalesce(new.content_text, '')
+        );
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS articles_fts_update
+    AFTER UPDATE OF title, content_text, is_deleted ON articles BEGIN
+        DELETE FROM articles_fts WHERE articles_fts MATCH 'article_key:a' || old.id;
+        INSERT INTO articles_fts(user_key, article_key, title, body)
+        SELECT 'u' || new.user_id, 'a' || new.id, new.title,
+               coalesce(new.content_text, '')
+        WHERE new.is_deleted = 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+        DELETE FROM articles_fts WHERE articles_fts MATCH 'article_key:a' || old.id;
+    END""",
+]
+SQLITE_POPULATE = """
+    INSERT INTO articles_fts(user_key, article_key, title, body)
+    SELECT 'u' || user_id, 'a' || id, title, coalesce(content_text, '')
+    FROM articles WHERE is_deleted = 0
+"""
+
+# Postgres: generated tsvector (title weighted above body) with a GIN index.
+# 'simple' config: notes are multilingual, so no language-specific stemming.
+# CJK runs are indexed as overlapping bigrams (like memory_index); queries use the same.
+POSTGRES_CJK_BIGRAMS = """
+    CREATE OR REPLACE FUNCTION cjk_bigrams(input text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT coalesce(string_agg(
+            CASE WHEN m.match[1] ~ '^[{cjk}]' AND char_length(m.match[1]) > 1 THEN (
+                SELECT string_agg(substr(m.match[1], i, 2), ' ' ORDER BY i)
+                FROM generate_series(1, char_length(m.match[1]) - 1) AS i
+            ) ELSE m.match[1] END, ' ' ORDER BY m.n), '')
+        FROM regexp_matches(coalesce(input, ''), '[{cjk}]+|[^{cjk}]+', 'g')
+            WITH ORDINALITY AS m(match, n)
+    $$
+""".replace("{cjk}", CJK_RANGES)
+POSTGRES_SCHEMA = [
+    POSTGRES_CJK_BIGRAMS,
+    """ALTER TABLE articles ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', cjk_bigrams(title)), 'A') ||
+        setweight(to_tsvector('simple', cjk_bigrams(content_text)), 'B')
+    ) STORED""",
+    """CREATE INDEX IF NOT EXISTS ix_articles_search_vector
+    ON articles USING GIN (search_vector)""",
+]
+
+
+def search_terms(query: str) -> list[str]:
+    # Words only: FTS/tsquery operators in user input are never interpreted
+    return _TERM_RE.findall(query or "")[:MAX_TERMS]
+
+
+def tsquery_term(term: str) -> str:
+    # Latin words and single CJK characters match as prefixes,
+    # longer CJK runs as phrases of their bigrams
+    parts = []
+    for run in _CJK_SPLIT_RE.findall(term):
+        if len(run) > 1 and re.match(f"[{CJK_RANGES}]", run):
+            parts.append(" <-> ".join(run[i : i + 2] for i in range(len(run) - 1)))
+        else:
+            parts.append(f"{run}:*")
+    return " <-> ".join(parts)
+
+
+def _highlight(snippet: str) -> str:
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+class ArticleSearch:
+    """
+    Ranked full-text search over article titles and bodies (Article.content_text), all
+    terms required. Terms match as substrings on SQLite, as word prefixes (CJK: bigram
+    phrases) on Postgres. The index lives in the database (SQLite FTS5 or a Postgres
+    tsvector), so it follows every write to the articles table.
+    """
+
+    def ensure_schema(self, engine: Engine):
+        # The migration creates the index; this covers databases built with create_all
+        with engine.begin() as conn:
+            if conn.dialect.name == "sqlite":
+                existing = conn.execute(
+                    text("SELECT sql FROM sqlite_master WHERE name = 'articles_fts'")
+                ).scalar()
+                if existing and "trigram" not in existing:
+                    # Built with the earlier word tokenizer
+                    conn.execute(text("DROP TABLE articles_fts"))
+                    existing = None
+                for statement in SQLITE_SCHEMA:
+                    conn.execute(text(statement))
+                if not existing:
+                    conn.execute(text(SQLITE_POPULATE))
+            elif conn.dialect.name == "postgresql":
+                for statement in POSTGRES_SCHEMA:
+                    conn.execute(text(statement))
+            else:
+                dialect = conn.dialect.name
+                logger.warning(f"Full-text search is not supported on {dialect}")
+
+    def search(
+        self, db: Session, user_id: UUID, query: str, limit: int = 20
+    ) -> list[dict]:
+        """
+        Best matches first: [{id, title, snippet, updated_at}].
+        The snippet is HTML-escaped, with <mark> highlights.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        if db.bind.dialect.name == "postgresql":
+            rows = self._search_postgres(db, user_id, terms, limit)
+        else:
+            rows = self._search_sqlite(db, user_id, terms, limit)
+        return [
+            {
+                "id": UUID(str(row.id)),
+                "title": row.title,
+                "snippet": _highlight(row.snippet),
+                "updated_at": row.updated_at,
+            }
+            for row in rows
+        ]
+
+    def _search_sqlite(self, db: Session, user_id: UUID, terms: list[str], limit: int):
+        params = {"start": _START, "stop": _STOP, "limit": limit}
+        # Trigrams only match terms of 3+ characters; shorter ones ("公园") are
+        # LIKE filters on the rows the MATCH leaves (this user's articles)
+        match = f'user_key:"u{user_id.hex}"'
+        long_terms = [term.replace('"', '""') for term in terms if len(term) >= 3]
+        if long_terms:
+            phrases = " AND ".join(f'"{term}"' for term in long_terms)
+            match += f" AND {{title body}}:({phrases})"
+        params["match"] = match
+        short_filters = ""
+        for i, term in enumerate(term for term in terms if len(term) < 3):
+            params[f"short{i}"] = "%" + term.replace("_", "\\_") + "%"
+            short_filters += (
+                f" AND (articles_fts.title LIKE :short{i} ESCAPE '\\'"
+                f" OR articles_fts.body LIKE :short{i} ESCAPE '\\')"
+            )
+        # Trigram snippets count characters: 64 is the most snippet() allows.
+        # bm25 weights per column (user_key, article_key, title, body): lower is better
+        query = text(f"""
+            SELECT a.id, a.title, a.updated_at,
+                   snippet(articles_fts, 3, :start, :stop, '…', 64) AS snippet
+            FROM articles_fts
+            JOIN articles a ON a.id = substr(articles_fts.article_key, 2)
+            WHERE articles_fts MATCH :match AND a.is_deleted = 0{short_filters}
+            ORDER BY bm25(articles_fts, 0, 0, 10.0, 1.0), a.updated_at DESC
+            LIMIT :limit
+        """).columns(updated_at=DateTime)
+        return db.execute(query, params).fetchall()
+
+    def _search_postgres(
+        self, db: Session, user_id: UUID, terms: list[str], limit: int
+    ):
+        tsquery = " & ".join(f"({tsquery_term(term)})" for term in terms)
+        # ts_headline re-parses the body, so it only runs on the page of results
+        query = text("""
+            SELECT hit.id, hit.title, hit.updated_at,
+                   ts_headline(
+                       'simple', coalesce(hit.content_text, hit.title), hit.q, :options
+                   ) AS snippet
+            FROM (
+                SELECT a.id, a.title, a.updated_at, a.content_text, q,
+                       ts_rank_cd(a.search_vector, q) AS rank
+                FROM articles a, to_tsquery('simple', :tsquery) q
+                WHERE a.user_id = :user_id AND a.is_deleted = false
+                  AND a.search_vector @@ q
+                ORDER BY rank DESC, a.updated_at DESC
+                LIMIT :limit
+            ) hit
+            ORDER BY hit.rank DESC, hit.updated_at DESC
+        """)
+        params = {
+            "tsquery": tsquery,
+            "user_id": user_id,
+            "limit": limit,
+            "options": (
+                f'StartSel="{_START}", StopSel="{_STOP}", '
+                "MaxWords=24, MinWords=8, MaxFragments=1"
+            ),
+        }
+        return db.execute(query, params).fetchall()
+
+
+article_search = ArticleSearch()
@@ -0,0 +1,92 @@
+import hashlib
+import re
+import unicodedata
+
+# Inline nodes are concatenated inside their block; anything else starts a new line
+_INLINE_TYPES = {"text", "hardBreak", "mention", "emoji", "inlineMath"}
+_CJK_RE = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]"
+)
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def _leaf_text(node: dict) -> str | None:
+    # Text of an inline leaf, or None for nodes with children
+    node_type = node.get("type")
+    if node_type == "text":
+        return node.get("text") or ""
+    if node_type == "hardBreak":
+        return "\n"
+    if node_type in ("mention", "emoji"):
+        attrs = node.get("attrs") or {}
+        return str(attrs.get("label") or attrs.get("id") or "")
+    return None
+
+
+def node_text(node: dict) -> str:
+    """
+    Plain text of a TipTap node. Iterative (deep nesting can't hit the recursion
+    limit) and built with one join; inline children are concatenated, block children
+    go on their own lines.
+    """
+    parts: list[str] = []
+    stack: list = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        if not isinstance(item, dict):
+            continue
+        leaf = _leaf_text(item)
+        if leaf is not None:
+            parts.append(leaf)
+            continue
+        children = item.get("content") or []
+        children = [child for child in children if isinstance(child, dict)]
+        # Push in reverse so children pop in document order, with newlines around
+        # block children
+        for i in range(len(children) - 1, -1, -1):
+            stack.append(children[i])
+            if i and (
+                children[i].get("type") not in _INLINE_TYPES
+                or children[i - 1].get("type") not in _INLINE_TYPES
+            ):
+                stack.append("\n")
+    return "".join(parts)
+
+
+def block_texts(content) -> list[str]:
+    """
+    Plain text of each top-level block (paragraph, heading, list, table...), empty
+    blocks dropped.
+    """
+    if not isinstance(content, dict):
+        return []
+    nodes = content.get("content") or []
+    blocks = [node_text(node) for node in nodes if isinstance(node, dict)]
+    return [block for block in blocks if block.strip()]
+
+
+def to_text(content) -> str:
+    return "\n".join(block_texts(content))
+
+
+def word_count(text: str) -> int:
+    # Words in space-separated scripts plus one per CJK character, as editors count them
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + len(_WORD_RE.findall(_CJK_RE.sub(" ", text)))
+
+
+def char_count(text: str) -> int:
+    # Characters excluding whitespace
+    return sum(1 for c in text if not c.isspace())
+
+
+def text_fingerprint(text: str) -> str:
+    """
+    Hash of normalized plain text: formatting, whitespace and empty blocks don't
+    change it.
+    """
+    normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
@@ -0,0 +1,63 @@
+"""
+Fill the plain-text projection (content_text, word_count, char_count) of articles
+written before it existed. Safe to re-run; only rows without content_text are
+touched.
+
+    python -m src.tools.backfill_content_text --batch-size 500
+"""
+
+import argparse
+
+from sqlalchemy import update
+
+from src.core.database import SessionLocal
+from src.models.article import Article
+from src.services import tiptap
+
+
+def backfill(session_factory=SessionLocal, batch_size: int = 500) -> int:
+    updated, last_id = 0, None
+    db = session_factory()
+    try:
+        while True:
+            # Keyset over id: each batch is one short transaction, no growing OFFSET
+            query = db.query(Article).filter(Article.content_text.is_(None))
+            if last_id is not None:
+                query = query.filter(Article.id > last_id)
+            batch = query.order_by(Article.id.asc()).limit(batch_size).all()
+            if not batch:
+                return updated
+            rows = []
+            for article in batch:
+                text = tiptap.to_text(article.content)
+                fingerprint = article.content_fingerprint
+                fingerprint = fingerprint or tiptap.text_fingerprint(text)
+                rows.append(
+                    {
+                        "id": article.id,
+                        "content_text": text,
+                        "word_count": tiptap.word_count(text),
+                        "char_count": tiptap.char_count(text),
+                        "content_fingerprint": fingerprint,
+                        # Explicit, so onupdate doesn't bump it: this isn't an edit
+                        "updated_at": article.updated_at,
+                    }
+                )
+            db.execute(update(Article), rows)
+            db.commit()
+            updated += len(batch)
+            last_id = batch[-1].id
+            print(f"Backfilled {updated} articles")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill articles.content_text")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    print(f"Done: {backfill(batch_size=args.batch_size)} articles updated")
+
+
+if __name__ == "__main__":
+    main()
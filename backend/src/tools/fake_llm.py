@@ -0,0 +1,250 @@
+"""
+Deterministic OpenAI-compatible stand-in for load testing.
+
+    python -m src.tools.fake_llm --port 9000 --ttft-ms 400 --itl-ms 30 --error-rate 0.02
+
+Point the API at it with
+    AI_PROVIDER=local-fake
+    AI_EXTRA_PROVIDERS='[{"name": "local-fake", "base_url": "http://localhost:9000/v1",
+                          "api_key": "fake", "model": "fake-model"}]'
+
+Latencies are drawn from log-normal distributions around the configured medians.
+Every request gets its own RNG seeded from --seed and the request body, so the
+same prompt always produces the same output and timings regardless of interleaving.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class FakeLLMConfig:
+    def __init__(
+        self,
+        ttft_ms: float = 400,
+        ttft_sigma: float = 0.5,
+        itl_ms: float = 30,
+        itl_sigma: float = 0.3,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+        chunk_chars: int = 4,
+    ):
+        self.ttft_ms = ttft_ms
+        self.ttft_sigma = ttft_sigma
+        self.itl_ms = itl_ms
+        self.itl_sigma = itl_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self.chunk_chars = chunk_chars
+
+
+def _lognormal_seconds(rng: random.Random, median_ms: float, sigma: float) -> float:
+    if median_ms <= 0:
+        return 0.0
+    return rng.lognormvariate(math.log(median_ms), sigma) / 1000
+
+
+def canned_completion(messages: list, rng: random.Random) -> str:
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+
+    if "Chinese Almanac" in prompt:
+        activities = [
+            "Travel",
+            "Wedding",
+            "Moving",
+            "Cleaning",
+            "Signing contracts",
+            "Planting",
+            "Funeral",
+            "Renovation",
+        ]
+        rng.shuffle(activities)
+        return json.dumps(
+            {
+                "yi": activities[:3],
+                "ji": activities[3:5],
+                "icon": rng.choice(["🏮", "🧧", "🐉", "🌙"]),
+            }
+        )
+
+    if "managing the user's knowledge base" in prompt:
+        text = prompt.split("Text to Analyze:", 1)[-1].strip()
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            return "[]"
+        topic = words[rng.randrange(len(words))]
+        return json.dumps(
+            [
+                {
+                    "action": "create",
+                    "key": f"interest_in_{topic}"[:50],
+                    "content": f"User wrote about {topic}",
+                    "emoji": "📝",
+                    "category": "Knowledge",
+                    "confidence": rng.choice(["low", "medium", "high"]),
+                }
+            ],
+            ensure_ascii=False,
+        )
+
+    if ">> QUOTE:" in prompt:
+        text = prompt.rsplit("Text:", 1)[-1].strip()
+        sentences = [
+            s.strip()
+            for s in re.split(r"(?<=[.!?。！？])\s*", text)
+            if len(s.strip()) > 10
+        ]
+        if not sentences or rng.random() < 0.3:
+            return ">> NO_COMMENT"
+        quote = sentences[rng.randrange(len(sentences))]
+        return (
+            f">> QUOTE: {quote}\n>> COMMENT: This is a fake comment about this"
+            " sentence; it reads clearly and could use one concrete example."
+        )
+
+    reply = "This is a deterministic reply from the fake LLM server. "
+    return reply * rng.randint(1, 3)
+
+
+def create_app(config: FakeLLMConfig) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        raw = await request.body()
+        body = json.loads(raw)
+        app.state.requests += 1
+        seed = int(
+            hashlib.sha256(f"{config.seed}:".encode() + raw).hexdigest()[:16], 16
+        )
+        rng = random.Random(seed)
+
+        if rng.random() < config.error_rate:
+            return JSONResponse(
+                {"error": {"message": "injected failure"}}, status_code=500
+            )
+        if rng.random() < config.rate_limit_rate:
+            return JSONResponse(
+                {"error": {"message": "injected rate limit"}}, status_code=429
+            )
+
+        model = body.get("model", "fake-model")
+        completion = canned_completion(body.get("messages", []), rng)
+        ttft = _lognormal_seconds(rng, config.ttft_ms, config.ttft_sigma)
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft)
+            return {
+                "id": f"fake-{seed:x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": completion},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+
+        pieces = [
+            completion[i : i + config.chunk_chars]
+            for i in range(0, len(completion), config.chunk_chars)
+        ]
+        delays = [
+            _lognormal_seconds(rng, config.itl_ms, config.itl_sigma) for _ in pieces
+        ]
+
+        async def stream():
+            await asyncio.sleep(ttft)
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(delays[i])
+                payload = {
+                    "id": f"fake-{seed:x}",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                    ],
+                }
+                yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def stats():
+        return {"requests": app.state.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Deterministic fake OpenAI-compatible server"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument(
+        "--ttft-ms", type=float, default=400, help="median time to first token"
+    )
+    parser.add_argument(
+        "--ttft-sigma", type=float, default=0.5, help="log-normal spread of TTFT"
+    )
+    parser.add_argument(
+        "--itl-ms", type=float, default=30, help="median inter-token latency"
+    )
+    parser.add_argument(
+        "--itl-sigma",
+        type=float,
+        default=0.3,
+        help="log-normal spread of inter-token latency",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of requests answered with 500",
+    )
+    parser.add_argument(
+        "--rate-limit-rate",
+        type=float,
+        default=0.0,
+        help="fraction of requests answered with 429",
+    )
+    parser.add_argument(
+        "--chunk-chars", type=int, default=4, help="characters per streamed chunk"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeLLMConfig(
+        ttft_ms=args.ttft_ms,
+        ttft_sigma=args.ttft_sigma,
+        itl_ms=args.itl_ms,
+        itl_sigma=args.itl_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+        chunk_chars=args.chunk_chars,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Load harness that drives realistic editor sessions against a running Aura API.
+
+    python -m src.tools.fake_llm --port 9000 &
+    uvicorn src.main:app --port 8000 &   # configured to use the fake LLM
+    python -m src.tools.loadtest --users 50 --duration 60
+
+Each virtual user registers, enables background scanning, creates an article and
+then keeps writing: autosave PUTs, analysis streams (raw and typed events),
+whole-document reviews, comments and replies, memory and sidebar page loads.
+Latency percentiles and throughput are reported per endpoint.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+from src.core.metrics import percentile
+
+SENTENCES = [
+    "Today I finally finished the first draft of my novel.",
+    "The coffee shop on the corner was unusually quiet this morning.",
+    "I keep thinking about how to structure the second chapter.",
+    "My sister called and we talked for almost two hours.",
+    "I want to get better at writing short, punchy sentences.",
+    "今天天气很好，我去公园散步了。",
+    "Running in the rain felt strangely freeing.",
+    "I'm not sure the ending works, it feels rushed.",
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, label: str, seconds: float, ok: bool = True):
+        self.latencies[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+    def report(self, elapsed: float) -> list[dict]:
+        rows = []
+        for label in sorted(self.latencies):
+            samples = sorted(self.latencies[label])
+            rows.append(
+                {
+                    "endpoint": label,
+                    "count": len(samples),
+                    "errors": self.errors[label],
+                    "rps": len(samples) / elapsed if elapsed else 0.0,
+                    "p50_ms": percentile(samples, 50) * 1000,
+                    "p95_ms": percentile(samples, 95) * 1000,
+                    "p99_ms": percentile(samples, 99) * 1000,
+                }
+            )
+        return rows
+
+
+def tiptap_doc(paragraphs: list[str]) -> dict:
+    return {
+        "type": "doc",
+        "content": [
+            {"type": "paragraph", "content": [{"type": "text", "text": p}]}
+            for p in paragraphs
+        ],
+    }
+
+
+class Session:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        recorder: Recorder,
+        rng: random.Random,
+        think_time: float,
+    ):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.think_time = think_time
+        self.headers = {}
+        self.article_id = None
+        self.paragraphs: list[str] = []
+        self.comment_ids: list[str] = []
+
+    async def timed(
+        self, label: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, url, headers=self.headers, **kwargs
+            )
+            self.recorder.record(
+                label, time.perf_counter() - started, response.status_code < 400
+            )
+            return response
+        except httpx.HTTPError:
+            self.recorder.record(label, time.perf_counter() - started, False)
+            return None
+
+    async def checked(self, label: str, method: str, url: str, **kwargs) -> dict:
+        # Setup steps must succeed, otherwise every later request is meaningless
+        response = await self.timed(label, method, url, **kwargs)
+        if response is None:
+            raise RuntimeError(f"setup failed: {label}: no response from server")
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"setup failed: {label} returned {response.status_code}: "
+                f"{response.text[:200]}"
+            )
+        return response.json()
+
+    async def setup(self):
+        email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        registered = await self.checked(
+            "POST /auth/register",
+            "POST",
+            "/auth/register",
+            json={"email": email, "password": "loadtest"},
+        )
+        token = registered["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+        await self.checked(
+            "PUT /user/settings",
+            "PUT",
+            "/user/settings",
+            json={
+                "settings": {
+                    "background_scan": {
+                        "enabled": True,
+                        "interval_unit": "minutes",
+                        "interval_value": 1,
+                    }
+                }
+            },
+        )
+
+        self.paragraphs = [self.rng.choice(SENTENCES)]
+        article = await self.checked(
+            "POST /articles/",
+            "POST",
+            "/articles/",
+            json={"title": "Load test", "content": tiptap_doc(self.paragraphs)},
+        )
+        self.article_id = article["id"]
+
+    async def autosave(self):
+        self.paragraphs.append(self.rng.choice(SENTENCES))
+        await self.timed(
+            "PUT /articles/{id}",
+            "PUT",
+            f"/articles/{self.article_id}",
+            json={"content": tiptap_doc(self.paragraphs)},
+        )
+
+    async def streamed(self, url: str, payload: dict) -> tuple[bool, str]:
+        # Records total time and time to first byte of a streaming endpoint
+        label = f"POST {url}"
+        started = time.perf_counter()
+        first_byte = None
+        ok = True
+        body = ""
+        try:
+            async with self.client.stream(
+                "POST", url, headers=self.headers, json=payload
+            ) as response:
+                ok = response.status_code < 400
+                async for chunk in response.aiter_text():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    body += chunk
+        except httpx.HTTPError:
+            ok = False
+        self.recorder.record(label, time.perf_counter() - started, ok)
+        if first_byte is not None:
+            self.recorder.record(f"{label} (ttfb)", first_byte)
+        return ok, body
+
+    async def analyze(self):
+        ok, body = await self.streamed(
+            "/ai/analyze/stream",
+            {
+                "text": "\n".join(self.paragraphs),
+                "context": "",
+                "existing_quotes": [],
+            },
+        )
+        if ok and ">> COMMENT:" in body:
+            quote = body.split(">> QUOTE:", 1)[-1].split(">> COMMENT:", 1)[0].strip()
+            comment = body.split(">> COMMENT:", 1)[1].strip()
+            response = await self.timed(
+                "POST /comments/",
+                "POST",
+                "/comments/",
+                json={
+                    "article_id": self.article_id,
+                    "content": comment,
+                    "quote": quote,
+                },
+            )
+            if (
+                response is not None
+                and response.status_code < 400
+                and "id" in response.json()
+            ):
+                self.comment_ids.append(response.json()["id"])
+
+    async def analyze_events(self):
+        # The editor's typed-event path; the server saves the comment itself
+        ok, body = await self.streamed(
+            "/ai/analyze/events",
+            {
+                "text": "\n".join(self.paragraphs),
+                "article_id": self.article_id,
+                "mode": "incremental",
+                "persist": True,
+            },
+        )
+        if not ok:
+            return
+        for frame in body.split("\n\n"):
+            if not frame.startswith("event: done"):
+                continue
+            data = json.loads(frame.split("data: ", 1)[1])
+            if data.get("comment"):
+                self.comment_ids.append(data["comment"]["id"])
+
+    async def review(self):
+        await self.streamed(
+            "/ai/review/stream",
+            {
+                "article_id": self.article_id,
+                "text": "\n".join(self.paragraphs),
+                "max_comments": 3,
+            },
+        )
+
+    async def reply(self):
+        if not self.comment_ids:
+            return await self.analyze()
+        comment_id = self.rng.choice(self.comment_ids)
+        await self.timed(
+            "POST /comments/{id}/reply",
+            "POST",
+            f"/comments/{comment_id}/reply",
+            json={"content": "Thanks, can you say more?"},
+        )
+
+    async def load_memories(self):
+        await self.timed("GET /memories/", "GET", "/memories/")
+
+    async def load_sidebar(self):
+        await self.timed("GET /articles/", "GET", "/articles/")
+
+    async def run(self, deadline: float):
+        actions = [
+            (self.autosave, 45),
+            (self.analyze, 15),
+            (self.analyze_events, 15),
+            (self.review, 3),
+            (self.reply, 8),
+            (self.load_memories, 7),
+            (self.load_sidebar, 10),
+        ]
+        funcs, weights = zip(*actions)
+        while time.monotonic() < deadline:
+            await self.rng.choices(funcs, weights)[0]()
+            await asyncio.sleep(
+                self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0
+            )
+
+
+async def run_load(
+    base_url: str, users: int, duration: float, think_time: float, seed: int
+) -> tuple[list[dict], float]:
+    recorder = Recorder()
+    limits = httpx.Limits(
+        max_connections=users * 2, max_keepalive_connections=users * 2
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=120, limits=limits
+    ) as client:
+        sessions = [
+            Session(client, recorder, random.Random(seed + i), think_time)
+            for i in range(users)
+        ]
+        await asyncio.gather(*(s.setup() for s in sessions))
+
+        started = time.monotonic()
+        await asyncio.gather(*(s.run(started + duration) for s in sessions))
+        elapsed = time.monotonic() - started
+    return recorder.report(elapsed), elapsed
+
+
+def print_report(rows: list[dict], elapsed: float):
+    print(f"\nDuration: {elapsed:.1f}s")
+    print(
+        f"{'endpoint':<36} {'count':>7} {'err':>5} {'req/s':>8} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    for row in rows:
+        print(
+            f"{row['endpoint']:<36} {row['count']:>7} {row['errors']:>5} "
+            f"{row['rps']:>8.2f} "
+            f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aura API load harness")
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument(
+        "--users", type=int, default=20, help="concurrent virtual users"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=60, help="seconds of steady load after setup"
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=1.0,
+        help="mean seconds between a user's actions",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--json", dest="json_out", help="also write the report to this file"
+    )
+    args = parser.parse_args()
+
+    rows, elapsed = asyncio.run(
+        run_load(args.base_url, args.users, args.duration, args.think_time, args.seed)
+    )
+    print_report(rows, elapsed)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"duration": elapsed, "endpoints": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
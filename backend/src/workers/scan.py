@@ -0,0 +1,180 @@
+"""
+Memory scan worker: processes the scan_jobs queue outside the API process.
+
+    python -m src.workers.scan --processes 4 --concurrency 4
+
+By default (AI_SCAN_EXTERNAL_WORKERS=true) the API only enqueues jobs. With
+AI_SCAN_EXTERNAL_WORKERS=false it runs an in-process worker on its scheduler tick
+instead; that worker shares the API event loop and its synchronous DB calls, so
+it is for development only.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+
+from src.core.config import settings
+from src.core.database import SessionLocal
+from src.core.metrics import metrics
+from src.models.user import User
+from src.services.ai.background_scanner import background_scanner
+from src.services.ai.client import ai_client
+from src.services.scan_queue import scan_queue
+from src.services.scan_schedule import scan_schedule
+
+logger = logging.getLogger(__name__)
+
+
+class ScanWorker:
+    def __init__(self, concurrency: int | None = None, session_factory=SessionLocal):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = max(1, concurrency or settings.AI_SCAN_CONCURRENCY)
+        self.session_factory = session_factory
+
+    async def run_once(self) -> int:
+        """
+        Lease up to `concurrency` jobs and process them concurrently.
+        Returns how many ran.
+        """
+        db = self.session_factory()
+        try:
+            jobs = []
+            while len(jobs) < self.concurrency:
+                job = scan_queue.lease(db, self.worker_id)
+                if job is None:
+                    break
+                jobs.append((job.id, job.user_id, job.backlog))
+        finally:
+            db.close()
+        await asyncio.gather(*(self.process(*job) for job in jobs))
+        return len(jobs)
+
+    async def run_until_empty(self):
+        while await self.run_once():
+            pass
+
+    async def run_forever(self):
+        logger.info(
+            f"Scan worker {self.worker_id} started (concurrency {self.concurrency})"
+        )
+        await ai_client.startup()
+        try:
+            while True:
+                if not await self.run_once():
+                    await asyncio.sleep(settings.AI_SCAN_POLL_SECONDS)
+        finally:
+            await ai_client.aclose()
+
+    async def process(self, job_id, user_id, backlog: bool):
+        db = self.session_factory()
+        started = time.monotonic()
+        scan = asyncio.create_task(self._scan(db, user_id, backlog))
+        lease_lost = asyncio.Event()
+        keep_leased = asyncio.create_task(self._keep_leased(job_id, scan, lease_lost))
+        try:
+            has_more = await scan
+        except asyncio.CancelledError:
+            if lease_lost.is_set():
+                # Another worker owns the job now, don't touch it
+                logger.warning(f"Scan job {job_id} lost its lease")
+                metrics.incr("scan_jobs.lease_lost")
+                return
+            # Worker shutting down: give the job back and let the cancellation through.
+            # Own session: the scan may still be unwinding on `db`.
+            release_db = self.session_factory()
+            try:
+                scan_queue.release(release_db, job_id, self.worker_id)
+            finally:
+                release_db.close()
+            raise
+        except Exception as e:
+            logger.error(f"Scan job {job_id} for user {user_id} failed: {e}")
+            db.rollback()
+            scan_queue.fail(db, job_id, self.worker_id, str(e))
+            return
+        else:
+            if scan_queue.complete(db, job_id, self.worker_id) and has_more:
+                scan_queue.enqueue(db, user_id, backlog=True)
+        finally:
+            keep_leased.cancel()
+            db.close()
+            metrics.observe("scan.user_seconds", time.monotonic() - started)
+
+    async def _scan(self, db, user_id, backlog: bool) -> bool:
+        user = (
+            db.query(User).filter(User.id == user_id, User.is_active.is_(True)).first()
+        )
+        if not user:
+            return False
+        has_more = await background_scanner.scan_user_articles(
+            db, user, budget=settings.AI_SCAN_ARTICLES_PER_TICK, backlog=backlog
+        )
+        if not has_more:
+            # Changes still inside their scan interval: come back when it ends
+            scan_schedule.after_scan(db, user)
+        return has_more
+
+    async def _keep_leased(self, job_id, scan: asyncio.Task, lease_lost: asyncio.Event):
+        # Own session: the scan's session may be mid-transaction
+        while True:
+            await asyncio.sleep(settings.AI_SCAN_LEASE_SECONDS / 3)
+            db = self.session_factory()
+            try:
+                if not scan_queue.heartbeat(db, job_id, self.worker_id):
+                    lease_lost.set()
+                    scan.cancel()
+                    return
+            finally:
+                db.close()
+
+
+def _run_process(concurrency: int):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s",
+        force=True,
+    )
+    try:
+        asyncio.run(ScanWorker(concurrency).run_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aura memory scan worker")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.AI_SCAN_CONCURRENCY,
+        help="jobs processed at once per process",
+    )
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _run_process(args.concurrency)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=_run_process, args=(args.concurrency,), name=f"scan-worker-{i}"
+        )
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
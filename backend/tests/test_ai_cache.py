@@ -0,0 +1,70 @@
+import asyncio
+from unittest.mock import patch
+
+from src.core.metrics import metrics
+from src.services.ai.analysis import _cache_key, analysis_service
+from src.services.ai.cache import ResponseCache, replay_chunks
+from src.services.ai.providers import Provider, ProviderPool
+
+
+def test_lru_evicts_oldest_entry():
+    cache = ResponseCache("test_lru", max_entries=2, ttl_seconds=60)
+
+    async def run():
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        await cache.get("a")  # "a" becomes most recently used
+        await cache.set("c", "3")
+        return [await cache.get(key) for key in "abc"]
+
+    assert asyncio.run(run()) == ["1", None, "3"]
+
+
+def test_expired_entries_are_misses():
+    cache = ResponseCache("test_ttl", max_entries=10, ttl_seconds=-1)
+    asyncio.run(cache.set("a", "1"))
+    assert asyncio.run(cache.get("a")) is None
+
+
+def test_hit_and_miss_counters():
+    cache = ResponseCache("test_counters", max_entries=10, ttl_seconds=60)
+    asyncio.run(cache.get("missing"))
+    asyncio.run(cache.set("present", "value"))
+    asyncio.run(cache.get("present"))
+
+    assert metrics.counter("cache.test_counters.hit") == 1
+    assert metrics.counter("cache.test_counters.miss") == 1
+
+
+def test_replay_preserves_completion():
+    completion = ">> QUOTE: Hello\n>> COMMENT: Nice opening."
+    assert "".join(replay_chunks(completion)) == completion
+
+
+def test_failover_answers_are_keyed_on_the_serving_provider():
+    primary = Provider("primary", "http://primary.local/v1", "key", "model-a")
+    backup = Provider("backup", "http://backup.local/v1", "key", "model-b")
+
+    class FailoverClient:
+        pool = ProviderPool([primary, backup])
+
+        async def stream_chat_completion(self, messages, priority, served=None):
+            self.messages = messages
+            served["provider"] = backup
+            yield "answer"
+
+    client = FailoverClient()
+    cache = ResponseCache("test_failover", max_entries=10, ttl_seconds=60)
+
+    async def run():
+        chunks = analysis_service.analyze_text("Some text to look at.")
+        return "".join([chunk async for chunk in chunks])
+
+    with (
+        patch("src.services.ai.analysis.ai_client", client),
+        patch("src.services.ai.analysis.analysis_cache", cache),
+    ):
+        assert asyncio.run(run()) == "answer"
+
+    assert asyncio.run(cache.get(_cache_key(client.messages, primary))) is None
+    assert asyncio.run(cache.get(_cache_key(client.messages, backup))) == "answer"
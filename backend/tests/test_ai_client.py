@@ -0,0 +1,221 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from src.core.config import settings
+from src.services.ai.client import AIClient
+from src.services.ai.dispatcher import Priority
+from src.services.ai.providers import Provider, ProviderPool
+
+
+class CountingClient(AIClient):
+    def __init__(self, chunks, delay=0.01):
+        super().__init__()
+        self.upstream_calls = 0
+        self.cancelled = False
+        self._chunks = chunks
+        self._delay = delay
+
+    async def _stream_provider(self, provider, messages, options):
+        self.upstream_calls += 1
+        try:
+            for chunk in self._chunks:
+                await asyncio.sleep(self._delay)
+                yield chunk
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+async def collect(stream):
+    return "".join([chunk async for chunk in stream])
+
+
+def test_identical_requests_share_one_upstream_call():
+    async def run():
+        client = CountingClient(["a", "b", "c", "d"])
+        messages = [{"role": "user", "content": "hello"}]
+
+        first = asyncio.create_task(collect(client.stream_chat_completion(messages)))
+        await asyncio.sleep(0.025)  # first stream is mid-way
+        second = asyncio.create_task(collect(client.stream_chat_completion(messages)))
+        results = await asyncio.gather(first, second)
+        return client, results
+
+    client, results = asyncio.run(run())
+    assert results == ["abcd", "abcd"]
+    assert client.upstream_calls == 1
+
+
+def test_different_requests_are_not_coalesced():
+    async def run():
+        client = CountingClient(["x"])
+        await asyncio.gather(
+            collect(
+                client.stream_chat_completion([{"role": "user", "content": "one"}])
+            ),
+            collect(
+                client.stream_chat_completion([{"role": "user", "content": "two"}])
+            ),
+        )
+        return client
+
+    assert asyncio.run(run()).upstream_calls == 2
+
+
+def test_upstream_is_cancelled_when_last_reader_leaves():
+    async def run():
+        client = CountingClient(["a", "b", "c", "d"], delay=0.05)
+        stream = client.stream_chat_completion([{"role": "user", "content": "hello"}])
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        return client
+
+    client = asyncio.run(run())
+    assert client.cancelled
+    assert client._inflight == {}
+
+
+# --- Provider routing against fake OpenAI-compatible endpoints ---
+
+
+def fake_openai_transport(behaviours):
+    """behaviours: host -> {"status": int, "chunks": [str], "ttft": float}"""
+
+    async def handler(request):
+        behaviour = behaviours[request.url.host]
+        if behaviour.get("status", 200) != 200:
+            return httpx.Response(behaviour["status"], text="upstream error")
+
+        async def body():
+            await asyncio.sleep(behaviour.get("ttft", 0))
+            for chunk in behaviour["chunks"]:
+                payload = {"choices": [{"delta": {"content": chunk}}]}
+                yield f"data: {json.dumps(payload)}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(
+            200, content=body(), headers={"content-type": "text/event-stream"}
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def make_client(behaviours):
+    pool = ProviderPool(
+        [
+            Provider(host.split(".")[0], f"http://{host}/v1", "test-key", "fake-model")
+            for host in behaviours
+        ]
+    )
+    return AIClient(
+        pool=pool, http=httpx.AsyncClient(transport=fake_openai_transport(behaviours))
+    )
+
+
+def test_fails_over_to_next_provider():
+    client = make_client(
+        {
+            "bad.local": {"status": 500},
+            "good.local": {"chunks": ["hello", " world"]},
+        }
+    )
+    served = {}
+    messages = [{"role": "user", "content": "hi"}]
+    result = asyncio.run(
+        collect(client.stream_chat_completion(messages, served=served))
+    )
+
+    assert result == "hello world"
+    bad, good = client.pool.providers
+    assert served["provider"] is good
+    assert bad.error_rate > 0 and bad.consecutive_failures == 1
+    assert good.ttft_ewma is not None
+
+
+def test_circuit_opens_after_repeated_failures(monkeypatch):
+    monkeypatch.setattr(settings, "AI_CIRCUIT_FAILURE_THRESHOLD", 2)
+    client = make_client(
+        {
+            "bad.local": {"status": 503},
+            "good.local": {"chunks": ["ok"]},
+        }
+    )
+
+    bad, good = client.pool.providers
+
+    async def run():
+        # Pin the order so the failing provider is tried first every time
+        for i in range(2):
+            await collect(
+                client._stream_routed(
+                    [{"role": "user", "content": f"call {i}"}],
+                    Priority.INTERACTIVE,
+                    {},
+                    [bad, good],
+                )
+            )
+
+    asyncio.run(run())
+    assert bad.circuit == "open"
+    assert client.pool.ranked() == [good]
+
+
+def test_hedged_request_uses_faster_provider(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_HEDGE_DELAY_MS", 50)
+    client = make_client(
+        {
+            "slow.local": {"chunks": ["slow"], "ttft": 1.0},
+            "fast.local": {"chunks": ["fast"]},
+        }
+    )
+
+    started = time.monotonic()
+    served = {}
+    messages = [{"role": "user", "content": "hi"}]
+    result = asyncio.run(
+        collect(client.stream_chat_completion(messages, served=served))
+    )
+
+    assert result == "fast"
+    assert served["provider"].name == "fast"
+    assert time.monotonic() - started < 0.9
+
+
+def test_keyless_extra_providers_are_used_without_auth(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "AI_PROVIDER", "deepseek")
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "real-key")
+    monkeypatch.setattr(settings, "AI_FALLBACK_PROVIDERS", "openai")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "")
+    monkeypatch.setattr(
+        settings,
+        "AI_EXTRA_PROVIDERS",
+        [
+            {"name": "local", "base_url": "http://local.local/v1", "model": "llama"},
+        ],
+    )
+    with caplog.at_level("WARNING"):
+        pool = ProviderPool.from_settings()
+
+    assert [p.name for p in pool.providers] == ["deepseek", "local"]
+    assert "openai has no API key" in caplog.text
+
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers.get("authorization"))
+        payload = {"choices": [{"delta": {"content": "ok"}}]}
+        body = f"data: {json.dumps(payload)}\n\ndata: [DONE]\n\n"
+        return httpx.Response(200, text=body)
+
+    client = AIClient(
+        pool=ProviderPool([pool.providers[1]]),
+        http=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    messages = [{"role": "user", "content": "hi"}]
+    assert asyncio.run(collect(client.stream_chat_completion(messages))) == "ok"
+    assert seen == [None]
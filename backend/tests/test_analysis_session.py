@@ -0,0 +1,49 @@
+from src.api.ai import ParagraphSplice
+from src.services.ai.analysis_session import (
+    GAP_MARKER,
+    apply_splices,
+    focus_text,
+    paragraph_hash,
+)
+
+
+def test_apply_splices_replaces_inserts_and_deletes():
+    paragraphs = ["a", "b", "c"]
+    result = apply_splices(
+        paragraphs,
+        [
+            ParagraphSplice(start=1, delete_count=1, insert=["B"]),
+            ParagraphSplice(start=3, insert=["d"]),
+            ParagraphSplice(start=0, delete_count=1),
+        ],
+    )
+    assert result == ["B", "c", "d"]
+
+
+def test_focus_text_sends_changes_with_window():
+    paragraphs = [f"paragraph {i}" for i in range(8)]
+    analyzed = {paragraph_hash(p) for p in paragraphs}
+    paragraphs[5] = "paragraph 5 edited"
+
+    text, changed = focus_text(paragraphs, analyzed, window=1)
+
+    assert changed == 1
+    assert text.split("\n") == ["paragraph 4", "paragraph 5 edited", "paragraph 6"]
+
+
+def test_focus_text_marks_gaps_between_changes():
+    paragraphs = [f"paragraph {i}" for i in range(10)]
+    analyzed = {paragraph_hash(p) for p in paragraphs}
+    paragraphs[1] = "first change"
+    paragraphs[8] = "second change"
+
+    text, changed = focus_text(paragraphs, analyzed, window=0)
+
+    assert changed == 2
+    assert text.split("\n") == ["first change", GAP_MARKER, "second change"]
+
+
+def test_focus_text_without_changes_is_empty():
+    paragraphs = ["same", "", "text"]
+    analyzed = {paragraph_hash(p) for p in paragraphs}
+    assert focus_text(paragraphs, analyzed, window=1) == ("", 0)
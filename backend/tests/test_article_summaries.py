@@ -0,0 +1,174 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.api.articles import get_current_user
+from src.core.database import Base, get_db
+from src.main import app
+from src.models.article import Article
+from src.models.user import User
+from src.schemas.article import ArticleCreate
+from src.services.article import article_service
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+
+def doc(text):
+    return {
+        "type": "doc",
+        "content": [{"type": "paragraph", "content": [{"type": "text", "text": text}]}],
+    }
+
+
+def make_user(db):
+    user = User(
+        id=uuid.uuid4(),
+        email=f"{uuid.uuid4().hex}@example.com",
+        password_hash="pw",
+        settings={},
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_keyset_pages_follow_sidebar_order():
+    db = TestingSessionLocal()
+    user, other = make_user(db), make_user(db)
+    now = datetime(2026, 1, 1)
+    for i in range(11):
+        article = article_service.create_article(
+            db, ArticleCreate(title=f"Note {i}", content=doc(f"Body {i}")), user.id
+        )
+        # Ties on position and on updated_at must still page without gaps or repeats
+        article.position = i % 2
+        article.updated_at = now - timedelta(minutes=i // 3)
+    deleted = article_service.create_article(
+        db, ArticleCreate(title="Gone", content=doc("")), user.id
+    )
+    article_service.create_article(
+        db, ArticleCreate(title="Other", content=doc("")), other.id
+    )
+    db.commit()
+    article_service.delete_article(db, deleted.id, user.id)
+
+    remaining = (
+        db.query(Article)
+        .filter(Article.user_id == user.id, Article.is_deleted.is_(False))
+        .order_by(Article.position.asc(), Article.updated_at.desc(), Article.id.asc())
+    )
+    expected = [a.id for a in remaining]
+    seen, cursor = [], None
+    while True:
+        items, cursor = article_service.get_article_summaries(
+            db, user.id, limit=4, cursor=cursor
+        )
+        seen += [item["id"] for item in items]
+        if cursor is None:
+            break
+    assert seen == expected
+    assert len(seen) == 11
+    db.close()
+
+
+def test_move_is_applied_to_the_full_order():
+    db = TestingSessionLocal()
+    user, other = make_user(db), make_user(db)
+    now = datetime(2026, 1, 1)
+    articles = []
+    for i in range(6):
+        article = article_service.create_article(
+            db, ArticleCreate(title=f"Note {i}", content=doc("")), user.id
+        )
+        # All at position 0, as new articles are: the order comes from updated_at
+        article.updated_at = now - timedelta(minutes=i)
+        articles.append(article)
+    foreign = article_service.create_article(
+        db, ArticleCreate(title="Other", content=doc("")), other.id
+    )
+    db.commit()
+
+    def titles():
+        items, _ = article_service.get_article_summaries(db, user.id, limit=10)
+        return [item["title"] for item in items]
+
+    # Moved from the second page of a 2-per-page sidebar, below "Note 0"
+    assert article_service.move_article(db, user.id, articles[4].id, articles[0].id)
+    assert titles() == ["Note 0", "Note 4", "Note 1", "Note 2", "Note 3", "Note 5"]
+    assert article_service.move_article(db, user.id, articles[5].id, None)
+    assert titles() == ["Note 5", "Note 0", "Note 4", "Note 1", "Note 2", "Note 3"]
+    db.expire_all()
+    expected = [now - timedelta(minutes=i) for i in range(6)]
+    assert [a.updated_at for a in articles] == expected
+
+    assert not article_service.move_article(db, user.id, foreign.id, None)
+    assert not article_service.move_article(db, user.id, articles[0].id, foreign.id)
+    db.close()
+
+
+def test_summary_excerpt_and_endpoint():
+    db = TestingSessionLocal()
+    user = make_user(db)
+    long_text = "word " * 100
+    article_service.create_article(
+        db, ArticleCreate(title="Long", content=doc(long_text)), user.id
+    )
+    article_service.create_article(
+        db, ArticleCreate(title="Short", content=doc("Just   a line.")), user.id
+    )
+    db.refresh(user)
+    db.expunge(user)
+    db.close()
+
+    def override_get_db():
+        session = TestingSessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        client = TestClient(app)
+        response = client.get("/api/v1/articles/summary", params={"limit": 1})
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) == 1 and page["next_cursor"]
+        assert "content" not in page["items"][0]
+
+        second = client.get(
+            "/api/v1/articles/summary",
+            params={"limit": 1, "cursor": page["next_cursor"]},
+        ).json()
+        assert second["next_cursor"] is None
+        items = page["items"] + second["items"]
+        excerpts = {item["title"]: item["excerpt"] for item in items}
+        assert excerpts["Short"] == "Just a line."
+        assert excerpts["Long"].endswith("…") and len(excerpts["Long"]) <= 141
+
+        params = {"cursor": "not-a-cursor"}
+        invalid = client.get("/api/v1/articles/summary", params=params)
+        assert invalid.status_code == 400
+
+        top, below = page["items"][0]["id"], second["items"][0]["id"]
+        response = client.put(f"/api/v1/articles/{top}/move", json={"after_id": below})
+        assert response.status_code == 200
+        order = client.get("/api/v1/articles/summary").json()["items"]
+        assert [item["id"] for item in order] == [below, top]
+        missing = client.put(f"/api/v1/articles/{uuid.uuid4()}/move", json={})
+        assert missing.status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(previous)
@@ -0,0 +1,529 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.core.database import Base
+from src.models.article import Article
+from src.models.memory import Memory
+from src.models.scan_job import ScanJob
+from src.models.user import User
+from src.schemas.article import ArticleCreate, ArticleUpdate
+from src.services.ai.background_scanner import BackgroundScanner, background_scanner
+from src.services.ai.cache import ResponseCache
+from src.services.ai.memory_worker import UserMemories
+from src.services.article import article_service
+from src.services.scan_queue import scan_queue
+from src.services.scan_schedule import scan_schedule
+from src.workers.scan import ScanWorker
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+SCAN_SETTINGS = {
+    "background_scan": {
+        "enabled": True,
+        "interval_unit": "minutes",
+        "interval_value": 1,
+    }
+}
+
+
+def doc(*paragraphs):
+    return {
+        "type": "doc",
+        "content": [
+            {"type": "paragraph", "content": [{"type": "text", "text": p}]}
+            for p in paragraphs
+        ],
+    }
+
+
+def seed_user(db, article_count):
+    user = User(
+        id=uuid.uuid4(),
+        email=f"{uuid.uuid4().hex}@example.com",
+        password_hash="pw",
+        settings=SCAN_SETTINGS,
+    )
+    db.add(user)
+    now = datetime.utcnow()
+    if article_count:
+        scan_schedule.mark(user, now)
+    for i in range(article_count):
+        updated = now - timedelta(hours=article_count - i)
+        article = Article(
+            id=uuid.uuid4(),
+            user_id=user.id,
+            title=f"a{i}",
+            content={},
+            created_at=updated,
+            updated_at=updated,
+        )
+        db.add(article)
+    db.commit()
+    return user
+
+
+def process_article(db, user, article):
+    memories = UserMemories(db, user.id)
+    asyncio.run(background_scanner.process_article(db, user, article, memories))
+
+
+def test_workers_scan_users_concurrently_in_budgeted_chronological_jobs():
+    db = TestingSessionLocal()
+    busy = seed_user(db, 7)
+    quiet = seed_user(db, 1)
+    scanned = []
+    active, peak = 0, 0
+
+    async def fake_process(self, session, user, article, memories):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        scanned.append((user.id, article.title))
+        # Keep updated_at as is so the order stays meaningful
+        session.query(Article).filter(Article.id == article.id).update(
+            {
+                Article.last_scanned_at: datetime.utcnow(),
+                Article.updated_at: article.updated_at,
+            },
+            synchronize_session=False,
+        )
+        session.commit()
+
+    with (
+        patch.object(BackgroundScanner, "process_article", fake_process),
+        patch("src.workers.scan.settings.AI_SCAN_ARTICLES_PER_TICK", 3),
+    ):
+        assert background_scanner.enqueue_scans(db) == 2
+        assert background_scanner.enqueue_scans(db) == 0  # one active job per user
+
+        worker = ScanWorker(concurrency=2, session_factory=TestingSessionLocal)
+        assert asyncio.run(worker.run_once()) == 2
+        assert [t for u, t in scanned if u == busy.id] == ["a0", "a1", "a2"]
+        assert [t for u, t in scanned if u == quiet.id] == ["a0"]
+        assert peak == 2  # both users scanned at the same time
+
+        # The rest of the busy user's articles went to a follow-up job
+        asyncio.run(worker.run_until_empty())
+        assert [t for u, t in scanned if u == busy.id] == [f"a{i}" for i in range(7)]
+        done = db.query(ScanJob).filter(
+            ScanJob.user_id == busy.id, ScanJob.status == "done"
+        )
+        assert done.count() == 3
+    db.close()
+
+
+def test_failed_jobs_back_off_and_expired_leases_are_retaken():
+    db = TestingSessionLocal()
+    user = seed_user(db, 0)
+    scan_queue.enqueue(db, user.id)
+
+    job = scan_queue.lease(db, "worker-a")
+    assert job and job.attempts == 1
+    assert scan_queue.lease(db, "worker-b") is None
+
+    # Failure: pending again, but not before the backoff
+    assert scan_queue.fail(db, job.id, "worker-a", "boom")
+    assert scan_queue.lease(db, "worker-b") is None
+    db.query(ScanJob).filter(ScanJob.id == job.id).update(
+        {ScanJob.run_after: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    # worker-b takes it, then its lease expires and worker-c takes over
+    assert scan_queue.lease(db, "worker-b").attempts == 2
+    db.query(ScanJob).filter(ScanJob.id == job.id).update(
+        {ScanJob.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+    assert scan_queue.lease(db, "worker-c").id == job.id
+
+    # Only the lease holder can finish it, and only once
+    assert not scan_queue.complete(db, job.id, "worker-b")
+    assert scan_queue.complete(db, job.id, "worker-c")
+    assert not scan_queue.complete(db, job.id, "worker-c")
+    db.close()
+
+
+def test_shutdown_releases_the_job_but_a_lost_lease_does_not():
+    db = TestingSessionLocal()
+    user = seed_user(db, 0)
+    worker = ScanWorker(session_factory=TestingSessionLocal)
+
+    async def slow_scan(self, db, user_id, backlog):
+        await asyncio.sleep(10)
+
+    async def shutdown(job_id):
+        task = asyncio.create_task(worker.process(job_id, user.id, False))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    # Worker shutdown: the cancellation goes through and the job is pending again
+    scan_queue.enqueue(db, user.id)
+    job = scan_queue.lease(db, worker.worker_id)
+    with patch.object(ScanWorker, "_scan", slow_scan):
+        asyncio.run(shutdown(job.id))
+    db.refresh(job)
+    assert (job.status, job.locked_by, job.attempts) == ("pending", None, 0)
+
+    # Lease taken over by another worker: the job is left alone
+    job = scan_queue.lease(db, worker.worker_id)
+    taken_over = {ScanJob.locked_by: "worker-b"}
+    db.query(ScanJob).filter(ScanJob.id == job.id).update(taken_over)
+    db.commit()
+    with (
+        patch.object(ScanWorker, "_scan", slow_scan),
+        patch("src.workers.scan.settings.AI_SCAN_LEASE_SECONDS", 0.03),
+    ):
+        asyncio.run(asyncio.wait_for(worker.process(job.id, user.id, False), 1))
+    db.refresh(job)
+    assert (job.status, job.locked_by) == ("running", "worker-b")
+    db.close()
+
+
+def test_only_users_with_due_writes_are_queued():
+    db = TestingSessionLocal()
+    db.query(User).update({User.scan_dirty: False, User.next_scan_due_at: None})
+    db.commit()
+    idle = seed_user(db, 0)
+    writer = seed_user(db, 0)
+
+    article = article_service.create_article(
+        db, ArticleCreate(title="new", content={}), writer.id
+    )
+    assert writer.scan_dirty and writer.next_scan_due_at <= datetime.utcnow()
+    assert scan_schedule.due_users(db) == [writer.id]
+    assert background_scanner.enqueue_scans(db) == 1
+    db.refresh(writer)
+    assert not writer.scan_dirty and not scan_schedule.due_users(db)
+    assert db.query(ScanJob).filter(ScanJob.user_id == idle.id).count() == 0
+
+    # An edit to a just-scanned article is due once the scan interval has passed
+    scanned_at = datetime.utcnow()
+    db.query(Article).filter(Article.id == article.id).update(
+        {Article.last_scanned_at: scanned_at}
+    )
+    db.commit()
+    article_service.update_article(
+        db, article.id, ArticleUpdate(title="edited"), writer.id
+    )
+    assert not writer.scan_dirty  # title-only save
+    article_service.update_article(
+        db, article.id, ArticleUpdate(content=doc("Moved to Lisbon.")), writer.id
+    )
+    assert writer.next_scan_due_at == scanned_at + timedelta(minutes=1)
+    assert not scan_schedule.due_users(db)
+    later = scanned_at + timedelta(minutes=2)
+    assert scan_schedule.due_users(db, now=later) == [writer.id]
+
+    # After a scan, changes inside the interval re-mark the user
+    scan_schedule.clear(db, [writer.id])
+    db.refresh(writer)
+    scan_schedule.after_scan(db, writer)
+    interval_end = scanned_at + timedelta(minutes=1)
+    assert writer.scan_dirty and writer.next_scan_due_at == interval_end
+
+    # Disabling background scanning stops tracking
+    writer.settings = {"background_scan": {"enabled": False}}
+    scan_schedule.settings_changed(writer)
+    db.commit()
+    assert not writer.scan_dirty and writer.next_scan_due_at is None
+    db.close()
+
+
+def test_rescans_only_extract_changed_chunks():
+    db = TestingSessionLocal()
+    user = seed_user(db, 0)
+    paragraphs = [
+        f"Paragraph {i} talks about topic {i} in some detail, with a few more words."
+        for i in range(200)
+    ]
+
+    def content():
+        return {
+            "type": "doc",
+            "content": [
+                {"type": "paragraph", "content": [{"type": "text", "text": p}]}
+                for p in paragraphs
+            ],
+        }
+
+    article = Article(id=uuid.uuid4(), user_id=user.id, title="long", content=content())
+    db.add(article)
+    db.commit()
+    prompts = []
+
+    async def fake_complete(messages, priority):
+        prompts.append(messages[0]["content"])
+        return "[]"
+
+    with (
+        patch("src.services.ai.background_scanner.ai_client.complete", fake_complete),
+        patch(
+            "src.services.ai.background_scanner.extraction_cache",
+            ResponseCache("test_chunks", 100, 60),
+        ),
+        patch(
+            "src.services.ai.background_scanner.settings.AI_EXTRACTION_CHUNK_TOKENS",
+            200,
+        ),
+    ):
+        process_article(db, user, article)
+        first = len(prompts)
+        assert first > 1 and len(article.scan_chunk_hashes) == first
+        assert "Paragraph 199" in prompts[-1]  # nothing past a length limit is dropped
+
+        paragraphs[150] = "Paragraph 150 now says the user moved to Lisbon."
+        article.content = content()
+        db.commit()
+        prompts.clear()
+        process_article(db, user, article)
+        assert 1 <= len(prompts) <= 3 and any("Lisbon" in p for p in prompts)
+    db.close()
+
+
+def test_failed_chunks_are_retried_after_the_scan_interval():
+    db = TestingSessionLocal()
+    user = seed_user(db, 0)
+    paragraphs = [f"Paragraph {i} is about topic {i}, and more." for i in range(40)]
+    updated = datetime.utcnow() - timedelta(hours=1)
+    article = Article(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        title="long",
+        content=doc(*paragraphs),
+        content_fingerprint="f",
+        created_at=updated,
+        updated_at=updated,
+    )
+    db.add(article)
+    db.commit()
+    prompts = []
+    broken = True
+
+    async def fake_complete(messages, priority):
+        prompt = messages[0]["content"]
+        prompts.append(prompt)
+        if "Paragraph 39 " in prompt and broken:
+            return "not json"
+        create = {"action": "create", "key": f"k{len(prompts)}", "content": "A fact"}
+        return json.dumps([create])
+
+    cache = ResponseCache("test_retry", 100, 60)
+    scanner = "src.services.ai.background_scanner"
+    with (
+        patch(f"{scanner}.ai_client.complete", fake_complete),
+        patch(f"{scanner}.extraction_cache", cache),
+        patch(f"{scanner}.settings.AI_EXTRACTION_CHUNK_TOKENS", 200),
+    ):
+        asyncio.run(background_scanner.scan_user_articles(db, user))
+        first = len(prompts)
+        assert first > 1
+        assert len(article.scan_chunk_hashes) == first - 1
+        assert article.last_scanned_fingerprint is None
+
+        # Not again inside the interval, but the user is due when it ends
+        asyncio.run(background_scanner.scan_user_articles(db, user))
+        assert len(prompts) == first
+        scan_schedule.clear(db, [user.id])
+        db.refresh(user)
+        scan_schedule.after_scan(db, user)
+        interval = timedelta(minutes=1)
+        assert user.next_scan_due_at == article.last_scanned_at + interval
+
+        # The failed chunk's memories are newer than the article: still retried
+        article.last_scanned_at -= 2 * interval
+        db.commit()
+        broken = False
+        asyncio.run(background_scanner.scan_user_articles(db, user))
+        assert len(prompts) == first + 1 and "Paragraph 39 " in prompts[-1]
+        assert article.last_scanned_fingerprint == "f"
+    db.close()
+
+
+def test_first_chunk_error_cancels_the_other_extractions():
+    db = TestingSessionLocal()
+    user = seed_user(db, 0)
+    paragraphs = [f"Paragraph {i} is about topic {i}, and more." for i in range(40)]
+    article = Article(
+        id=uuid.uuid4(), user_id=user.id, title="long", content=doc(*paragraphs)
+    )
+    db.add(article)
+    db.commit()
+    cancelled = 0
+
+    async def fake_complete(messages, priority):
+        nonlocal cancelled
+        if "Paragraph 0 " in messages[0]["content"]:
+            raise RuntimeError("provider down")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return "[]"
+
+    cache = ResponseCache("test_cancel", 100, 60)
+    scanner = "src.services.ai.background_scanner"
+    with (
+        patch(f"{scanner}.ai_client.complete", fake_complete),
+        patch(f"{scanner}.extraction_cache", cache),
+        patch(f"{scanner}.settings.AI_EXTRACTION_CHUNK_TOKENS", 200),
+    ):
+        memories = UserMemories(db, user.id)
+        with pytest.raises(RuntimeError):
+            asyncio.run(background_scanner.process_article(db, user, article, memories))
+    assert cancelled > 0
+    assert article.last_scanned_at is None and article.scan_chunk_hashes is None
+    db.close()
+
+
+def test_unchanged_text_is_skipped_and_extractions_are_cached():
+    db = TestingSessionLocal()
+    db.query(User).update({User.scan_dirty: False, User.next_scan_due_at: None})
+    db.commit()
+    user = seed_user(db, 0)
+    created = ArticleCreate(title="t", content=doc("I adopted a cat named Miso."))
+    article = article_service.create_article(db, created, user.id)
+    calls = []
+
+    async def fake_complete(messages, priority):
+        calls.append(messages)
+        return '[{"action": "create", "key": "pet", "content": "Has a cat named Miso"}]'
+
+    with (
+        patch("src.services.ai.background_scanner.ai_client.complete", fake_complete),
+        patch(
+            "src.services.ai.background_scanner.extraction_cache",
+            ResponseCache("test_extraction", 100, 60),
+        ),
+    ):
+        assert not asyncio.run(background_scanner.scan_user_articles(db, user))
+        assert len(calls) == 1
+        assert article.last_scanned_fingerprint == article.content_fingerprint
+
+        # Whitespace-only edit: same fingerprint, the user isn't marked and the
+        # scanner skips it
+        scan_schedule.clear(db, [user.id])
+        db.query(Article).filter(Article.id == article.id).update(
+            {Article.last_scanned_at: datetime.utcnow() - timedelta(hours=1)}
+        )
+        db.commit()
+        respaced = ArticleUpdate(content=doc("I adopted a  cat named Miso. "))
+        article_service.update_article(db, article.id, respaced, user.id)
+        assert not user.scan_dirty
+        asyncio.run(background_scanner.scan_user_articles(db, user))
+        assert len(calls) == 1
+
+        # Forgotten chunk hashes (e.g. a reset): the same input is served from the cache
+        article.scan_chunk_hashes = None
+        process_article(db, user, article)
+        assert len(calls) == 2  # memory context changed after the first scan
+        article.scan_chunk_hashes = None
+        process_article(db, user, article)
+        assert len(calls) == 2
+    db.close()
+
+
+def test_extracted_changes_are_applied_in_one_batch_respecting_locks():
+    db = TestingSessionLocal()
+    user = seed_user(db, 0)
+    db.add_all(
+        [
+            Memory(
+                user_id=user.id,
+                key="pet",
+                value={"content": "Has a cat"},
+                confidence="high",
+            ),
+            Memory(
+                user_id=user.id,
+                key="city",
+                value={"content": "Lives in Paris"},
+                is_locked=True,
+            ),
+            Memory(user_id=user.id, key="job", value={"content": "Teacher"}),
+        ]
+    )
+    db.commit()
+    for i in range(2):
+        article = Article(
+            id=uuid.uuid4(),
+            user_id=user.id,
+            title=f"a{i}",
+            content=doc(f"Article {i} about my life."),
+            updated_at=datetime.utcnow() - timedelta(minutes=2 - i),
+        )
+        db.add(article)
+    db.commit()
+    responses = [
+        json.dumps(
+            [
+                {"action": "update", "key": "pet", "content": "Has a dog"},
+                {"action": "update", "key": "city", "content": "Lives in Rome"},
+                {"action": "delete", "key": "job"},
+                {"action": "create", "key": "hobby", "content": "Climbing"},
+            ]
+        ),
+        json.dumps(
+            [
+                {"action": "create", "key": "food", "content": "Likes ramen"},
+                {"action": "delete", "key": "hobby"},
+            ]
+        ),
+    ]
+    memory_queries = 0
+
+    async def fake_complete(messages, priority):
+        return responses.pop(0)
+
+    def count_memory_selects(conn, cursor, statement, *args):
+        nonlocal memory_queries
+        is_select = statement.lstrip().upper().startswith("SELECT")
+        if is_select and "FROM memories" in statement:
+            memory_queries += 1
+
+    from sqlalchemy import event
+
+    event.listen(engine, "before_cursor_execute", count_memory_selects)
+    try:
+        with (
+            patch(
+                "src.services.ai.background_scanner.ai_client.complete", fake_complete
+            ),
+            patch(
+                "src.services.ai.background_scanner.extraction_cache",
+                ResponseCache("test_batch", 100, 60),
+            ),
+        ):
+            version = db.query(User.memory_version).filter(User.id == user.id).scalar()
+            asyncio.run(background_scanner.scan_user_articles(db, user, backlog=True))
+    finally:
+        event.remove(engine, "before_cursor_execute", count_memory_selects)
+
+    memories = db.query(Memory).filter(Memory.user_id == user.id)
+    contents = {m.key: m.value["content"] for m in memories}
+    expected = {"pet": "Has a dog", "city": "Lives in Paris", "food": "Likes ramen"}
+    assert contents == expected
+    new_version = db.query(User.memory_version).filter(User.id == user.id).scalar()
+    assert new_version == version + 2  # once per article
+    # Freshness check + one load, no per-article or per-change lookups
+    assert memory_queries <= 2
+    db.close()
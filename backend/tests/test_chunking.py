@@ -0,0 +1,64 @@
+from src.services.ai.chunking import article_chunks, chunk_blocks, merge_changes
+from src.services.ai.prompt import estimate_tokens
+
+
+def doc(paragraphs):
+    return {
+        "type": "doc",
+        "content": [
+            {"type": "paragraph", "content": [{"type": "text", "text": p}]}
+            for p in paragraphs
+        ],
+    }
+
+
+PARAGRAPHS = [
+    f"Paragraph {i} talks about topic {i} in some detail, with a few more words."
+    for i in range(200)
+]
+
+
+def test_chunks_cover_every_block_within_the_target():
+    chunks = article_chunks(doc(PARAGRAPHS), 200)
+    assert len(chunks) > 1
+    assert "\n".join(c.text for c in chunks) == "\n".join(PARAGRAPHS)
+    assert all(estimate_tokens(c.text) <= 200 for c in chunks)
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+
+
+def test_an_edit_only_changes_nearby_chunks():
+    before = {c.hash for c in article_chunks(doc(PARAGRAPHS), 200)}
+    edited = list(PARAGRAPHS)
+    extra = " An extra sentence that makes this paragraph a lot longer than it was."
+    edited[5] += extra
+    after = article_chunks(doc(edited), 200)
+    changed = [c for c in after if c.hash not in before]
+    assert 1 <= len(changed) <= len(after) // 4
+    assert any("extra sentence" in c.text for c in changed)
+
+
+def test_oversized_block_is_split():
+    long_paragraph = " ".join(f"Sentence number {i} is here." for i in range(400))
+    chunks = chunk_blocks([long_paragraph], 100)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c.text) <= 100 for c in chunks)
+
+
+def test_merge_is_last_wins_in_document_order():
+    merged = merge_changes(
+        [
+            [
+                {"action": "create", "key": "pet", "content": "has a cat"},
+                {"action": "create", "key": "job", "content": "teacher"},
+            ],
+            [
+                {"action": "none", "key": "pet"},
+                "garbage",
+                {"action": "update", "key": "pet", "content": "has a dog"},
+            ],
+            [{"action": "delete", "key": "job"}],
+        ]
+    )
+    actions = [(c["key"], c["action"]) for c in merged]
+    assert actions == [("pet", "update"), ("job", "delete")]
+    assert merged[0]["content"] == "has a dog"
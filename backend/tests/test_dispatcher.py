@@ -0,0 +1,65 @@
+import asyncio
+
+from src.services.ai.dispatcher import LLMDispatcher, Priority
+
+
+def test_waiters_are_served_by_priority():
+    async def run():
+        dispatcher = LLMDispatcher(
+            max_concurrency=1, rate_limit_rpm=0, rate_limit_burst=1
+        )
+        order = []
+
+        async def call(priority, name):
+            async with dispatcher.slot(priority, "test"):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        holder = await dispatcher.acquire(Priority.INTERACTIVE, "test")
+        tasks = [
+            asyncio.create_task(call(Priority.ALMANAC, "almanac")),
+            asyncio.create_task(call(Priority.BACKGROUND, "background")),
+            asyncio.create_task(call(Priority.REPLY, "reply")),
+            asyncio.create_task(call(Priority.INTERACTIVE, "interactive")),
+        ]
+        await asyncio.sleep(0.01)
+        assert dispatcher.queue_depth() == 4
+        dispatcher.release(holder)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "reply", "background", "almanac"]
+
+
+def test_interactive_waiter_preempts_background_lease():
+    async def run():
+        dispatcher = LLMDispatcher(
+            max_concurrency=1, rate_limit_rpm=0, rate_limit_burst=1
+        )
+        background = await dispatcher.acquire(Priority.BACKGROUND, "test")
+        waiter = asyncio.create_task(dispatcher.acquire(Priority.INTERACTIVE, "test"))
+        await asyncio.sleep(0)
+        assert background.preempted
+        dispatcher.release(background)
+        lease = await waiter
+        dispatcher.release(lease)
+        return dispatcher
+
+    dispatcher = asyncio.run(run())
+    assert dispatcher.queue_depth() == 0
+
+
+def test_background_does_not_preempt_interactive():
+    async def run():
+        dispatcher = LLMDispatcher(
+            max_concurrency=1, rate_limit_rpm=0, rate_limit_burst=1
+        )
+        interactive = await dispatcher.acquire(Priority.INTERACTIVE, "test")
+        waiter = asyncio.create_task(dispatcher.acquire(Priority.BACKGROUND, "test"))
+        await asyncio.sleep(0)
+        preempted = interactive.preempted
+        waiter.cancel()
+        dispatcher.release(interactive)
+        return preempted
+
+    assert asyncio.run(run()) is False
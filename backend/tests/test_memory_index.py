@@ -0,0 +1,119 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.core.database import Base
+from src.models.memory import Memory
+from src.models.user import User
+from src.services.ai.memory_index import MemoryIndex, tokenize
+from src.services.ai.memory_worker import memory_service
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+
+def make_memory(user_id, key, content, confidence="medium", is_locked=False):
+    return Memory(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        key=key,
+        value={"content": content, "emoji": "📝"},
+        confidence=confidence,
+        is_locked=is_locked,
+        category="Knowledge",
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    )
+
+
+def seed_user(db, memories):
+    user = User(
+        id=uuid.uuid4(), email=f"{uuid.uuid4().hex}@example.com", password_hash="pw"
+    )
+    db.add(user)
+    db.commit()
+    for key, content, confidence, locked in memories:
+        db.add(make_memory(user.id, key, content, confidence, locked))
+    db.commit()
+    return user
+
+
+def test_tokenize_handles_latin_and_cjk():
+    assert tokenize("Likes_Cats a lot") == ["likes", "cats", "lot"]
+    assert tokenize("喜欢猫") == ["喜欢", "欢猫"]
+
+
+def test_select_returns_pinned_plus_relevant():
+    db = TestingSessionLocal()
+    filler = [
+        (f"fact_{i}", f"unrelated fact number {i} about gardening", "low", False)
+        for i in range(10)
+    ]
+    memories = [
+        ("likes_jazz", "User enjoys jazz music and saxophone", "medium", False),
+        ("name", "User is called Alex", "high", False),
+        ("style", "Prefers short sentences", "low", True),
+    ]
+    user = seed_user(db, filler + memories)
+    index = MemoryIndex()
+
+    selected = index.select(
+        db, user.id, "I listened to some jazz tonight", top_k=2, pinned_limit=2
+    )
+    keys = [m.key for m in selected]
+
+    assert set(keys[:2]) == {"name", "style"}
+    assert "likes_jazz" in keys
+    assert len(keys) <= 4
+    db.close()
+
+
+def test_upsert_and_remove_update_the_index():
+    db = TestingSessionLocal()
+    user = seed_user(
+        db, [(f"fact_{i}", f"gardening fact {i}", "low", False) for i in range(5)]
+    )
+    index = MemoryIndex()
+    index.select(db, user.id, "", top_k=1, pinned_limit=0)  # build
+
+    memory = make_memory(user.id, "chess", "User plays chess every weekend")
+    db.add(memory)
+    db.commit()
+    index.upsert(memory)
+    selected = index.select(db, user.id, "chess tournament", top_k=1, pinned_limit=0)
+    assert [m.key for m in selected] == ["chess"]
+
+    index.remove(user.id, memory.id)
+    assert index.select(db, user.id, "chess tournament", top_k=1, pinned_limit=0) == []
+    db.close()
+
+
+def test_memory_version_skips_db_until_bumped():
+    db = TestingSessionLocal()
+    user = seed_user(db, [("likes_jazz", "User enjoys jazz", "medium", False)])
+    index = MemoryIndex()
+
+    first = index.context(db, user, "jazz")
+    assert "likes_jazz" in first
+
+    # A write from another process: row changes and the version is bumped,
+    # the index isn't told
+    db.query(Memory).filter(Memory.user_id == user.id).update(
+        {Memory.value: {"content": "User enjoys blues"}}, synchronize_session=False
+    )
+    db.commit()
+    assert index.context(db, user, "jazz") == first  # same version: served from cache
+
+    memory_service.bump_version(db, user.id)
+    db.commit()
+    db.refresh(user)
+    assert "blues" in index.context(db, user, "jazz")
+    db.close()
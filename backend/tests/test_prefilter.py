@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import patch
+
+from src.services.ai.cache import ResponseCache
+from src.services.ai.dispatcher import Priority
+from src.services.ai.prefilter import AnalysisPrefilter, edit_size
+from src.services.ai.providers import Provider, ProviderPool
+
+
+def test_prefilter_skips_text_that_cannot_produce_a_comment():
+    prefilter = AnalysisPrefilter()
+    assert prefilter.check("?!") == "too_short"
+    assert prefilter.check("今天") == "too_short"
+    assert prefilter.check("hahahahahaha hahahaha hahaha") == "low_entropy"
+    assert prefilter.check("qwrtp sdfgh zxcvb lkjhg") == "gibberish"
+    quotes = ["This is a real sentence."]
+    reason = prefilter.check("This is a real sentence. Yes.", existing_quotes=quotes)
+    assert reason == "already_quoted"
+
+
+def test_prefilter_passes_real_text_in_any_script():
+    prefilter = AnalysisPrefilter()
+    assert prefilter.check("I went to the store and bought milk.") is None
+    assert prefilter.check("今天天气很好，我们去公园散步吧。") is None
+    assert prefilter.check("Это настоящее предложение о письме.") is None
+
+
+def test_prefilter_skips_tiny_edits_since_last_analysis():
+    prefilter = AnalysisPrefilter()
+    original = "The story begins on a cold morning in the village."
+    assert prefilter.check(original, key="article") is None
+    prefilter.record("article", original)
+
+    assert prefilter.check(original.replace(".", "!"), key="article") == "tiny_edit"
+    longer = original.replace("village", "old village by the sea")
+    assert prefilter.check(longer, key="article") is None
+    # Other articles aren't compared
+    assert prefilter.check(original, key="other") is None
+
+
+def test_edit_size_measures_one_contiguous_edit():
+    assert edit_size("abcdef", "abcXdef") == 1
+    assert edit_size("abcdef", "abf") == 3
+    assert edit_size("same", "same") == 0
+
+
+def test_samples_run_in_background_without_touching_the_cache():
+    provider = Provider("primary", "http://primary.local/v1", "key", "model-a")
+
+    class RecordingClient:
+        pool = ProviderPool([provider])
+        priorities = []
+
+        async def stream_chat_completion(self, messages, priority, served=None):
+            self.priorities.append(priority)
+            served["provider"] = provider
+            yield ">> QUOTE: NONE\n>> COMMENT: Worth a comment after all."
+
+    client = RecordingClient()
+    cache = ResponseCache("test_prefilter_sample", max_entries=10, ttl_seconds=60)
+    with (
+        patch("src.services.ai.analysis.ai_client", client),
+        patch("src.services.ai.analysis.analysis_cache", cache),
+    ):
+        asyncio.run(AnalysisPrefilter()._sample("gibberish", "qwrtp sdfgh", ""))
+
+    assert client.priorities == [Priority.BACKGROUND]
+    assert len(cache._entries) == 0
@@ -0,0 +1,75 @@
+from src.services.ai.prompt import PromptBuilder, estimate_tokens, truncate_paragraphs
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("今天天气很好") == 6
+
+
+def test_truncate_keeps_whole_paragraphs():
+    text = (
+        "First paragraph is here.\n"
+        "Second paragraph is a bit longer than the first.\n"
+        "Third."
+    )
+    truncated = truncate_paragraphs(
+        text, estimate_tokens("First paragraph is here.") + 2
+    )
+    assert truncated == "First paragraph is here."
+
+
+def test_truncate_long_paragraph_by_sentence():
+    text = "One sentence. Another sentence that is longer. A third."
+    assert truncate_paragraphs(text, 5) == "One sentence."
+
+
+def test_truncate_unpunctuated_text_by_characters():
+    text = "没有标点的很长一段中文" * 20
+    assert truncate_paragraphs(text, 10) == text[:10]
+    words = "word " * 100
+    truncated = truncate_paragraphs(words, 5)
+    assert truncated and estimate_tokens(truncated) <= 5
+
+
+def test_truncate_from_end_keeps_latest_writing():
+    text = "Old opening paragraph.\nMiddle part of the text.\nWhat I am typing now."
+    budget = estimate_tokens("What I am typing now.") + 2
+    assert truncate_paragraphs(text, budget, from_end=True) == "What I am typing now."
+    sentences = "An early sentence. A later one. The last."
+    assert truncate_paragraphs(sentences, 4, from_end=True) == "The last."
+    unpunctuated = "没有标点的很长一段中文" * 20
+    assert truncate_paragraphs(unpunctuated, 10, from_end=True) == unpunctuated[-10:]
+
+
+def test_builder_fills_budget_by_priority():
+    parts, total = (
+        PromptBuilder("test", budget=40)
+        .add("instructions", "x" * 80, required=True)  # 20 tokens
+        .add("text", "y" * 40)  # 10 tokens
+        .add(
+            "memories",
+            "\n".join(["- m1: aaaa", "- m2: bbbb", "- m3: cccc", "- m4: dddd"]),
+            truncate="lines",
+        )
+        .add("history", ["old turn " * 5, "new turn"], truncate="oldest")
+        .build()
+    )
+    assert parts["text"] == "y" * 40
+    assert parts["memories"].startswith("- m1")
+    assert parts["memories"].count("\n") < 3
+    assert parts["history"] == []
+    assert total <= 40
+
+
+def test_builder_tail_keeps_end_of_long_text():
+    text = "\n".join(f"Paragraph {i} of a long article." for i in range(200))
+    parts, total = (
+        PromptBuilder("test", budget=50)
+        .add("instructions", "x" * 80, required=True)
+        .add("text", text, truncate="tail")
+        .build()
+    )
+    assert parts["text"].endswith("Paragraph 199 of a long article.")
+    assert "Paragraph 0 " not in parts["text"]
+    assert total <= 50
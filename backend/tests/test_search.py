@@ -0,0 +1,123 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.api.articles import get_current_user
+from src.core.database import Base, get_db
+from src.main import app
+from src.models.user import User
+from src.schemas.article import ArticleCreate, ArticleUpdate
+from src.services.article import article_service
+from src.services.search import article_search, tsquery_term
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+article_search.ensure_schema(engine)
+
+
+def doc(text):
+    paragraph = {"type": "paragraph", "content": [{"type": "text", "text": text}]}
+    return {"type": "doc", "content": [paragraph]}
+
+
+def make_user(db):
+    email = f"{uuid.uuid4().hex}@example.com"
+    user = User(id=uuid.uuid4(), email=email, password_hash="pw", settings={})
+    db.add(user)
+    db.commit()
+    return user
+
+
+def create(db, user, title, text):
+    return article_service.create_article(
+        db, ArticleCreate(title=title, content=doc(text)), user.id
+    )
+
+
+def found(db, user, query):
+    return [r["id"] for r in article_search.search(db, user.id, query)]
+
+
+def test_ranked_substring_search_with_escaped_snippets():
+    db = TestingSessionLocal()
+    user, other = make_user(db), make_user(db)
+    body = create(db, user, "Trip <plans>", "We travel to Lisbon & Porto in spring.")
+    titled = create(db, user, "Lisbon", "Restaurants to try.")
+    create(db, other, "Lisbon", "Someone else's note")
+
+    results = article_search.search(db, user.id, "lisb")
+    # Title matches rank first
+    assert [r["id"] for r in results] == [titled.id, body.id]
+    snippet = "We travel to <mark>Lisb</mark>on &amp; Porto in spring."
+    assert results[1]["snippet"] == snippet
+    assert found(db, user, "lisbon porto") == [body.id]
+    # Operators are plain words
+    assert found(db, user, 'lisbon" OR title:*') == []
+    assert found(db, user, "  ") == []
+
+    # Index follows writes
+    update = ArticleUpdate(content=doc("Plans changed: Madrid instead."))
+    article_service.update_article(db, body.id, update, user.id)
+    assert found(db, user, "lisbon") == [titled.id]
+    assert found(db, user, "madr") == [body.id]
+    article_service.delete_article(db, titled.id, user.id)
+    assert found(db, user, "lisbon") == []
+    db.close()
+
+
+def test_chinese_terms_match_inside_unspaced_text():
+    db = TestingSessionLocal()
+    user = make_user(db)
+    walk = create(db, user, "周末", "今天我们去公园散步")
+    rules = create(db, user, "公园管理条例", "No walking here.")
+
+    assert found(db, user, "散步") == [walk.id]
+    assert found(db, user, "公园散步") == [walk.id]
+    assert len(found(db, user, "公园")) == 2
+    assert found(db, user, "管理条例") == [rules.id]
+    assert found(db, user, "散步 walking") == []
+    db.close()
+
+    # Postgres query side: same bigrams as cjk_bigrams() indexes
+    assert tsquery_term("公园散步") == "公园 <-> 园散 <-> 散步"
+    assert tsquery_term("园") == "园:*"
+    assert tsquery_term("go公园") == "go:* <-> 公园"
+
+
+def test_search_endpoint():
+    db = TestingSessionLocal()
+    user = make_user(db)
+    create(db, user, "Garden", "Planted tomatoes today.")
+    db.refresh(user)
+    db.expunge(user)
+    db.close()
+
+    def override_get_db():
+        session = TestingSessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        client = TestClient(app)
+        response = client.get("/api/v1/articles/search", params={"q": "tomato"})
+        assert response.status_code == 200
+        assert [r["title"] for r in response.json()] == ["Garden"]
+        assert "<mark>tomato</mark>es" in response.json()[0]["snippet"]
+        response = client.get("/api/v1/articles/search", params={"q": ""})
+        assert response.status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(previous)
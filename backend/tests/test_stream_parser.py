@@ -0,0 +1,198 @@
+import json
+import uuid
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.api.articles import get_current_user
+from src.core.database import Base, get_db
+from src.main import app
+from src.models.article import Article
+from src.models.comment import Comment
+from src.models.user import User
+from src.services.ai.stream_parser import CommentStreamParser, locate_quote
+
+
+def parse_in_chunks(text: str, size: int):
+    parser = CommentStreamParser()
+    events = []
+    for i in range(0, len(text), size):
+        events += parser.feed(text[i : i + size])
+    return parser, events + parser.close()
+
+
+def test_parser_streams_multiple_comments():
+    text = (
+        ">> QUOTE: the cat sat\n>> COMMENT: Nice image.\nMaybe more detail.\n"
+        ">> QUOTE: NONE\n>> COMMENT: Overall good"
+    )
+    for size in (1, 5, len(text)):
+        parser, events = parse_in_chunks(text, size)
+        assert [c.as_dict() for c in parser.comments] == [
+            {
+                "index": 0,
+                "quote": "the cat sat",
+                "content": "Nice image.\nMaybe more detail.",
+            },
+            {"index": 1, "quote": None, "content": "Overall good"},
+        ]
+        # Deltas reassemble the comment and never leak marker lines
+        deltas = "".join(
+            d["delta"]
+            for name, d in events
+            if name == "comment_delta" and d["index"] == 0
+        )
+        assert deltas.strip() == "Nice image.\nMaybe more detail."
+        names = [name for name, _ in events if name != "comment_delta"]
+        assert names == ["quote", "comment", "quote", "comment"]
+
+
+def test_parser_streams_single_line_comment_before_close():
+    parser = CommentStreamParser()
+    events = []
+    for chunk in [">> QUOTE: x\n>> COMM", "ENT: This", " is a", " short note"]:
+        events += parser.feed(chunk)
+    deltas = [d["delta"] for name, d in events if name == "comment_delta"]
+    assert deltas == ["This", " is a", " short note"]
+    events = parser.close()
+    assert [name for name, _ in events] == ["comment"]
+    assert parser.comments[0].content == "This is a short note"
+
+
+def test_parser_no_comment():
+    parser, events = parse_in_chunks(">> NO_COMMENT", 3)
+    assert parser.no_comment and events == [("no_comment", {})]
+
+
+def test_locate_quote_skips_taken_ranges_and_reflowed_whitespace():
+    text = "one two three. one two three."
+    assert locate_quote(text, "one two") == (0, 7)
+    assert locate_quote(text, "one two", [(0, 7)]) == (15, 22)
+    assert locate_quote("a  line\nbreak here", "line break") == (3, 13)
+    assert locate_quote(text, "missing") is None
+
+
+def test_review_stream_creates_comments_in_one_pass():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    user = User(
+        id=uuid.uuid4(), email="review@example.com", password_hash="pw", is_active=True
+    )
+    article = Article(id=uuid.uuid4(), title="T", content={}, user_id=user.id)
+    db.add_all([user, article])
+    db.commit()
+
+    async def fake_review(*args, **kwargs):
+        for chunk in [
+            ">> QUOTE: first sentence\n>> COM",
+            "MENT: Good start.\n",
+            ">> QUOTE: first sentence\n>> COMMENT: Duplicate\n",
+            ">> QUOTE: not in text\n>> COMMENT: Dropped\n",
+            ">> QUOTE: second one\n>> COMMENT: Tighten this.",
+        ]:
+            yield chunk
+
+    def override_get_db():
+        yield db
+
+    previous_get_db = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        with patch("src.api.ai.analysis_service.review_document", fake_review):
+            response = TestClient(app).post(
+                "/api/v1/ai/review/stream",
+                json={
+                    "article_id": str(article.id),
+                    "text": "This is the first sentence. And the second one.",
+                    "max_comments": 5,
+                },
+            )
+        frames = [frame.split("\n") for frame in response.text.strip().split("\n\n")]
+        events = [
+            (name.removeprefix("event: "), json.loads(data.removeprefix("data: ")))
+            for name, data in frames
+        ]
+
+        assert [name for name, _ in events] == ["comment", "comment", "done"]
+        assert events[0][1]["offset"] == {"start": 12, "end": 26}
+        contents = [c["content"] for c in events[-1][1]["comments"]]
+        assert contents == ["Good start.", "Tighten this."]
+        assert db.query(Comment).filter(Comment.article_id == article.id).count() == 2
+    finally:
+        del app.dependency_overrides[get_current_user]
+        if previous_get_db:
+            app.dependency_overrides[get_db] = previous_get_db
+        else:
+            del app.dependency_overrides[get_db]
+        db.close()
+
+
+def test_analysis_events_parse_and_persist():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    user = User(
+        id=uuid.uuid4(), email="events@example.com", password_hash="pw", is_active=True
+    )
+    article = Article(id=uuid.uuid4(), title="T", content={}, user_id=user.id)
+    db.add_all([user, article])
+    db.commit()
+
+    async def fake_analysis(*args, **kwargs):
+        for chunk in [">> QUO", "TE: second one\n>> COMMENT: Tig", "hten this."]:
+            yield chunk
+
+    def override_get_db():
+        yield db
+
+    previous_get_db = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        with patch("src.api.ai.analysis_service.analyze_text", fake_analysis):
+            response = TestClient(app).post(
+                "/api/v1/ai/analyze/events",
+                json={
+                    "article_id": str(article.id),
+                    "text": "This is the first sentence. And the second one.",
+                    "persist": True,
+                },
+            )
+        frames = [frame.split("\n") for frame in response.text.strip().split("\n\n")]
+        events = [
+            (name.removeprefix("event: "), json.loads(data.removeprefix("data: ")))
+            for name, data in frames
+        ]
+
+        assert events[0] == (
+            "quote",
+            {"quote": "second one", "offset": {"start": 36, "end": 46}},
+        )
+        deltas = [data["delta"] for name, data in events if name == "comment_delta"]
+        assert "".join(deltas) == "Tighten this."
+        name, done = events[-1]
+        assert name == "done" and done["content"] == "Tighten this."
+        assert done["comment"]["quote"] == "second one"
+        assert db.query(Comment).filter(Comment.article_id == article.id).count() == 1
+    finally:
+        del app.dependency_overrides[get_current_user]
+        if previous_get_db:
+            app.dependency_overrides[get_db] = previous_get_db
+        else:
+            del app.dependency_overrides[get_db]
+        db.close()
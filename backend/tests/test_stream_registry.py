@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from src.core.metrics import metrics
+from src.services.ai.stream_registry import StreamRegistry
+
+
+def test_superseded_stream_is_closed_upstream():
+    async def run():
+        registry = StreamRegistry("test_supersede")
+        state = {"closed": False, "chunks": 0}
+
+        async def slow_upstream():
+            try:
+                for i in range(100):
+                    await asyncio.sleep(0.01)
+                    state["chunks"] += 1
+                    yield f"chunk{i} "
+            finally:
+                state["closed"] = True
+
+        first = registry.start(("user", "article"))
+        received = []
+
+        async def consume():
+            async for chunk in registry.guard(
+                first, slow_upstream(), on_superseded=">> NO_COMMENT"
+            ):
+                received.append(chunk)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        second = registry.start(("user", "article"))
+        await asyncio.wait_for(task, 1)
+
+        assert state["closed"]
+        assert state["chunks"] < 100
+        assert received[-1] == ">> NO_COMMENT"
+        assert first.reason == "superseded"
+        assert not second.cancelled.is_set()
+        counters = metrics.snapshot()["counters"]
+        assert counters["streams.test_supersede.cancelled.superseded"] == 1
+
+    asyncio.run(run())
+
+
+def test_completed_stream_is_not_counted_as_cancelled():
+    async def run():
+        registry = StreamRegistry("test_complete")
+
+        async def upstream():
+            yield "a"
+            yield "b"
+
+        handle = registry.start(("user", "article"))
+        chunks = [c async for c in registry.guard(handle, upstream())]
+        assert chunks == ["a", "b"]
+        counters = metrics.snapshot()["counters"]
+        assert "streams.test_complete.cancelled.superseded" not in counters
+        # Finished streams leave the registry
+        assert registry._active == {}
+
+    asyncio.run(run())
+
+
+def test_errors_and_outside_cancellation_are_not_counted_as_cancelled():
+    async def run():
+        registry = StreamRegistry("test_errors")
+
+        async def failing_upstream():
+            yield "a"
+            raise RuntimeError("provider failed")
+
+        handle = registry.start(("user", "article"))
+        received = []
+        with pytest.raises(RuntimeError):
+            async for chunk in registry.guard(handle, failing_upstream()):
+                received.append(chunk)
+        assert received == ["a"]
+
+        async def endless_upstream():
+            while True:
+                await asyncio.sleep(0.01)
+                yield "x"
+
+        async def consume():
+            handle = registry.start(("user", "other"))
+            async for _ in registry.guard(handle, endless_upstream()):
+                pass
+
+        # e.g. worker shutdown: the cancellation propagates instead of being swallowed
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        counters = metrics.snapshot()["counters"]
+        assert counters["streams.test_errors.errors"] == 1
+        assert counters["streams.test_errors.interrupted"] == 1
+        assert not any(k.startswith("streams.test_errors.cancelled") for k in counters)
+        assert registry._active == {}
+
+    asyncio.run(run())
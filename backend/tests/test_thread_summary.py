@@ -0,0 +1,75 @@
+import asyncio
+import uuid
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.core.database import Base
+from src.models.comment import Comment
+from src.services.ai.thread_summary import ThreadSummarizer
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+SETTINGS = "src.services.ai.thread_summary.settings"
+
+
+def make_thread(turns: int) -> list:
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "ai",
+            "content": f"message {i} " + "word " * 50,
+            "timestamp": "",
+        }
+        for i in range(turns)
+    ]
+
+
+def test_short_threads_are_not_compacted():
+    summarizer = ThreadSummarizer(TestingSessionLocal)
+    with patch(f"{SETTINGS}.AI_THREAD_KEEP_TURNS", 6):
+        assert not summarizer.needs_compaction(make_thread(6), 0)
+        with patch(f"{SETTINGS}.AI_THREAD_SUMMARY_THRESHOLD", 100):
+            assert summarizer.needs_compaction(make_thread(12), 0)
+            assert not summarizer.needs_compaction(make_thread(12), 6)
+
+
+def test_summarize_folds_older_turns():
+    db = TestingSessionLocal()
+    comment = Comment(
+        id=uuid.uuid4(),
+        article_id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        content="Sug",
+        quote="Q",
+        reply=make_thread(10),
+    )
+    db.add(comment)
+    db.commit()
+
+    prompts = []
+
+    async def fake_complete(messages, priority, **options):
+        prompts.append(messages[-1]["content"])
+        return "- The writer wants shorter sentences"
+
+    summarizer = ThreadSummarizer(TestingSessionLocal)
+    with (
+        patch("src.services.ai.thread_summary.ai_client.complete", fake_complete),
+        patch(f"{SETTINGS}.AI_THREAD_KEEP_TURNS", 4),
+        patch(f"{SETTINGS}.AI_THREAD_SUMMARY_THRESHOLD", 1000),
+    ):
+        asyncio.run(summarizer.summarize(comment.id))
+
+    db.refresh(comment)
+    assert comment.reply_summary == "- The writer wants shorter sentences"
+    assert comment.reply_summary_upto == 6
+    assert "message 5" in prompts[0] and "message 6" not in prompts[0]
+    db.close()
@@ -0,0 +1,99 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.core.database import Base
+from src.models.article import Article
+from src.models.user import User
+from src.services import tiptap
+from src.tools.backfill_content_text import backfill
+
+
+def paragraph(*inline):
+    return {"type": "paragraph", "content": list(inline)}
+
+
+def text(value, marks=None):
+    node = {"type": "text", "text": value}
+    if marks:
+        node["marks"] = [{"type": mark} for mark in marks]
+    return node
+
+
+def test_inline_nodes_join_and_blocks_break():
+    content = {
+        "type": "doc",
+        "content": [
+            {"type": "heading", "attrs": {"level": 1}, "content": [text("Title")]},
+            paragraph(
+                text("Hello "),
+                text("bold", ["bold"]),
+                text(" world"),
+                {"type": "hardBreak"},
+                text("next line"),
+            ),
+            {"type": "paragraph"},
+            {
+                "type": "bulletList",
+                "content": [
+                    {"type": "listItem", "content": [paragraph(text("one"))]},
+                    {"type": "listItem", "content": [paragraph(text("two"))]},
+                ],
+            },
+        ],
+    }
+    blocks = ["Title", "Hello bold world\nnext line", "one\ntwo"]
+    assert tiptap.block_texts(content) == blocks
+    assert tiptap.to_text(content) == "Title\nHello bold world\nnext line\none\ntwo"
+
+
+def test_deeply_nested_content_does_not_recurse():
+    node = paragraph(text("deep"))
+    for _ in range(5000):
+        node = {"type": "blockquote", "content": [node]}
+    assert tiptap.to_text({"type": "doc", "content": [node]}) == "deep"
+
+
+def test_counts_and_fingerprint():
+    assert tiptap.word_count("Hello, world! It's 2024.") == 5
+    assert tiptap.word_count("今天天气很好 ok") == 7
+    assert tiptap.char_count("a b\nc") == 3
+    assert tiptap.text_fingerprint("a  b\n") == tiptap.text_fingerprint("a b")
+    assert tiptap.to_text(None) == "" and tiptap.to_text({"type": "doc"}) == ""
+
+
+def test_backfill_fills_text_without_touching_updated_at():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    user = User(id=uuid.uuid4(), email="backfill@example.com", password_hash="pw")
+    updated = datetime.utcnow() - timedelta(days=3)
+    db.add(user)
+    for i in range(5):
+        content = {"type": "doc", "content": [paragraph(text(f"Note number {i}"))]}
+        article = Article(
+            id=uuid.uuid4(),
+            user_id=user.id,
+            title=f"a{i}",
+            updated_at=updated,
+            content=content,
+        )
+        db.add(article)
+    db.commit()
+
+    assert backfill(Session, batch_size=2) == 5
+    assert backfill(Session, batch_size=2) == 0
+    db.expire_all()
+    for article in db.query(Article):
+        assert article.content_text.startswith("Note number")
+        assert article.word_count == 3
+        assert article.content_fingerprint and article.updated_at == updated
+    db.close()
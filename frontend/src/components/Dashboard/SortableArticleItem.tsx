@@ -102,7 +102,15 @@ export const ArticleItem = forwardRef<HTMLLIElement, ArticleItemProps>(
                     )}
                 </div>
                 
+                {a.snippet ? (
+                    // Search snippet: HTML-escaped by the server, only <mark> tags added
+                    <p className="mt-1 pl-8 text-xs text-gray-500 line-clamp-2" dangerouslySetInnerHTML={{ __html: a.snippet }} />
+                ) : a.excerpt ? (
+                    <p className="mt-1 pl-8 text-xs text-gray-500 line-clamp-2">{a.excerpt}</p>
+                ) : null}
+                
                 <div className="mt-2 space-y-0.5 pl-8">
+                    {a.created_at && (
                     <div className="flex items-center text-[10px] text-gray-500">
                         <span className="text-gray-400 w-11 flex-shrink-0">Created</span>
                         <span className="truncate">
@@ -114,6 +122,7 @@ export const ArticleItem = forwardRef<HTMLLIElement, ArticleItemProps>(
                             })}
                         </span>
                     </div>
+                    )}
                     <div className="flex items-center text-[10px] text-gray-500">
                         <span className="text-gray-400 w-11 flex-shrink-0">Updated</span>
                         <span className="truncate font-medium text-gray-600">
@@ -131,9 +140,11 @@ export const ArticleItem = forwardRef<HTMLLIElement, ArticleItemProps>(
     }
 );
 
-interface SortableArticleItemProps extends Omit<ArticleItemProps, 'dragAttributes' | 'dragListeners' | 'isDragging' | 'isOverlay'> {}
+interface SortableArticleItemProps extends Omit<ArticleItemProps, 'dragAttributes' | 'dragListeners' | 'isDragging' | 'isOverlay'> {
+    dragDisabled?: boolean;
+}
 
-export function SortableArticleItem(props: SortableArticleItemProps) {
+export function SortableArticleItem({ dragDisabled, ...props }: SortableArticleItemProps) {
   const {
     attributes,
     listeners,
@@ -141,7 +152,7 @@ export function SortableArticleItem(props: SortableArticleItemProps) {
     transform,
     transition,
     isDragging
-  } = useSortable({ id: props.article.id });
+  } = useSortable({ id: props.article.id, disabled: dragDisabled });
 
   const style = {
     transform: CSS.Translate.toString(transform),
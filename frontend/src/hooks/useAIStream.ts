@@ -1,11 +1,44 @@
 import { useState, useCallback } from 'react'
 import { useAuth } from '../context/AuthContext'
 
+// Reads a Server-Sent Events body, calling onEvent for every `event:` / `data:` (JSON) frame
+const readEvents = async (response: Response, onEvent: (event: string, payload: any) => void) => {
+  if (!response.body) return
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    // Frames are separated by a blank line
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf('\n\n')
+
+      const event = frame.match(/^event: (.*)$/m)?.[1]
+      const data = frame.match(/^data: (.*)$/m)?.[1]
+      if (event && data) onEvent(event, JSON.parse(data))
+    }
+  }
+}
+
+export interface AnalysisHandlers {
+  onQuote?: (quote: string | null) => void
+  onDelta: (delta: string) => void
+  // null when there is nothing to show (no comment, superseded or failed)
+  onDone: (result: { quote: string | null, content: string, comment: any } | null) => void
+}
+
 export const useAIStream = () => {
   const { token } = useAuth()
   const [streaming, setStreaming] = useState(false)
 
-  const analyzeText = useCallback(async (text: string, context: string, existingQuotes: string[] = [], onChunk: (chunk: string) => void, onComplete?: (fullText: string) => void) => {
+  const analyzeText = useCallback(async (text: string, context: string, existingQuotes: string[] = [], onChunk: (chunk: string) => void, onComplete?: (fullText: string) => void, articleId?: string) => {
     if (!token) return
 
     setStreaming(true)
@@ -17,7 +50,13 @@ export const useAIStream = () => {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`
         },
-        body: JSON.stringify({ text, context, existing_quotes: existingQuotes })
+        // With an article id the server only sends paragraphs changed since the last analysis
+        body: JSON.stringify({
+          text,
+          context,
+          existing_quotes: existingQuotes,
+          ...(articleId ? { article_id: articleId, mode: 'incremental' } : {})
+        })
       })
 
       if (!response.ok) {
@@ -54,5 +93,80 @@ export const useAIStream = () => {
     }
   }, [token])
 
-  return { analyzeText, streaming }
+  // Streams an AI reply to a comment thread (SSE events: saved, token, done, error)
+  const streamReply = useCallback(async (commentId: string, content: string, onToken: (chunk: string) => void): Promise<any> => {
+    if (!token) return null
+
+    const response = await fetch(`http://localhost:8000/api/v1/comments/${commentId}/reply/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${token}`
+      },
+      body: JSON.stringify({ content })
+    })
+
+    if (!response.ok || !response.body) {
+      throw new Error(await response.text())
+    }
+
+    let result: any = null
+    let error: string | null = null
+    await readEvents(response, (event, payload) => {
+      if (event === 'token') {
+        onToken(payload.content)
+      } else if (event === 'done') {
+        result = payload
+      } else if (event === 'error') {
+        error = payload.error
+      }
+    })
+    if (error) throw new Error(error)
+    return result
+  }, [token])
+
+  // Analysis parsed on the server into typed events; with an article id the comment is saved server-side
+  const analyzeEvents = useCallback(async (text: string, context: string, existingQuotes: string[], articleId: string | undefined, handlers: AnalysisHandlers) => {
+    if (!token) return
+
+    setStreaming(true)
+    let result: any = null
+    try {
+      const response = await fetch('http://localhost:8000/api/v1/ai/analyze/events', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({
+          text,
+          context,
+          existing_quotes: existingQuotes,
+          ...(articleId ? { article_id: articleId, mode: 'incremental', persist: true } : {})
+        })
+      })
+
+      if (!response.ok) {
+        console.error('AI Stream Error:', await response.text())
+        return
+      }
+
+      await readEvents(response, (event, payload) => {
+        if (event === 'quote') {
+          handlers.onQuote?.(payload.quote)
+        } else if (event === 'comment_delta') {
+          handlers.onDelta(payload.delta)
+        } else if (event === 'done' && payload.content) {
+          result = payload
+        }
+      })
+    } catch (err) {
+      console.error(err)
+    } finally {
+      setStreaming(false)
+      handlers.onDone(result)
+    }
+  }, [token])
+
+  return { analyzeText, analyzeEvents, streamReply, streaming }
 }
@@ -22,8 +22,9 @@ interface DashboardProps {
 const Dashboard = ({ onNavigate }: DashboardProps) => {
   const { logout } = useAuth()
   const { showToast } = useToast()
-  const { analyzeText } = useAIStream()
+  const { analyzeEvents, streamReply } = useAIStream()
   const [articles, setArticles] = useState<any[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [currentArticle, setCurrentArticle] = useState<any>(null)
   const [deleteArticleId, setDeleteArticleId] = useState<string | null>(null)
   const [articleComments, setArticleComments] = useState<Record<string, { open: any[], resolved: any[] }>>({})
@@ -91,19 +92,21 @@ const Dashboard = ({ onNavigate }: DashboardProps) => {
   const handleDragEnd = (event: DragEndEvent) => {
     const { active, over } = event;
 
-    if (active.id !== over?.id) {
-      setArticles((items) => {
-        const oldIndex = items.findIndex((item) => item.id === active.id);
-        const newIndex = items.findIndex((item) => item.id === over?.id);
-        
-        const newItems = arrayMove(items, oldIndex, newIndex);
-        
-        // Persist to backend
-        const articleIds = newItems.map(a => a.id);
-        api.put('/articles/reorder', articleIds).catch(err => console.error('Failed to reorder', err));
-        
-        return newItems;
-      });
+    if (over && active.id !== over.id) {
+      const oldIndex = articles.findIndex((item) => item.id === active.id);
+      const newIndex = articles.findIndex((item) => item.id === over.id);
+      const newItems = arrayMove(articles, oldIndex, newIndex);
+      setArticles(newItems);
+
+      // Persist as a single move relative to the article above it: the sidebar may only
+      // hold the first pages, the server applies the move to the full order
+      const afterId = newIndex > 0 ? newItems[newIndex - 1].id : null
+      api.put(`/articles/${active.id}/move`, { after_id: afterId })
+        .then(() => {
+          // Positions were renumbered, so the paging cursor is stale: reload what is shown
+          if (nextCursor) fetchArticles(Math.min(newItems.length, 200))
+        })
+        .catch(err => console.error('Failed to reorder', err));
     }
     setActiveDragId(null);
   };
@@ -181,18 +184,51 @@ const Dashboard = ({ onNavigate }: DashboardProps) => {
       }
   }
 
-  const fetchArticles = async () => {
+  // Search results aren't in sidebar order, so they can't be reordered
+  const isSearching = searchQuery.trim() !== ''
+
+  // The sidebar only loads summaries (no content); the full article is fetched on select
+  const fetchArticles = async (limit?: number) => {
     try {
-      const params = searchQuery ? { search: searchQuery } : {}
-      const res = await api.get('/articles/', { params })
-      setArticles(res.data)
-      return res.data
+      const query = searchQuery.trim()
+      if (query) {
+        const res = await api.get('/articles/search', { params: { q: query, limit: 50 } })
+        setArticles(res.data)
+        setNextCursor(null)
+        return res.data
+      }
+      const res = await api.get('/articles/summary', { params: limit ? { limit } : {} })
+      setArticles(res.data.items)
+      setNextCursor(res.data.next_cursor)
+      return res.data.items
     } catch (err) {
       console.error(err)
       return []
     }
   }
 
+  const loadMoreArticles = async () => {
+    if (!nextCursor) return
+    try {
+      const res = await api.get('/articles/summary', { params: { cursor: nextCursor } })
+      setArticles(prev => [...prev, ...res.data.items])
+      setNextCursor(res.data.next_cursor)
+    } catch (err) {
+      console.error(err)
+    }
+  }
+
+  const selectArticle = async (article: any) => {
+    if (currentArticle?.id === article.id) return
+    try {
+      const res = await api.get(`/articles/${article.id}`)
+      setCurrentArticle(res.data)
+    } catch (err) {
+      console.error(err)
+      showToast('Failed to load article', 'error')
+    }
+  }
+
   const fetchComments = async (articleId: string) => {
       try {
           const res = await api.get(`/comments/article/${articleId}`)
@@ -246,8 +282,8 @@ const Dashboard = ({ onNavigate }: DashboardProps) => {
       try {
           const res = await api.put(`/articles/${articleId}`, { title: articleTitle, content })
           
-          // Update articles list to reflect changes
-          setArticles(prev => prev.map(a => a.id === articleId ? res.data : a))
+          // Update articles list to reflect changes (list items are summaries, keep them light)
+          setArticles(prev => prev.map(a => a.id === articleId ? { ...a, title: res.data.title, updated_at: res.data.updated_at } : a))
       } catch (err) {
           console.error(err)
       }
@@ -272,22 +308,6 @@ const Dashboard = ({ onNavigate }: DashboardProps) => {
   const lastAnalyzedTextRef = useRef<string>('')
   const previousContentRef = useRef<any>(null)
 
-  // Extract quote from AI full text response if available
-  // Expected format:
-  // >> QUOTE: <text>
-  // >> COMMENT: <text>
-  const parseAIResponse = (text: string): { quote: string | null, content: string } => {
-      const quoteMatch = text.match(/>> QUOTE: (.*?)\n/)
-      const commentMatch = text.match(/>> COMMENT: ([\s\S]*)/) // Match until end of string
-
-      if (quoteMatch && commentMatch) {
-          const quote = quoteMatch[1].trim()
-          const content = commentMatch[1].trim()
-          return { quote: quote === 'NONE' ? null : quote, content }
-      }
-      return { quote: null, content: text } // Fallback
-  }
-
   const [activeCommentId, setActiveCommentId] = useState<string | null>(null)
 
   const [lastRequestTime, setLastRequestTime] = useState<Record<string, number>>({})
@@ -353,115 +373,42 @@ const Dashboard = ({ onNavigate }: DashboardProps) => {
             .filter(c => c.quote && c.quote !== 'NONE')
             .map(c => c.quote)
         
-        analyzeText(textContext, "General", existingQuotes, (chunk) => {
-            // Streaming update (raw)
-            setComments(prev => prev.map(c => {
-                if (c.id === newId) {
-                    // Check if chunk contains NO_COMMENT to filter early if possible?
-                    // But chunk might be partial. We'll filter in the UI (Sidebar) until complete.
-                    return { 
-                        ...c, 
-                        content: c.content + chunk, 
-                        type: 'suggestion',
-                        isStreaming: false
+        // The server parses the stream, skips NO_COMMENT / duplicate quotes and saves the comment
+        analyzeEvents(textContext, "General", existingQuotes, currentArticle?.id, {
+            onQuote: (quote) => {
+                setComments(prev => prev.map(c => c.id === newId ? { ...c, quote } : c))
+            },
+            onDelta: (delta) => {
+                setComments(prev => prev.map(c => {
+                    if (c.id === newId) {
+                        return { 
+                            ...c, 
+                            content: c.content + delta, 
+                            type: 'suggestion',
+                            isStreaming: false
+                        }
                     }
-                }
-                return c
-            }))
-        }, async (fullText) => {
-            // Parse AI response to get quote and clean comment
-            const { quote, content } = parseAIResponse(fullText)
-
-            // Ignore NO_COMMENT response entirely (robust check)
-            if (content.toUpperCase().includes('NO_COMMENT') || content.trim() === '') {
-                setComments(prev => prev.filter(c => c.id !== newId))
-                return
-            }
-
-            // Ignore if quote is already present in existing open comments (deduplication)
-            // But we need to check the CURRENT state, not closure state.
-            // Using a functional update to setComments to check the latest state is tricky for cancellation.
-            // Instead, we can check 'comments' which is a dependency if we included it, but we can't easily here.
-            // However, we can check inside setComments functional update and if duplicate, REMOVE the new comment.
-            
-            // Actually, we can just check if 'quote' is present in 'comments'.
-            // But 'comments' variable is stale here (closure).
-            // We need to use the functional update pattern.
-            
-            // Save comment to backend
-            try {
-                if (!currentArticle) return
-                
-                // Check deduplication in backend? Or frontend?
-                // Frontend is better for immediate feedback.
-                // We'll do it inside setComments to access latest state.
-                
-                let isDuplicate = false;
-                
-                // We need to access the latest comments to check for duplicates BEFORE saving to DB to avoid useless writes.
-                // But we can't access React state synchronously here easily without ref.
-                // Let's use a ref for comments or just accept we might save duplicates to DB but filter in UI?
-                // No, better to filter.
-                
-                // Let's use the 'setComments' callback to determine if we should proceed.
-                // But 'setComments' is void.
-                
-                // Alternative: We can use a ref for 'comments' in Dashboard to access current value.
-                // But we don't have one set up. Let's rely on backend or just check what we have.
-                
-                // Actually, if we use functional setComments, we can filter.
-                // But we need to decide whether to CALL API.
-                
-                // Let's assume for now we save it, but if it's a duplicate, we maybe don't display it?
-                // Or better: Use the API response.
-                
-                // Let's implement a simple check using a ref if we can, or just add a ref for comments in Dashboard.
-                // Since I can't easily add a ref to the component body without reloading the whole file (which I can do),
-                // I will add a ref for comments to Dashboard.
-                
-                // Wait, I can't modify Dashboard component state variables easily in this tool call block without replacing the whole file or large chunk.
-                // I'll try to use a hack: check 'comments' from the closure, which might be stale.
-                // But 'handleEditorChange' is recreated on every render? No, it's not wrapped in useCallback.
-                // So 'comments' in 'handleEditorChange' IS fresh!
-                // Wait, 'handleEditorChange' IS NOT wrapped in useCallback.
-                // But it's passed to TipTapEditor.
-                // If it's not useCallback, it's recreated every render.
-                // So 'comments' variable inside it is the value at the time of render.
-                // But 'setTimeout' runs later. The 'comments' captured in the closure of setTimeout will be the ones from when the timeout was SET.
-                // That might be 2 seconds ago. 
-                // That's reasonably fresh.
-                
-                if (quote && comments.some(c => c.quote === quote && c.status !== 'resolved')) {
-                     // Duplicate found!
-                     // Remove the placeholder comment
-                     setComments(prev => prev.filter(c => c.id !== newId))
-                     return
-                }
-
-                const res = await api.post('/comments/', {
-                    article_id: currentArticle.id,
-                    content: content,
-                    quote: quote,
-                    type: 'suggestion'
-                })
-                const savedComment = res.data
-                
-                // Replace the temporary comment with the saved one in the state
+                    return c
+                }))
+            },
+            onDone: (result) => {
                 setComments(prev => {
-                    // Double check duplicate here just in case (race condition)
-                    if (quote && prev.some(c => c.quote === quote && c.id !== newId && c.status !== 'resolved')) {
+                    if (!result) {
+                        return prev.filter(c => c.id !== newId)
+                    }
+                    // Duplicate of an open comment: the server didn't save it
+                    if (result.quote && prev.some(c => c.quote === result.quote && c.id !== newId && c.status !== 'resolved')) {
                         return prev.filter(c => c.id !== newId)
                     }
-                    
                     return prev.map(c => {
                         if (c.id === newId) {
-                            return { ...savedComment, isStreaming: false }
+                            return result.comment
+                                ? { ...result.comment, isStreaming: false }
+                                : { ...c, content: result.content, quote: result.quote, isStreaming: false }
                         }
                         return c
                     })
                 })
-            } catch (err) {
-                console.error('Failed to save comment', err)
             }
         })
     }, delay)
@@ -509,15 +456,29 @@ const Dashboard = ({ onNavigate }: DashboardProps) => {
       }))
 
       try {
-        const res = await api.post(`/comments/${id}/reply`, { content })
+        // Show the AI reply as it streams in
+        let aiText = ''
+        const result = await streamReply(id, content, (chunk) => {
+            aiText += chunk
+            setComments(prev => prev.map(c => {
+                if (c.id !== id) return c
+                const history = Array.isArray(c.reply) ? c.reply : []
+                const last = history[history.length - 1]
+                const aiMessage = { role: 'ai', content: aiText, timestamp: new Date().toISOString() }
+                return {
+                    ...c,
+                    reply: last?.role === 'ai' ? [...history.slice(0, -1), aiMessage] : [...history, aiMessage]
+                }
+            }))
+        })
         
-        // Update with real response (which includes AI response)
-        if (res.data.reply_list) {
+        // Update with the stored thread
+        if (result?.reply_list) {
              setComments(prev => prev.map(c => {
                 if (c.id === id) {
                     return { 
                         ...c, 
-                        reply: res.data.reply_list
+                        reply: result.reply_list
                     }
                 }
                 return c
@@ -650,14 +611,23 @@ const Dashboard = ({ onNavigate }: DashboardProps) => {
                                     article={a}
                                     currentArticle={currentArticle}
                                     latestArticleId={latestArticleId}
-                                    onSelect={setCurrentArticle}
+                                    onSelect={selectArticle}
                                     onDelete={setDeleteArticleId}
                                     isSelectionMode={isSelectionMode}
                                     isSelectedForBulk={selectedArticles.includes(a.id)}
                                     onToggleSelection={toggleArticleSelection}
+                                    dragDisabled={isSearching}
                                 />
                             ))}
                         </ul>
+                        {nextCursor && (
+                            <button
+                                onClick={loadMoreArticles}
+                                className="w-full mt-1 p-2 text-sm text-gray-500 hover:text-blue-600 hover:bg-gray-50 rounded-lg transition"
+                            >
+                                Load more
+                            </button>
+                        )}
                     </SortableContext>
                 </div>
                 <DragOverlay adjustScale={true}>